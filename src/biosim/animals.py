@@ -5,49 +5,164 @@ __email__ = 'jon.augensen@nmbu.no / lars.overgard@hotmail.com'
 
 """
 This file contains the class for the animals and classes for different animal species.
+Every animal points to it's species class, which holds the parameters shared by all animals of
+that species, and has a species code soo species can be compared as integers.
+Every island makes it's own species classes with make_species, soo parameters changed in one
+simulation don't change the other simulations.
 """
 
-from .math_funcs import qua, gaussian_weight, random_number
+from .math_funcs import calculate_fitness
+
+HERBIVORE = 0
+CARNIVORE = 1
 
 
 class Animal:
     """
     Here we create our animal class.
+    The fitness is kept until the age, the weight or the species parameters change, then it's
+    marked as outdated and calculated again the next time fitness_update is called.
+    params_version is increased every time set_animal_parameters changes a parameter.
+    The attributes are stored in __slots__, soo an animal has no __dict__ and uses less memory.
     """
+    __slots__ = ('_age', '_weight', 'fitness', 'fitness_version', 'species_id', 'code', 'stage',
+                 'direction', 'alive')
+    params_version = 0
 
-    def __init__(self, params):
+    def __init__(self, params, species=None):
         """
         This docstring is related to Animal __init__ Will create an animal based on the parameters
         provided.
-        An species object will be added to give it correct attributes and make it eat correctly.
+        The species class will be added to give it correct attributes and make it eat correctly,
+        it's shared by all animals of the same species.
         This object will also remember it's fitness, which will be calculated after it's created,
-        it's stage during the annual cycle and which direction it will migrate.
+        it's stage during the annual cycle, which direction it will migrate and if it's alive.
         :param params: dictionary. Contains all the parameters an animal need to be created.
+        :param species: dictionary. The species classes of the simulation, by name. The default
+        species classes are used if None.
+        """
+        species = species or species_classes
+        if params['species'] not in species:
+            raise ValueError("'" + params['species'] + "' is not a specie in this simulation!")
+
+        if params['weight'] < 0:
+            raise ValueError("Animals can't have negative weight!")
+
+        if params['age'] < 0:
+            raise ValueError("Animals can't have negative age!")
+
+        self.set_values(species[params['species']], params['age'], params['weight'])
+
+    @classmethod
+    def from_values(cls, species_id, age, weight):
         """
-        self.age = params['age']
-        self.weight = params['weight']
+        Creates an animal without a parameter dictionary, used when many animals are added at
+        once. The values must be checked before.
+        :param species_id: class. Herbivores or Carnivores.
+        :param age: int. Age of the animal.
+        :param weight: float. Weight of the animal.
+        :return: class object. The new animal.
+        """
+        animal = cls.__new__(cls)
+        animal.set_values(species_id, age, weight)
+        return animal
+
+    @classmethod
+    def from_state(cls, species_id, age, weight, fitness, stage):
+        """
+        Creates an animal saved in a checkpoint. The saved fitness is kept, but marked as
+        outdated, soo it's only calculated again when it's needed.
+        :param species_id: class. Herbivores or Carnivores.
+        :param age: int. Age of the animal.
+        :param weight: float. Weight of the animal.
+        :param fitness: float. Fitness of the animal.
+        :param stage: int. Stage of the animal in the annual cycle.
+        :return: class object. The animal.
+        """
+        animal = cls.__new__(cls)
+        animal.fitness_version = -1
+        animal._age = age
+        animal._weight = weight
+        animal.fitness = fitness
+        animal.species_id = species_id
+        animal.code = species_id.code
+        animal.stage = stage
+        animal.direction = "None"
+        animal.alive = True
+        return animal
+
+    @classmethod
+    def from_states(cls, species_id, age, weight, fitness, stage):
+        """
+        Creates many animals saved in a checkpoint, like from_state but in one loop without a
+        call for every animal.
+        :param species_id: class. Herbivores or Carnivores.
+        :param age: list. Ages of the animals.
+        :param weight: list. Weights of the animals.
+        :param fitness: list. Fitness of the animals.
+        :param stage: list. Stages of the animals.
+        :return: list. The animals.
+        """
+        new = cls.__new__
+        code = species_id.code
+        animals = []
+        append = animals.append
+        for values in zip(age, weight, fitness, stage):
+            animal = new(cls)
+            (animal._age, animal._weight, animal.fitness, animal.stage) = values
+            animal.fitness_version = -1
+            animal.species_id = species_id
+            animal.code = code
+            animal.direction = "None"
+            animal.alive = True
+            append(animal)
+        return animals
+
+    def set_values(self, species_id, age, weight):
+        """
+        Gives the animal it's species, age and weight, and sets the rest of the attributes.
+        Newborn animals get stage 2, soo they are not a part of this years annual cycle.
+        :param species_id: class. Herbivores or Carnivores.
+        :param age: int. Age of the animal.
+        :param weight: float. Weight of the animal.
+        :return: None
+        """
+        self.fitness_version = -1
+        self._age = age
+        self._weight = weight
         self.fitness = 1
-        self.species = params['species']
-        self.species_id = 0
-        self.stage = 0
+        self.species_id = species_id
+        self.code = species_id.code
+        self.stage = 2 if age == 0 else 0
         self.direction = "None"
+        self.alive = True
 
-        if self.species == "Herbivore":
-            self.species_id = Herbivores()
+        self.fitness_update()
 
-        elif self.species == "Carnivore":
-            self.species_id = Carnivores()
+    @property
+    def species(self):
+        """Name of the species of the animal."""
+        return self.species_id.name
 
-        if self.weight < 0:
-            raise ValueError("Animals can't have negative weight!")
+    @property
+    def age(self):
+        """Age of the animal, setting it makes the fitness outdated."""
+        return self._age
 
-        if self.age < 0:
-            raise ValueError("Animals can't have negative age!")
+    @age.setter
+    def age(self, value):
+        self._age = value
+        self.fitness_version = -1
 
-        if params['age'] == 0:
-            self.stage = 2
+    @property
+    def weight(self):
+        """Weight of the animal, setting it makes the fitness outdated."""
+        return self._weight
 
-        self.fitness_update()
+    @weight.setter
+    def weight(self, value):
+        self._weight = value
+        self.fitness_version = -1
 
     def ages_weight(self):
         """
@@ -55,8 +170,9 @@ class Animal:
         Weight-loss is calculated with it's own weight and class attribute eta.
         :return: None
         """
-        self.age += 1
-        self.weight -= self.species_id.eta * self.weight
+        self._age += 1
+        self._weight -= self.species_id.eta * self._weight
+        self.fitness_version = -1
 
     def feeding_type(self, cell_id):
         """
@@ -70,15 +186,15 @@ class Animal:
     def fitness_update(self):
         """
         Calculates the fitness of an animal, dependent on it's age and weight, and multiple class
-        attributes, a_half, phi_age, w_half and phi_weight.
+        attributes, a_half, phi_age, w_half and phi_weight. Uses the lookup tables in math_funcs.
+        The fitness is only calculated if it's outdated, if not the stored fitness is returned.
         :return: float. Returns the fitness of an animal
         """
-        if self.weight <= 0:
-            delta = 0
-        else:
-            delta = qua(self.age, self.species_id.a_half, self.species_id.phi_age) * \
-                    qua(self.weight, self.species_id.w_half, -self.species_id.phi_weight)
+        if self.fitness_version == Animal.params_version:
+            return self.fitness
+        delta = calculate_fitness(self._age, self._weight, self.species_id)
         self.fitness = delta
+        self.fitness_version = Animal.params_version
         return delta
 
     def birth(self, biome_id, animal_count):
@@ -87,20 +203,22 @@ class Animal:
         get a calf is dependent on it's fitness, weight and total amount of animals in their biome.
         When the animal get a calf, it will lose an amount of weight, which will be calculated
         with an attribute xi.
-        :param biome_id: class object. Used to call biomes add_animal function
+        :param biome_id: class object. Used to call biomes add_animal function, and gives the
+        random stream
         :param animal_count: int. The total amount of animals of the same species, before animals
         are checked if they get a calf. Will be the same for all animals of the same species in the
         same cell during each year.
         :return: None
         """
-        calf_weight = gaussian_weight(self.species_id.w_birth, self.species_id.sigma_birth)
-        if self.weight > self.species_id.zeta * \
+        calf_weight = biome_id.random.gaussian_weight(self.species_id.w_birth,
+                                                      self.species_id.sigma_birth)
+        if self._weight > self.species_id.zeta * \
                 (self.species_id.w_birth + self.species_id.sigma_birth) and \
-                self.weight > self.species_id.xi * calf_weight:
+                self._weight > self.species_id.xi * calf_weight:
             if animal_count >= 2:
                 birth_prop = min(1.0, self.species_id.gamma *
                                  self.fitness_update() * (animal_count - 1))
-                if random_number() <= birth_prop:
+                if biome_id.random.random_number() <= birth_prop:
                     biome_id.add_animal({'species': self.species_id.name, 'age': 0,
                                          'weight': calf_weight})
                     self.weight -= self.species_id.xi * calf_weight
@@ -117,9 +235,8 @@ class Animal:
         :return: None
         """
         props_death = self.species_id.omega * (1 - self.fitness_update())
-        if self.weight <= 0:
-            biomes_id.dead_animal_list.append(self)
-        elif random_number() <= props_death:
+        if self._weight <= 0 or biomes_id.random.random_number() <= props_death:
+            self.alive = False
             biomes_id.dead_animal_list.append(self)
 
     def migration(self, place):
@@ -130,7 +247,7 @@ class Animal:
         :param place: class object. Used to append the animal to the current cell migrator list.
         :return: Boolean
         """
-        if random_number() < self.species_id.mu * self.fitness_update():
+        if place.random.random_number() < self.species_id.mu * self.fitness_update():
             place.tot_migrators.append(self)
 
 
@@ -152,7 +269,10 @@ class Herbivores:
     xi = 1.2
     omega = 0.4
     F = 10
+    # Distance between the weights in the interpolated weight table, 0 turns the table off
+    weight_table_step = 0
     name = 'Herbivore'
+    code = HERBIVORE
 
     @staticmethod
     def feeding(cell, animal):
@@ -164,13 +284,15 @@ class Herbivores:
         :param animal: class object. The current Herbivore trying to eat.
         :return: None
         """
-        food = Herbivores.beta * Herbivores.F
-        foods = Herbivores.F
+        params = animal.species_id
+        food = params.beta * params.F
+        foods = params.F
         if foods >= cell.fodder:
-            food = Herbivores.beta * cell.fodder
+            food = params.beta * cell.fodder
             foods = cell.fodder
-        animal.weight += food
-        cell.eats_fodder(foods)
+        if food:
+            animal.weight += food
+            cell.eats_fodder(foods)
 
 
 class Carnivores:
@@ -192,7 +314,10 @@ class Carnivores:
     omega = 0.8
     F = 50
     DeltaPhiMax = 10
+    # Distance between the weights in the interpolated weight table, 0 turns the table off
+    weight_table_step = 0
     name = 'Carnivore'
+    code = CARNIVORE
 
     @staticmethod
     def feeding(cell, animal):
@@ -203,27 +328,45 @@ class Carnivores:
         As long the Carnivore hasn't eaten it's annual amount it will keep trying, while there is
         still Herbivores in the same cell and the Carnivore is fitter, if he eats or not will then
         be checked with a random number.
+        Eaten Herbivores are marked as dead and put in the cell's dead_animal_list, they are
+        removed from the cell's list when the cell updates it's lists after feeding.
+        The Herbivores are taken from the cell's prey index, which is sorted after fitness only
+        once for all the Carnivores in the cell. Eaten Herbivores are skipped.
         :param cell: class object. Gives the current cell the animals is in.
         :param animal: class object. Gives the current animal. Only Carnivores.
         :return: None
         """
-        herb_fitness_list = sorted(cell.herbivore_list, key=lambda x: x.fitness)
+        params = animal.species_id
+        herb_fitness_list = cell.prey()
         food_eaten = 0
-        herb_id = 0
-        if herb_fitness_list:
-            while herb_id < len(herb_fitness_list) and food_eaten < Carnivores.F and \
-                    herb_fitness_list and animal.fitness > herb_fitness_list[herb_id].fitness and \
-                    cell.herbivore_list:
-                eat_prop = ((animal.fitness - herb_fitness_list[herb_id].fitness) /
-                            Carnivores.DeltaPhiMax)
-                if random_number() < eat_prop:
-                    unfit_herb = herb_fitness_list[herb_id]
-
-                    animal.weight += unfit_herb.weight * Carnivores.beta
+        herb_id = cell.prey_start
+        while herb_id < len(herb_fitness_list) and food_eaten < params.F and \
+                animal.fitness > herb_fitness_list[herb_id].fitness:
+            unfit_herb = herb_fitness_list[herb_id]
+            if unfit_herb.alive:
+                eat_prop = ((animal.fitness - unfit_herb.fitness) / params.DeltaPhiMax)
+                if cell.random.random_number() < eat_prop:
+                    animal.weight += unfit_herb.weight * params.beta
                     animal.fitness_update()
                     food_eaten += unfit_herb.weight
 
-                    herb_id += 1
-                    cell.herbivore_list.remove(unfit_herb)
-                else:
-                    herb_id += 1
+                    unfit_herb.alive = False
+                    cell.dead_animal_list.append(unfit_herb)
+            herb_id += 1
+
+        while cell.prey_start < len(herb_fitness_list) and \
+                not herb_fitness_list[cell.prey_start].alive:
+            cell.prey_start += 1
+
+
+species_classes = {Herbivores.name: Herbivores, Carnivores.name: Carnivores}
+
+
+def make_species():
+    """
+    Makes new species classes for one simulation. They are subclasses of Herbivores and
+    Carnivores, soo they start with the default parameters, but changing them doesn't change
+    the defaults or other simulations.
+    :return: dict. The new species classes, by name.
+    """
+    return {name: type(cls.__name__, (cls,), {}) for name, cls in species_classes.items()}
@@ -5,20 +5,21 @@ __email__ = 'jon.augensen@nmbu.no / lars.overgard@hotmail.com'
 
 """
 This file contains the class for the biomes and classes for different landscapes.
+Like the species, every island makes it's own landscape classes with make_landscapes.
 """
 
-import random
-from .animals import Animal
-from .math_funcs import random_number
+import numpy as np
+from .animals import Animal, HERBIVORE, CARNIVORE, species_classes
+from .math_funcs import default_stream
+from .population import Population, VectorizedPopulation
 
 
 class Biomes:
     """
     A nested list will be given to this class, which contains all the cells/biomes of the map.
     """
-    island_map = []
-
-    def __init__(self, y, x, land_type):
+    def __init__(self, y, x, land_type, engine='object', species=None, landscapes=None,
+                 random_stream=None):
         """
         This docstring belongs to Biomes __init__ it makes a object contain it's x and y
         coordinates and landtype.
@@ -28,38 +29,44 @@ class Biomes:
         :param y: int. Y-coordinate of the biome.
         :param x: int. X-coordinate of the biome.
         :param land_type: string. Gives what landtype this biome will be.
+        :param engine: string. 'object' stores every animal as an Animal object in a list,
+        'array' stores the animals of each species in a Population with NumPy arrays and
+        'vectorized' does the annual cycle of these arrays with NumPy operations.
+        :param species: dictionary. The species classes of the island, by name. The default
+        species classes are used if None.
+        :param landscapes: dictionary. The landscape classes of the island, by letter. The default
+        landscape classes are used if None.
+        :param random_stream: class object. The RandomStream of the island, default_stream is
+        used if None. The animals in this cell draw their random numbers from it.
         """
         self.x = x
         self.y = y
         self.land_type = land_type
         self.land_id = 0
-        self.herbivore_list = []
-        self.carnivore_list = []
+        self.engine = engine
+        self.species = species or species_classes
+        self.landscapes = landscapes or landscape_classes
+        self.island_map = []
+        self.random = random_stream or default_stream
+        if self.engine == 'object':
+            self.herbivore_list = []
+            self.carnivore_list = []
+        elif self.engine == 'array':
+            self.herbivore_list = Population(self.species['Herbivore'], self.random)
+            self.carnivore_list = Population(self.species['Carnivore'], self.random)
+        elif self.engine == 'vectorized':
+            self.herbivore_list = VectorizedPopulation(self.species['Herbivore'], self.random)
+            self.carnivore_list = VectorizedPopulation(self.species['Carnivore'], self.random)
+        else:
+            raise ValueError("'" + str(engine) + "' is not a valid engine!")
         self.dead_animal_list = []
         self.tot_migrators = []
+        self.prey_index = None
+        self.prey_start = 0
 
-        self.h_fitness_list = []
-        self.h_weight_list = []
-        self.h_age_list = []
-
-        self.c_fitness_list = []
-        self.c_weight_list = []
-        self.c_age_list = []
-
-        if self.land_type == "L":
-            self.land_id = Lowland()
-        elif self.land_type == "H":
-            self.land_id = Highland()
-        elif self.land_type == "D":
-            self.land_id = Desert()
-        elif self.land_type == "W":
-            self.land_id = Water()
-        elif self.land_type == "M":
-            self.land_id = Mountain()
-        elif self.land_type == "F":
-            self.land_id = Fence()
-        else:
+        if self.land_type not in self.landscapes:
             raise ValueError(self.land_type + " is not a valid landtype!")
+        self.land_id = self.landscapes[self.land_type]()
 
         self.availability = self.land_id.availability
         self.fodder = self.land_id.f_max
@@ -73,18 +80,72 @@ class Biomes:
         :return: None
         """
         if self.availability:
-            if animal_params['species'] == "Herbivore":
-                ani = Animal(animal_params)
-                self.herbivore_list.append(ani)
-            elif animal_params['species'] == "Carnivore":
-                ani = Animal(animal_params)
-                self.carnivore_list.append(ani)
+            species = self.species.get(animal_params['species'])
+            if species and species.code == HERBIVORE:
+                self.prey_index = None
+                if self.engine != 'object':
+                    self.herbivore_list.append(animal_params['age'], animal_params['weight'])
+                else:
+                    self.herbivore_list.append(Animal(animal_params, self.species))
+            elif species and species.code == CARNIVORE:
+                if self.engine != 'object':
+                    self.carnivore_list.append(animal_params['age'], animal_params['weight'])
+                else:
+                    self.carnivore_list.append(Animal(animal_params, self.species))
             else:
                 raise ValueError("'" + animal_params['species'] +
                                  "' is not a specie in this simulation!")
         else:
             raise ValueError("Animals can't spawn here at " + str(self.y+1) + "," + str(self.x+1))
 
+    def add_animals(self, species, age, weight):
+        """
+        Adds many animals of one species at once, from arrays of ages and weights.
+        The arrays are checked once for all the animals by Island.check_columns, soo here only
+        the cell and the species are checked.
+        :param species: str. Name of the species.
+        :param age: array. Ages of the animals.
+        :param weight: array. Weights of the animals.
+        :return: None
+        """
+        if len(age) and not self.availability:
+            raise ValueError("Animals can't spawn here at " + str(self.y+1) + "," + str(self.x+1))
+        species_id = self.species.get(species)
+        if species_id is None:
+            raise ValueError("'" + species + "' is not a specie in this simulation!")
+        if species_id.code == HERBIVORE:
+            self.prey_index = None
+            animal_list = self.herbivore_list
+        else:
+            animal_list = self.carnivore_list
+        if self.engine != 'object':
+            animal_list.add_animals(age, weight)
+        else:
+            animal_list.extend([Animal.from_values(species_id, ani_age, ani_weight)
+                                for ani_age, ani_weight in zip(age.tolist(), weight.tolist())])
+
+    def restore_animals(self, species, age, weight, fitness, stage):
+        """
+        Puts back animals saved in a checkpoint, with the fitness and stage they had.
+        :param species: str. Name of the species.
+        :param age: array. Ages of the animals.
+        :param weight: array. Weights of the animals.
+        :param fitness: array. Fitness of the animals.
+        :param stage: array. Stages of the animals.
+        :return: None
+        """
+        species_id = self.species[species]
+        if species_id.code == HERBIVORE:
+            self.prey_index = None
+            animal_list = self.herbivore_list
+        else:
+            animal_list = self.carnivore_list
+        if self.engine != 'object':
+            animal_list.extend(age, weight, fitness, stage)
+        else:
+            animal_list.extend(Animal.from_states(species_id, age.tolist(), weight.tolist(),
+                                                  fitness.tolist(), stage.tolist()))
+
     def add_migrator(self, animal):
         """
         Adds a migrating animal to the cell's list containing all the animals.
@@ -93,28 +154,53 @@ class Biomes:
         :param animal: class object
         :return: None
         """
-        if animal.species == "Herbivore":
+        if animal.code == HERBIVORE:
             self.herbivore_list.append(animal)
-        elif animal.species == "Carnivore":
+            self.prey_index = None
+        elif animal.code == CARNIVORE:
             self.carnivore_list.append(animal)
 
+    def has_animals(self):
+        """
+        Checks if there is any animals in this cell.
+        :return: Boolean
+        """
+        return len(self.herbivore_list) > 0 or len(self.carnivore_list) > 0
+
     def update_lists(self, specie_list):
         """
         Takes a list, and checks if it contains animals that have died during the annual
         cycle of a cell. It will be checked up after a list containing dead animals.
+        The dead animals are put in a set and the list is rebuilt in one pass, soo the time
+        is linear in the number of animals in the cell.
         :param specie_list: list. A list contain one specie of animals in one cell
         :return: None
         """
-        for ani_id in self.dead_animal_list:
-            if ani_id in specie_list:
-                specie_list.remove(ani_id)
+        if self.dead_animal_list:
+            dead_animals = set(self.dead_animal_list)
+            specie_list[:] = [ani_id for ani_id in specie_list if ani_id not in dead_animals]
         self.dead_animal_list = []
+        self.prey_index = None
+
+    def prey(self):
+        """
+        Gives the prey index of this cell, the Herbivores still alive sorted after fitness,
+        lowest first. It's made the first time a Carnivore eats, and used by all Carnivores in
+        the cell until the lists are updated. prey_start is the first Herbivore not eaten.
+        :return: list. The Herbivores sorted after fitness.
+        """
+        if self.prey_index is None:
+            self.prey_index = sorted((herb for herb in self.herbivore_list if herb.alive),
+                                     key=lambda x: x.fitness)
+            self.prey_start = 0
+        return self.prey_index
 
     def update_migrators(self, map_list):
         """
         Sends the animals to the correct neighbour cells and moves the object to the correct list,
         then gets removed from old landscape/biome list.
         Migrators list is emptied after all the animals have been iterated over.
+        Migrated animals are removed from the old lists in one pass, after all have moved.
         :param map_list: Nested list, this contains all the landscape/biomes objects,
         in a sorted way by "coordinates"
         Used to find neighbour cell, which a animal can migrate to.
@@ -123,10 +209,11 @@ class Biomes:
         if self.tot_migrators:
             x = self.x
             y = self.y
+            moved = set()
 
             for migrator in self.tot_migrators:
                 migrated = False
-                direction = random_number()
+                direction = self.random.random_number()
                 if direction < 0.25:
                     if map_list[y - 1][x].availability:
                         # Go up
@@ -149,12 +236,47 @@ class Biomes:
                         migrated = True
 
                 if migrated:
-                    if migrator in self.herbivore_list:
-                        self.herbivore_list.remove(migrator)
-                    elif migrator in self.carnivore_list:
-                        self.carnivore_list.remove(migrator)
+                    moved.add(migrator)
+
+            if moved:
+                self.herbivore_list[:] = [ani for ani in self.herbivore_list if ani not in moved]
+                self.carnivore_list[:] = [ani for ani in self.carnivore_list if ani not in moved]
             self.tot_migrators = []
 
+    def update_population_migrators(self, population, migrators, map_list):
+        """
+        Same as update_migrators, but for the 'array' and 'vectorized' engines.
+        A direction is drawn for every migrator, then all migrators going the same way are sent
+        to the neighbour cell's population at once and removed from this population.
+        :param population: class object. The Population the migrators belong to.
+        :param migrators: list. Positions of the migrating animals in the population.
+        :param map_list: Nested list, this contains all the landscape/biomes objects.
+        :return: None
+        """
+        if len(migrators):
+            x = self.x
+            y = self.y
+            migrators = np.asarray(migrators, dtype=np.int64)
+            direction = np.asarray(population.draw_numbers(len(migrators)))
+            # Up, down, right and left
+            neighbours = [map_list[y - 1][x], map_list[y + 1][x], map_list[y][x + 1],
+                          map_list[y][x - 1]]
+            way = np.digitize(direction, [0.25, 0.50, 0.75])
+            staying = np.ones(len(population), dtype=bool)
+
+            for number, target in enumerate(neighbours):
+                if target.availability:
+                    moving = migrators[way == number]
+                    if len(moving):
+                        if population is self.herbivore_list:
+                            target.herbivore_list.extend(*population.take(moving))
+                        else:
+                            target.carnivore_list.extend(*population.take(moving))
+                        staying[moving] = False
+
+            if not staying.all():
+                population.keep(staying)
+
     def order_lists(self):
         """
         The list in this cell are being sorted after specifications from task description.
@@ -163,7 +285,11 @@ class Biomes:
         (High - Low)
         :return: None
         """
-        random.shuffle(self.herbivore_list)
+        if self.engine != 'object':
+            self.herbivore_list.shuffle()
+            self.carnivore_list.sort_by_fitness()
+            return
+        self.random.shuffle(self.herbivore_list)
         self.carnivore_list = sorted(self.carnivore_list, key=lambda x: x.fitness, reverse=True)
 
     def eats_fodder(self, amount):
@@ -191,12 +317,16 @@ class Biomes:
         The lists are being updated after migrating and culling of animals.
         :return: None
         """
+        if self.engine != 'object':
+            self.population_cycle()
+            return
         lists = [self.herbivore_list, self.carnivore_list]
         for list_ani in lists:
             for pet in list_ani:
                 if pet.stage == 0:
                     pet.stage = 1
                     pet.feeding_type(self)
+        self.update_lists(self.herbivore_list)
         for list_ani in lists:
             total_count = len(list_ani)
             for pet in list_ani:
@@ -220,34 +350,42 @@ class Biomes:
                     pet.stage = 0
                     pet.death(self)
             self.update_lists(list_ani)
-        self.count_stats(lists)
 
-    def count_stats(self, animal_lists):
+    def population_cycle(self):
         """
-        This function iterates over the animal-list that been updated from lifecycle.
-        It collects data from the objects in the list. Data being collected is fitness, age
-        weight and this is collected in separate list for Carnivores and Herbivores.
-        The data is only being collected for the current landscape/cell.
-        :param animal_lists: list. Takes the current list from lifecycle.
+        The annual cycle for the 'array' and 'vectorized' engines. Same steps and order as
+        life_cycle, but every step is done on a whole Population at once.
         :return: None
         """
-        self.h_fitness_list = []
-        self.h_weight_list = []
-        self.h_age_list = []
-
-        self.c_fitness_list = []
-        self.c_weight_list = []
-        self.c_age_list = []
-        for animal_list in animal_lists:
-            for pet in animal_list:
-                if pet.species == "Herbivore":
-                    self.h_fitness_list.append(pet.fitness)
-                    self.h_weight_list.append(pet.weight)
-                    self.h_age_list.append(pet.age)
-                elif pet.species == "Carnivore":
-                    self.c_fitness_list.append(pet.fitness)
-                    self.c_weight_list.append(pet.weight)
-                    self.c_age_list.append(pet.age)
+        if not len(self.herbivore_list) and not len(self.carnivore_list):
+            return
+        self.herbivore_list.herbivore_feeding(self)
+        self.carnivore_list.carnivore_feeding(self)
+        self.herbivore_list.birth()
+        self.carnivore_list.birth()
+        for population in (self.herbivore_list, self.carnivore_list):
+            self.update_population_migrators(population, population.migration(),
+                                             self.island_map)
+        for population in (self.herbivore_list, self.carnivore_list):
+            population.ages_weight()
+        for population in (self.herbivore_list, self.carnivore_list):
+            population.death()
+
+    def count_stats(self, stats):
+        """
+        Adds the fitness, age and weight of the animals in this cell to the statistics of the
+        island. It's called when the whole island is done with the year, soo the migrants that
+        came after this cell's annual cycle are counted too, and no lists are kept in the cell.
+        :param stats: class object. The StatsAccumulator of the island.
+        :return: None
+        """
+        for (code, animals) in ((HERBIVORE, self.herbivore_list),
+                                (CARNIVORE, self.carnivore_list)):
+            if self.engine == 'object':
+                stats.add(code, [pet.fitness for pet in animals], [pet.age for pet in animals],
+                          [pet.weight for pet in animals])
+            else:
+                stats.add(code, animals.fitness, animals.age, animals.weight)
 
 
 class Lowland:
@@ -303,3 +441,16 @@ class Fence:
     """
     f_max = 0
     availability = False
+
+
+landscape_classes = {'W': Water, 'L': Lowland, 'H': Highland, 'D': Desert, 'M': Mountain,
+                     'F': Fence}
+
+
+def make_landscapes():
+    """
+    Makes new landscape classes for one island, subclasses of the landscape classes above, soo
+    parameters can be changed for one simulation only.
+    :return: dict. The new landscape classes, by letter.
+    """
+    return {letter: type(cls.__name__, (cls,), {}) for letter, cls in landscape_classes.items()}
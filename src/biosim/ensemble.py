@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Jon Augensen & Lars Øvergård, NMBU'
+__email__ = 'jon.augensen@nmbu.no / lars.overgard@hotmail.com'
+
+"""
+This file contains the ensemble runner, which simulates the same scenario with many seeds.
+Every seed is simulated in a process pool without graphics. The workers write the population
+history straight into a shared memory buffer, soo the histories are not sent back with pickle.
+"""
+
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from .simulation import BioSim
+
+_buffer = None
+_results = None
+
+
+def _attach_buffer(name, shape):
+    """
+    Opens the shared memory buffer in a worker process, called once when the worker starts.
+    :param name: str. Name of the shared memory block.
+    :param shape: tuple. Shape of the results, (species, seeds, years + 1).
+    :return: None
+    """
+    global _buffer, _results
+    _buffer = shared_memory.SharedMemory(name=name)
+    _results = np.ndarray(shape, dtype=np.int64, buffer=_buffer.buf)
+
+
+def _run_member(member):
+    """
+    Simulates one seed of the ensemble, and writes the history to the shared buffer.
+    :param member: tuple. (position, seed, island_map, ini_pop, years, animal_params,
+    landscape_params, engine)
+    :return: None
+    """
+    (position, seed, island_map, ini_pop, years, animal_params, landscape_params,
+     engine) = member
+    with BioSim(island_map=island_map, ini_pop=ini_pop, seed=seed, vis_years=0,
+                engine=engine) as sim:
+        for species, params in animal_params.items():
+            sim.set_animal_parameters(species, params)
+        for landscape, params in landscape_params.items():
+            sim.set_landscape_parameters(landscape, params)
+        sim.simulate(years)
+    _results[0, position] = sim.island.herbivore_pop_history
+    _results[1, position] = sim.island.carnivore_pop_history
+
+
+def run_ensemble(island_map, ini_pop, seeds, years, animal_params=None, landscape_params=None,
+                 engine='object', processes=None, quantiles=(0.05, 0.5, 0.95)):
+    """
+    Simulates the same scenario once for every seed, in a process pool.
+    :param island_map: str. Multi-line string specifying island geography.
+    :param ini_pop: list. Dictionaries specifying initial population.
+    :param seeds: list. One seed for every simulation.
+    :param years: int. Number of years to simulate.
+    :param animal_params: dict. Parameters for set_animal_parameters, by species name.
+    :param landscape_params: dict. Parameters for set_landscape_parameters, by landscape letter.
+    :param engine: str. Engine used by the simulations, 'parallel' can't be used since the
+    pool workers can't start processes.
+    :param processes: int. Number of worker processes, the number of CPUs if None.
+    :param quantiles: tuple. Quantiles to calculate for every year.
+    :return: dict. 'years' is an array of the years, and 'Herbivore' and 'Carnivore' are dicts
+    with 'counts' (one row per seed, one column per year), 'mean' and 'quantiles' (one row per
+    quantile).
+    """
+    if engine == 'parallel':
+        raise ValueError("The 'parallel' engine can't be used in an ensemble!")
+    if not len(seeds):
+        raise ValueError("The ensemble needs at least one seed!")
+    if type(years) != int or years < 0:
+        raise ValueError("Year must be a whole number and can't be negative!")
+    shape = (2, len(seeds), years + 1)
+    buffer = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 1))
+    try:
+        members = [(position, seed, island_map, ini_pop, years, animal_params or {},
+                    landscape_params or {}, engine) for position, seed in enumerate(seeds)]
+        with multiprocessing.Pool(processes, initializer=_attach_buffer,
+                                  initargs=(buffer.name, shape)) as pool:
+            pool.map(_run_member, members)
+        counts = np.ndarray(shape, dtype=np.int64, buffer=buffer.buf).copy()
+    finally:
+        buffer.close()
+        buffer.unlink()
+
+    results = {'years': np.arange(years + 1)}
+    for number, species in enumerate(('Herbivore', 'Carnivore')):
+        results[species] = {'counts': counts[number],
+                            'mean': counts[number].mean(axis=0),
+                            'quantiles': np.quantile(counts[number], quantiles, axis=0)}
+    return results
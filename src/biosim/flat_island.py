@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Jon Augensen & Lars Øvergård, NMBU'
+__email__ = 'jon.augensen@nmbu.no / lars.overgard@hotmail.com'
+
+"""
+This file contains the island used by the 'flat' engine.
+All animals on the island are stored in one set of arrays per species, where every animal is
+tagged with the index of the cell it is in. Feeding, birth, migration, aging and death are done
+for the whole island at once with grouped NumPy operations, soo there is no loop over the cells.
+Only Carnivores hunting is done cell by cell, and only in cells with both species.
+The 'flat' engine follows the same annual cycle as the other engines, but it has no stages, soo
+it is not the same model in two cases:
+- Island does the whole annual cycle one cell at a time. An animal that migrates into a cell
+  that is earlier in the map (up or to the left) comes to a cell that is done for the year, soo
+  it does not age, lose weight or die that year. Here all migrants age and can die.
+- Animals with age 0 added by add_pop get stage 2 in Island, soo they don't eat or have calves
+  the first year. Here they eat and can have calves like all the other animals.
+The populations are close to the other engines, but not the same, and Carnivores are the most
+affected.
+"""
+
+import numpy as np
+from .island import Island
+from .animals import make_species
+from .biome import make_landscapes
+from .population import Population, hunt
+from .math_funcs import calculate_fitness_array, RandomStream, default_stream
+from .stats import StatsAccumulator
+
+
+class FlatPopulation(Population):
+    """
+    Population for a whole island, every animal also knows which cell it is in.
+    """
+    columns = {'_cell': np.int64, '_age': np.int64, '_weight': float, '_fitness': float}
+
+    @property
+    def cell(self):
+        """Index of the cell of the animals, row * width + column."""
+        return self._cell[:self.size]
+
+    def extend(self, cell, age, weight, fitness=None):
+        """
+        Adds many animals to the end of the population at once.
+        :param cell: array. Cell index of the animals.
+        :param age: array. Ages of the animals.
+        :param weight: array. Weights of the animals.
+        :param fitness: array. Fitness of the animals, calculated if None.
+        :return: None
+        """
+        start = self.size
+        new_size = self.size + len(age)
+        self._reserve(new_size)
+        self._cell[start:new_size] = cell
+        self._age[start:new_size] = age
+        self._weight[start:new_size] = weight
+        self.size = new_size
+        if fitness is None:
+            self.fitness_update(slice(start, new_size))
+        else:
+            self._fitness[start:new_size] = fitness
+
+    def fitness_update(self, index=None):
+        """
+        Calculates the fitness of the animals with one NumPy expression.
+        :param index: array. Positions of the animals to update, all animals if None.
+        :return: array. The new fitness of the animals.
+        """
+        if index is None:
+            index = slice(None)
+        fitness = calculate_fitness_array(self.age[index], self.weight[index], self.species_id)
+        self.fitness[index] = fitness
+        return fitness
+
+
+class FlatIsland:
+    """
+    Here we create our island class for the 'flat' engine. It has the same interface as Island,
+    but it is not the same model, see the top of this file.
+    """
+
+    def __init__(self, layout, seed=None, hist_specs=None):
+        """
+        This docstring belongs to FlatIsland __init__ it splits the layout, and makes empty
+        populations for both species. Like Island, it has it's own species and landscape
+        classes, and it's own random stream.
+        :param layout: str. A layout of the geography of the environment.
+        :param seed: int. Seed of the random stream, the shared default_stream is used if None.
+        :param hist_specs: dict. Bins of the histograms in the statistics, see stats.py.
+        """
+        self.map = layout.split()
+        self.y = len(self.map)
+        self.x = len(self.map[0])
+        self.engine = 'flat'
+        self.land_code = np.zeros(self.y * self.x, dtype=np.int64)
+        self.species = make_species()
+        self.landscapes = make_landscapes()
+        self.random = default_stream if seed is None else RandomStream(seed)
+        self.stats = StatsAccumulator(hist_specs)
+
+        self.herbivores = FlatPopulation(self.species['Herbivore'], self.random)
+        self.carnivores = FlatPopulation(self.species['Carnivore'], self.random)
+        self.fodder = np.zeros(self.y * self.x)
+
+        self.year = 0
+        self.herbivore_pop_history = []
+        self.carnivore_pop_history = []
+        self.history_years = []
+
+    def make_island(self):
+        """
+        Checks if the layout is correct, then stores the landtype of every cell as a number,
+        which is the position of the landtype in landscapes.
+        :return: None
+        """
+        Island.check_layout(self.map)
+        letters = list(self.landscapes)
+        for m in range(self.y):
+            for n in range(self.x):
+                if self.map[m][n] not in self.landscapes:
+                    raise ValueError(self.map[m][n] + " is not a valid landtype!")
+                self.land_code[m * self.x + n] = letters.index(self.map[m][n])
+
+    def landscape_values(self, attribute):
+        """
+        Gives a landscape parameter for every cell. Read from the landscape classes every time,
+        soo changes from set_landscape_parameters are used.
+        :param attribute: str. Name of the parameter, 'f_max' or 'availability'.
+        :return: array. The parameter for every cell.
+        """
+        values = np.array([getattr(land, attribute) for land in self.landscapes.values()])
+        return values[self.land_code]
+
+    def add_pop(self, params):
+        """
+        Adds animals to a given location with specified parameters.
+        All animals at one location are checked and added at once. The animals can also be
+        given as columns, like in Island.add_pop.
+        :param params: list. Contains a list with dictionaries of animals that should be added to
+        island. Dictionaries contain location and parameters of the animal(s).
+        :return: None
+        """
+        for pop_param in params:
+            (m, n) = pop_param['loc']
+            if m > self.y:
+                raise ValueError(str(m) + " is not a valid Y coordinate")
+            elif n > self.x:
+                raise ValueError(str(n) + " is not a valid X coordinate")
+            cell = (m - 1) * self.x + n - 1
+            if 'pop' in pop_param:
+                columns = []
+                for ani in pop_param['pop']:
+                    if ani['species'] not in ("Herbivore", "Carnivore"):
+                        raise ValueError("'" + ani['species'] + "' is not a specie in this "
+                                                                "simulation!")
+                for population in (self.herbivores, self.carnivores):
+                    animals = [ani for ani in pop_param['pop']
+                               if ani['species'] == population.species_id.name]
+                    columns.append((population, Island.check_columns(
+                        {'age': [ani['age'] for ani in animals],
+                         'weight': [ani['weight'] for ani in animals]})))
+            else:
+                if pop_param['species'] not in ("Herbivore", "Carnivore"):
+                    raise ValueError("'" + pop_param['species'] + "' is not a specie in this "
+                                                                  "simulation!")
+                population = self.herbivores if pop_param['species'] == "Herbivore" \
+                    else self.carnivores
+                columns = [(population, Island.check_columns(pop_param))]
+            if any(len(age) for (_, (age, _)) in columns) and \
+                    not self.landscape_values('availability')[cell]:
+                raise ValueError("Animals can't spawn here at " + str(m) + "," + str(n))
+            for (population, (age, weight)) in columns:
+                population.extend(np.full(len(age), cell), age, weight)
+        self.stats.year = -1
+        self.do_count()
+
+    def simulate_island(self, count=True):
+        """
+        Simulates one year on the whole island. Each step is done for all the animals before the
+        next step starts, not one cell at a time like Island.simulate_island.
+        :param count: bool. If False nothing is added to the population history this year.
+        :return: None
+        """
+        self.year += 1
+        self.fodder = self.landscape_values('f_max').astype(float)
+        self.feeding()
+        self.hunting()
+        for population in (self.herbivores, self.carnivores):
+            self.birth(population)
+        for population in (self.herbivores, self.carnivores):
+            self.migration(population)
+        for population in (self.herbivores, self.carnivores):
+            self.ages_weight(population)
+        for population in (self.herbivores, self.carnivores):
+            self.death(population)
+        if self.stats.active:
+            self.collect_stats()
+        if count:
+            self.do_count()
+
+    def feeding(self):
+        """
+        Herbivores are shuffled and then sorted by cell, soo they eat in random order in each
+        cell. Each Herbivore eats F, or what is left after the Herbivores before it in the same
+        cell.
+        :return: None
+        """
+        herbs = self.herbivores
+        if not len(herbs):
+            return
+        order = herbs.random.permutation(len(herbs))
+        herbs.reorder(order[np.argsort(herbs.cell[order], kind='stable')])
+
+        count = np.bincount(herbs.cell, minlength=len(self.fodder))
+        first = np.cumsum(count) - count
+        eaten_before = herbs.species_id.F * (np.arange(len(herbs)) - first[herbs.cell])
+        foods = np.clip(self.fodder[herbs.cell] - eaten_before, 0, herbs.species_id.F)
+        herbs.weight[:] += herbs.species_id.beta * foods
+        self.fodder -= np.bincount(herbs.cell, foods, minlength=len(self.fodder))
+
+    def hunting(self):
+        """
+        Carnivores hunt in every cell with both Carnivores and Herbivores. The Carnivores are
+        sorted after fitness in each cell, fittest first, and the Herbivores after fitness,
+        lowest first.
+        :return: None
+        """
+        herbs = self.herbivores
+        carns = self.carnivores
+        if not len(herbs) or not len(carns):
+            return
+        herbs.reorder(np.lexsort((herbs.fitness, herbs.cell)))
+        carns.reorder(np.lexsort((-carns.fitness, carns.cell)))
+        cells = np.intersect1d(herbs.cell, carns.cell)
+        herb_start = np.searchsorted(herbs.cell, cells, 'left')
+        herb_end = np.searchsorted(herbs.cell, cells, 'right')
+        carn_start = np.searchsorted(carns.cell, cells, 'left')
+        carn_end = np.searchsorted(carns.cell, cells, 'right')
+
+        alive = np.ones(len(herbs), dtype=bool)
+        for h_0, h_1, c_0, c_1 in zip(herb_start, herb_end, carn_start, carn_end):
+            hunter_weight = carns.weight[c_0:c_1].tolist()
+            hunter_fitness = carns.fitness[c_0:c_1].tolist()
+            eaten = hunt(carns.species_id, carns.random, carns.age[c_0:c_1].tolist(),
+                         hunter_weight, hunter_fitness, herbs.fitness[h_0:h_1].tolist(),
+                         herbs.weight[h_0:h_1].tolist())
+            carns.weight[c_0:c_1] = hunter_weight
+            carns.fitness[c_0:c_1] = hunter_fitness
+            alive[h_0:h_1] = ~eaten
+        if not alive.all():
+            herbs.keep(alive)
+
+    def birth(self, population):
+        """
+        Every animal gets a chance to have a calf, dependent on the number of animals of the
+        same species in it's cell.
+        :param population: class object. The FlatPopulation of one species.
+        :return: None
+        """
+        if not len(population):
+            return
+        params = population.species_id
+        animal_count = np.bincount(population.cell)[population.cell]
+        calf_weight = population.random.gaussian_weights(params.w_birth, params.sigma_birth,
+                                                         len(population))
+        weight = population.weight
+        fitness = population.fitness_update()
+        birth_prop = np.minimum(1.0, params.gamma * fitness * (animal_count - 1))
+        born = (weight > params.zeta * (params.w_birth + params.sigma_birth)) & \
+            (weight > params.xi * calf_weight) & (animal_count >= 2) & \
+            (population.random.random_numbers(len(population)) <= birth_prop)
+        if born.any():
+            weight[born] -= params.xi * calf_weight[born]
+            population.extend(population.cell[born], np.zeros(born.sum(), dtype=np.int64),
+                              calf_weight[born])
+
+    def migration(self, population):
+        """
+        Animals migrate to a random neighbour cell, if they can go there.
+        :param population: class object. The FlatPopulation of one species.
+        :return: None
+        """
+        if not len(population):
+            return
+        fitness = population.fitness_update()
+        movers = np.flatnonzero(population.random.random_numbers(len(population)) <
+                                population.species_id.mu * fitness)
+        # Up, down, right and left
+        steps = np.array([-self.x, self.x, 1, -1])
+        way = np.digitize(population.random.random_numbers(len(movers)), [0.25, 0.50, 0.75])
+        target = population.cell[movers] + steps[way]
+        can_go = self.landscape_values('availability')[target].astype(bool)
+        population.cell[movers[can_go]] = target[can_go]
+
+    @staticmethod
+    def ages_weight(population):
+        """
+        All animals get one year older and lose weight.
+        :param population: class object. The FlatPopulation of one species.
+        :return: None
+        """
+        population.age[:] += 1
+        population.weight[:] -= population.species_id.eta * population.weight
+
+    @staticmethod
+    def death(population):
+        """
+        Checks which animals die, and removes them.
+        :param population: class object. The FlatPopulation of one species.
+        :return: None
+        """
+        if not len(population):
+            return
+        fitness = population.fitness_update()
+        dead = (population.weight <= 0) | \
+            (population.random.random_numbers(len(population)) <=
+             population.species_id.omega * (1 - fitness))
+        if dead.any():
+            population.keep(~dead)
+
+    def cell_counts(self, population):
+        """
+        Gives the number of animals of one species in every cell.
+        :param population: class object. The FlatPopulation of one species.
+        :return: array. Number of animals, with the same shape as the map.
+        """
+        return np.bincount(population.cell, minlength=self.y * self.x).reshape(self.y, self.x)
+
+    def count_map(self):
+        """
+        Gives the number of animals in every cell, like Island.count_map.
+        :return: tuple. Arrays with the number of Herbivores and Carnivores.
+        """
+        return self.cell_counts(self.herbivores), self.cell_counts(self.carnivores)
+
+    def sum_values(self):
+        """
+        Sums the age, weight and fitness of all animals of each species, like
+        Island.sum_values.
+        :return: array. One row per species, with the number of animals and the sums.
+        """
+        return np.array([(len(population), population.age.sum(), population.weight.sum(),
+                          population.fitness.sum())
+                         for population in (self.herbivores, self.carnivores)], dtype=float)
+
+    def do_all_stats(self):
+        """
+        Collect data needed for plotting, in the same order as Island.do_all_stats.
+        :return: list. Containing all the data need to plot one slide of the graphics.
+        """
+        if self.stats.year != self.year:
+            self.collect_stats()
+        return [self.year, self.herbivore_pop_history[-1], self.carnivore_pop_history[-1]] + \
+            self.stats.histograms() + [self.cell_counts(self.herbivores).tolist(),
+                                       self.cell_counts(self.carnivores).tolist()]
+
+    def collect_stats(self):
+        """
+        Adds all animals on the island to the statistics, for the current year.
+        :return: None
+        """
+        self.stats.reset(self.year)
+        for (code, population) in enumerate((self.herbivores, self.carnivores)):
+            self.stats.add(code, population.fitness, population.age, population.weight)
+
+    def do_count(self):
+        """
+        Updates instances of population history of the Herbivores and Carnivores.
+        :return: None
+        """
+        self.herbivore_pop_history.append(len(self.herbivores))
+        self.carnivore_pop_history.append(len(self.carnivores))
+        self.history_years.append(self.year)
+
+    def get_state(self):
+        """
+        Collects the state of the island as arrays, with the same names as Island.get_state.
+        The animals are kept in the order they have now, soo the simulation continues exactly
+        like it would have without the checkpoint.
+        :return: dict. Arrays with the state of the island.
+        """
+        state = {'year': np.array(self.year),
+                 'herbivore_history': np.array(self.herbivore_pop_history, dtype=np.int64),
+                 'carnivore_history': np.array(self.carnivore_pop_history, dtype=np.int64),
+                 'history_years': np.array(self.history_years, dtype=np.int64),
+                 'fodder': self.fodder.copy()}
+        state.update(self.random.get_state())
+        for population in (self.herbivores, self.carnivores):
+            name = population.species_id.name
+            state[name + '_cell'] = population.cell.copy()
+            state[name + '_age'] = population.age.copy()
+            state[name + '_weight'] = population.weight.copy()
+            state[name + '_fitness'] = population.fitness.copy()
+            state[name + '_stage'] = np.zeros(len(population), dtype=np.int8)
+        return state
+
+    def set_state(self, state):
+        """
+        Removes all animals, and puts back the state from get_state. The stages are not used,
+        since the 'flat' engine does the whole annual cycle at once.
+        :param state: dict. Contains the arrays from get_state.
+        :return: None
+        """
+        self.year = int(state['year'])
+        self.herbivore_pop_history = state['herbivore_history'].tolist()
+        self.carnivore_pop_history = state['carnivore_history'].tolist()
+        self.history_years = state['history_years'].tolist()
+        self.random.set_state(state)
+        self.stats.year = -1
+        self.fodder = state['fodder'].astype(float)
+        for population in (self.herbivores, self.carnivores):
+            name = population.species_id.name
+            population.keep(np.zeros(len(population), dtype=bool))
+            population.extend(state[name + '_cell'], state[name + '_age'],
+                              state[name + '_weight'], state[name + '_fitness'])
@@ -6,10 +6,45 @@ __email__ = 'jon.augensen@nmbu.no / lars.overgard@hotmail.com'
 Parts of this code is developed by Copyright (c) 2021 Hans Ekkehard Plesser / NMBU,
 and is used to display our simulation.
 This file contains the class for the plots window and it's features.
+All images, bars, lines and texts are made once, and every update only changes their data.
+With a GUI backend the changed artists are drawn on top of a saved background (blitting), the
+whole figure is only drawn again when an axis limit changes.
+The window is updated at most frame_rate times per second, frames that come faster are dropped
+and the simulation never waits for the window. Without a window, nothing is drawn except the
+images that are saved.
+PlotProcess runs a Plot in a render process instead. The simulation puts a snapshot of every
+visualized year in a bounded queue and continues, while the render process draws and saves the
+frames on another core. The simulation only waits when the queue is full.
+With a movie_file, the frames are sent straight to ffmpeg by a VideoWriter instead of being
+saved as images.
 """
 
+import atexit
+import multiprocessing
+import queue
+import time
 import matplotlib.pyplot as plt
+import numpy as np
 import os
+from .stats import bin_edges
+from .video_writer import VideoWriter
+
+HERBIVORE_RANGE = [5, 20, 60, 100, 150, 200]
+CARNIVORE_RANGE = [2, 10, 20, 30, 40, 50]
+COLOR_MAX = {'Herbivore': HERBIVORE_RANGE[-1], 'Carnivore': CARNIVORE_RANGE[-1]}
+#                               R    G    B
+HERBIVORE_COLORS = np.array([(1.0, 1.0, 1.0),  # white
+                             (0.0, 1.0, 0.0),  # green 20%
+                             (0.0, 0.8, 0.0),  # green 40%
+                             (0.0, 0.6, 0.0),  # green 60%
+                             (0.0, 0.4, 0.0),  # green 80%
+                             (0.0, 0.2, 0.0)])  # green 100%
+CARNIVORE_COLORS = np.array([(1.0, 1.0, 1.0),  # white
+                             (1.0, 0.0, 0.0),  # red 20%
+                             (0.8, 0.0, 0.0),  # red 40%
+                             (0.6, 0.0, 0.0),  # red 60%
+                             (0.4, 0.0, 0.0),  # red 80%
+                             (0.2, 0.0, 0.0)])  # red 100%
 
 
 class Plot:
@@ -17,17 +52,27 @@ class Plot:
     Here we create plots for visualization
     """
     def __init__(self, map_layout, vis_years, img_years, img_fmt, img_dir, img_base, hist_specs,
-                 ymax_ani, cmax_ani):
+                 ymax_ani, cmax_ani, frame_rate=10, movie_file=None, movie_fps=10):
         """
         This docstring belongs to Plot __init__ it creates the plot layout and creates and adds
         the simulation map.
         Removes all axes, adds text and creates a folder for images, if asked for and there is
-        no folder with the given name.
+        no folder with the given name. Old images with the same img_base in it are removed.
         :param map_layout: string. Contains the map layout.
         :param img_years: int. Tells which years that will be saved of the plots.
         :param img_fmt: string. The format to the images being saved.
-        :param img_dir: string. Gives which folder the images are saved to.
+        :param img_dir: string. Gives which folder the images are saved to, as
+        os.path.join(img_dir, f'{img_base}_{img_number:05d}.{img_fmt}').
         :param img_base: string. Gives the name, the images will be saved with.
+        :param cmax_ani: dict. Top of the color scale of the distribution maps, by species, like
+        {'Herbivore': 50, 'Carnivore': 20}. The color levels of HERBIVORE_RANGE and
+        CARNIVORE_RANGE are scaled soo the last one is cmax, soo the darkest color is used from
+        3/4 of cmax for Herbivores and 4/5 of cmax for Carnivores. The defaults are 200 and 50.
+        :param frame_rate: float. Highest number of updates of the window per second, every
+        update is shown if None.
+        :param movie_file: string. If given, the frames of img_years are written to this movie
+        instead of image files.
+        :param movie_fps: int. Frames per second in the movie.
         """
         self.map = map_layout
         self.vis_years = vis_years
@@ -36,11 +81,18 @@ class Plot:
         self.img_dir = img_dir
         self.img_base = img_base
         self.hist_specs = hist_specs
+        self.edges = bin_edges(hist_specs)
         self.ymax_counter = ymax_ani
         self.color_max_ani = cmax_ani
+        # The color levels, scaled soo the last one is cmax of the species
+        cmax = dict(COLOR_MAX, **(cmax_ani or {}))
+        self.herbivore_range = np.array(HERBIVORE_RANGE) * cmax['Herbivore'] / HERBIVORE_RANGE[-1]
+        self.carnivore_range = np.array(CARNIVORE_RANGE) * cmax['Carnivore'] / CARNIVORE_RANGE[-1]
         self.years_saved = 0
+        self.video = None
 
         fig = plt.figure(constrained_layout=True)
+        self.fig = fig
         gs = fig.add_gridspec(3, 3)
         # Subplots
         self.ax_years_counted = fig.add_subplot(gs[0, 0])
@@ -60,8 +112,6 @@ class Plot:
         self.ax_weight = fig.add_subplot(gs[2, 2])
         self.ax_weight.set_title("Weight")
 
-        self.path_name = ''
-
         axes = [self.ax_map, self.ax_years_counted, self.ax_carni_distribution, self.ax_pop_counted,
                 self.ax_herbi_distribution]
 
@@ -103,134 +153,220 @@ class Plot:
                                                 verticalalignment='center',
                                                 transform=self.ax_pop_counted.transAxes)
 
-        if self.ymax_counter:
-            self.ax_animal_counter.set_ylim(0, self.ymax_counter)
-        if self.hist_specs:
-            print("This simulator does not support modification of histograms yet!")
-        if self.color_max_ani:
-            print("This simulator does not support modification of colormap yet!")
+        # Images, bars and lines are made once, updates only change their data
+        map_rows = self.map.splitlines()
+        blank = np.ones((len(map_rows), len(map_rows[0]), 3))
+        self.img_herbi = self.ax_herbi_distribution.imshow(blank, interpolation='nearest')
+        self.img_carni = self.ax_carni_distribution.imshow(blank, interpolation='nearest')
+
+        self.hist_axes = {'age': self.ax_age, 'fitness': self.ax_fitness,
+                          'weight': self.ax_weight}
+        self.hist_bars = {}
+        for name, ax in self.hist_axes.items():
+            edges = self.edges[name]
+            self.hist_bars[name] = [ax.bar(edges[:-1], np.zeros(len(edges) - 1),
+                                           width=np.diff(edges), align='edge', color=color,
+                                           alpha=0.5) for color in ('g', 'r')]
+            ax.set_xlim(edges[0], edges[-1])
+            ax.set_ylim(0, 1)
+
+        self.counter = np.zeros((3, 0))
+        self.counter_size = 0
+        (self.line_herbi,) = self.ax_animal_counter.plot([], [], 'go', markersize=4, alpha=0.5)
+        (self.line_carni,) = self.ax_animal_counter.plot([], [], 'ro', markersize=4, alpha=0.5)
+        self.ax_animal_counter.set_xlim(0, max(10 * self.vis_years, 1))
+        self.ax_animal_counter.set_ylim(0, self.ymax_counter or 1)
+
+        self.animated = [self.txt_year, self.txt_pop, self.img_herbi, self.img_carni,
+                         self.line_herbi, self.line_carni]
+        for bars in self.hist_bars.values():
+            for bar_container in bars:
+                self.animated.extend(bar_container.patches)
+        # Blitting needs a canvas in a window, it's not used when the figure is only saved
+        self.interactive = fig.canvas.required_interactive_framework is not None
+        self.blit = self.interactive and fig.canvas.supports_blit
+        self.background = None
+        self.frame_rate = frame_rate
+        self.next_frame = 0.0
+        self.frames_dropped = 0
+        self.limits_changed = True
+        if self.interactive:
+            plt.show(block=False)
+        if self.blit:
+            for artist in self.animated:
+                artist.set_animated(True)
+            fig.canvas.mpl_connect('resize_event', self.forget_background)
 
         if self.img_years % self.vis_years != 0:
             raise ValueError("'img_years' must be a multiple of 'vis_years'!")
 
-        if self.img_years and self.img_years != 0 and self.img_dir:
-            if os.path.isdir('../' + self.img_dir + '/') and self.img_dir != ".":
-                for f in os.listdir('../' + self.img_dir + '/'):
-                    os.remove(os.path.join('../' + self.img_dir + '/', f))
-                self.path_name = '../' + self.img_dir + '/'
-            elif not os.path.isdir('../' + self.img_dir + '/') and self.img_dir != ".":
-                os.mkdir('../' + self.img_dir + '/')
-                self.path_name = '../' + self.img_dir + '/'
-            if self.img_dir == ".":
-                self.path_name = ''
+        if self.img_years and self.img_years != 0 and self.img_dir and self.img_base:
+            os.makedirs(self.img_dir, exist_ok=True)
+            # Images from an earlier simulation with the same name would end up in the movie
+            for f in os.listdir(self.img_dir):
+                if f.startswith(self.img_base + '_') and f.endswith('.' + self.img_fmt):
+                    os.remove(os.path.join(self.img_dir, f))
+
+        if movie_file and self.img_years:
+            fig.canvas.draw()
+            (height, width) = np.asarray(fig.canvas.buffer_rgba()).shape[:2]
+            self.video = VideoWriter(movie_file, width, height, movie_fps)
+
+    def forget_background(self, event=None):
+        """
+        Throws away the saved background, soo the whole figure is drawn at the next update.
+        :param event: Event. The resize event, not used.
+        :return: None
+        """
+        self.background = None
 
     def update_animal_counter(self, years):
         """
         Updates the animal counter, with both herbivores and carnivores.
         Adds a point for each species, each time the function is called. (x, y) is taken from the
-        year and total amount of animal of one specie.
+        year and total amount of animal of one specie. The points are kept in an array that
+        doubles in size when it's full, and the two lines get the new data.
         :param years: int. The current year being displayed.
-        :return: None
+        :return: bool. True if the axis limits changed, soo the whole figure must be drawn.
         """
-        self.ax_animal_counter.plot(years, self.herbivore_count, 'go', markersize=4, alpha=0.5)
-        self.ax_animal_counter.plot(years, self.carnivore_count, 'ro', markersize=4, alpha=0.5)
+        if self.counter_size == self.counter.shape[1]:
+            counter = np.zeros((3, max(2 * self.counter_size, 64)))
+            counter[:, :self.counter_size] = self.counter[:, :self.counter_size]
+            self.counter = counter
+        self.counter[:, self.counter_size] = (years, self.herbivore_count, self.carnivore_count)
+        self.counter_size += 1
+        (years_list, herbivores, carnivores) = self.counter[:, :self.counter_size]
+        self.line_herbi.set_data(years_list, herbivores)
+        self.line_carni.set_data(years_list, carnivores)
+
+        changed = False
+        (x_min, x_max) = self.ax_animal_counter.get_xlim()
+        if years > x_max:
+            self.ax_animal_counter.set_xlim(x_min, max(2 * x_max, years))
+            changed = True
+        top = max(self.herbivore_count, self.carnivore_count)
+        if not self.ymax_counter and top > self.ax_animal_counter.get_ylim()[1]:
+            self.ax_animal_counter.set_ylim(0, 1.25 * top)
+            changed = True
+        return changed
 
     def update_distribution(self, herbi_distribution, carni_distribution):
         """
         Updates the distribution maps and show a color which tells how many animals there is at a
-        given cell. These color are taken from dictionary with rgb values.
-        :param herbi_distribution: list. A nested list with all total amount of herbivores at
-        a current cell.
-        :param carni_distribution: list.A nested list with all total amount of carnivores at
-        a current cell.
+        given cell. The color of every cell is picked from the color arrays with the levels from
+        adjust_distribution, the maps given are not changed.
+        :param herbi_distribution: list or array. The total amount of herbivores at every cell.
+        :param carni_distribution: list or array. The total amount of carnivores at every cell.
         :return: None
         """
-        herbivore_range = [5, 20, 60, 100, 150, 200]
-        carnivore_range = [2, 10, 20, 30, 40, 50]
-        herbivore_distribution = self.adjust_distribution(herbi_distribution, herbivore_range)
-        carnivore_distribution = self.adjust_distribution(carni_distribution, carnivore_range)
-        rgb_value_h = {0: (1.0, 1.0, 1.0),  # white
-                       1: (0.0, 1.0, 0.0),  # green 20%
-                       2: (0.0, 0.8, 0.0),  # green 40%
-                       3: (0.0, 0.6, 0.0),  # green 60%
-                       4: (0.0, 0.4, 0.0),  # green 80%
-                       5: (0.0, 0.2, 0.0)}  # green 100%
-        map_rgb_h = [[rgb_value_h[column] for column in row] for row in herbivore_distribution]
-
-        rgb_value_c = {0: (1.0, 1.0, 1.0),  # white
-                       1: (1.0, 0.0, 0.0),  # red 20%
-                       2: (0.8, 0.0, 0.0),  # red 40%
-                       3: (0.6, 0.0, 0.0),  # red 60%
-                       4: (0.4, 0.0, 0.0),  # red 80%
-                       5: (0.2, 0.0, 0.0)}  # red 100%
-        map_rgb_c = [[rgb_value_c[column] for column in row] for row in carnivore_distribution]
-
-        self.ax_herbi_distribution.imshow(map_rgb_h)
-        self.ax_carni_distribution.imshow(map_rgb_c)
+        self.img_herbi.set_data(HERBIVORE_COLORS[self.adjust_distribution(herbi_distribution,
+                                                                          self.herbivore_range)])
+        self.img_carni.set_data(CARNIVORE_COLORS[self.adjust_distribution(carni_distribution,
+                                                                          self.carnivore_range)])
 
     def update_histograms(self, h_age, c_age, h_fit, c_fit, h_weg, c_weg):
         """
-        Updates all the histograms.
-        First it clears all the histograms, then updates the titles and then applies all the values.
-        :param h_age: list. A list with all ages for herbivores.
-        :param c_age: list. A list with all ages for carnivores.
-        :param h_fit: list. A list with all fitness' values for herbivores.
-        :param c_fit: list. A list with all fitness' values for carnivores.
-        :param h_weg: list. A list with all weights for herbivores.
-        :param c_weg: list. A list with all weights for carnivores.
+        Updates all the histograms, by changing the height of the bars.
+        The values are the counts in the bins of hist_specs, already counted by the island.
+        The y-axis grows when a bar is higher than it, and shrinks when all bars are below a
+        quarter of it.
+        :param h_age: array. Number of herbivores in every age bin.
+        :param c_age: array. Number of carnivores in every age bin.
+        :param h_fit: array. Number of herbivores in every fitness bin.
+        :param c_fit: array. Number of carnivores in every fitness bin.
+        :param h_weg: array. Number of herbivores in every weight bin.
+        :param c_weg: array. Number of carnivores in every weight bin.
+        :return: bool. True if the axis limits changed, soo the whole figure must be drawn.
+        """
+        changed = False
+        for (name, counts) in (('age', (h_age, c_age)), ('fitness', (h_fit, c_fit)),
+                               ('weight', (h_weg, c_weg))):
+            for (bar_container, species_counts) in zip(self.hist_bars[name], counts):
+                for (patch, height) in zip(bar_container.patches, np.asarray(species_counts)):
+                    patch.set_height(height)
+            top = max(max(counts[0]), max(counts[1]), 1)
+            ax = self.hist_axes[name]
+            if top > ax.get_ylim()[1] or top < ax.get_ylim()[1] / 4:
+                ax.set_ylim(0, 1.25 * top)
+                changed = True
+        return changed
+
+    def draw_frame(self, full):
+        """
+        Shows the updated figure. With blitting, the background is restored and only the changed
+        artists are drawn, unless full is True or there is no background yet.
+        :param full: bool. True if the whole figure must be drawn.
         :return: None
         """
-        self.ax_age.cla()
-        self.ax_age.set_title("Age")
-        self.ax_age.hist(h_age, 20, color='g', alpha=0.5)
-        self.ax_age.hist(c_age, 20, color='r', alpha=0.5)
+        canvas = self.fig.canvas
+        if not self.blit:
+            canvas.draw_idle()
+            return
+        if full or self.background is None:
+            canvas.draw()
+            self.background = canvas.copy_from_bbox(self.fig.bbox)
+        else:
+            canvas.restore_region(self.background)
+        for artist in self.animated:
+            self.fig.draw_artist(artist)
+        canvas.blit(self.fig.bbox)
 
-        self.ax_fitness.cla()
-        self.ax_fitness.set_title("Fitness")
-        self.ax_fitness.hist(h_fit, 20, color='g', alpha=0.5)
-        self.ax_fitness.hist(c_fit, 20, color='r', alpha=0.5)
+    def save_frame(self, file_name=None):
+        """
+        Saves the figure to a file, or sends it to the movie. Animated artists are not drawn by
+        savefig, soo they are made normal while saving.
+        :param file_name: str. Name of the image file, the frame goes to the movie if None.
+        :return: None
+        """
+        for artist in self.animated:
+            artist.set_animated(False)
+        if file_name is None:
+            self.fig.canvas.draw()
+            self.video.write(np.asarray(self.fig.canvas.buffer_rgba()))
+        else:
+            self.fig.savefig(file_name)
+        for artist in self.animated:
+            artist.set_animated(self.blit)
+        self.background = None
 
-        self.ax_weight.cla()
-        self.ax_weight.set_title("Weight")
-        self.ax_weight.hist(h_weg, 20, color='g', alpha=0.5)
-        self.ax_weight.hist(c_weg, 20, color='r', alpha=0.5)
+    def wait(self):
+        """
+        Nothing to wait for, the frames are drawn right away. It's here soo Plot and PlotProcess
+        can be used the same way.
+        :return: None
+        """
+
+    def close(self):
+        """
+        Finishes the movie, if there is one.
+        :return: None
+        """
+        if self.video:
+            self.video.close()
 
     @staticmethod
     def adjust_distribution(map_distribution, h_or_c_range_list):
         """
         Needed to give update_distribution function values to update the distribution map with
         colors specified at an amount of animals.
-        :param map_distribution: list. A nested list with the amount of animals of a species at
-        all cells.
+        A cell gets level 0 below the first value of h_or_c_range_list, level 1 below the second
+        and soo on, up to level 5 from the fifth value. The last value is not used.
+        :param map_distribution: list or array. The amount of animals of a species at all cells.
         :param h_or_c_range_list: list. Decides at what levels the color will be set at.
-        :return: list. A nested list, with values to update the distribution map with colors.
-        """
-        y_len = len(map_distribution)
-        x_len = len(map_distribution[0])
-        for m in range(y_len):
-            for n in range(x_len):
-                if map_distribution[m][n] < h_or_c_range_list[0]:
-                    map_distribution[m][n] = 0
-                elif map_distribution[m][n] < h_or_c_range_list[1]:
-                    map_distribution[m][n] = 1
-                elif map_distribution[m][n] < h_or_c_range_list[2]:
-                    map_distribution[m][n] = 2
-                elif map_distribution[m][n] < h_or_c_range_list[3]:
-                    map_distribution[m][n] = 3
-                elif map_distribution[m][n] < h_or_c_range_list[4]:
-                    map_distribution[m][n] = 4
-                else:
-                    map_distribution[m][n] = 5
-
-        return map_distribution
-
-    def update_plot(self, data_list):
+        :return: array. The level of every cell, from 0 to 5.
+        """
+        return np.digitize(map_distribution, h_or_c_range_list[:5])
+
+    def update_plot(self, data_list, force=False):
         """
         Used to update plots to show current years data. Updates year, population, distribution of
         species, and histograms of age, fitness and weight for herbivores and carnivores.
         If given, it will also store a picture of the plot after it is updated, in a given folder.
+        The animal counter always gets the new point. The rest is only updated when the window
+        is due for a new frame or an image is saved, if not the frame is dropped.
         :param data_list: list. This list contains all the data needed for updating all the plots,
         with dynamic plots.
+        :param force: bool. If True, the plots are updated and shown even if it's too early.
         :return: None
         """
         self.years_total = data_list[0]
@@ -238,19 +374,192 @@ class Plot:
         self.carnivore_count = data_list[2]
         herbi_distribution = data_list[9]
         carni_distribution = data_list[10]
+        self.limits_changed |= self.update_animal_counter(self.years_total)
+
+        save = bool(self.img_years and self.years_total % self.img_years == 0 and
+                    (self.video or self.img_dir and self.img_base))
+        now = time.perf_counter()
+        show = self.interactive and (force or now >= self.next_frame)
+        if not (show or save or force):
+            self.frames_dropped += 1
+            return
 
         self.txt_year.set_text(self.timer.format(self.years_total))
         self.txt_pop.set_text(self.population.format(self.herbivore_count + self.carnivore_count))
         self.update_distribution(herbi_distribution, carni_distribution)
-        self.update_animal_counter(self.years_total)
-        self.update_histograms(data_list[4], data_list[7], data_list[3], data_list[6], data_list[5],
-                               data_list[8])
-        plt.draw()
-        plt.pause(1)
-        if self.img_years and self.years_total % self.img_years == 0 and self.img_years != 0 and \
-                self.img_dir and self.img_base:
-            if self.vis_years == 0:
-                return
-            plt.savefig(self.path_name + self.img_base + "_0000" +
-                        str(self.years_saved) + "." + self.img_fmt)
+        self.limits_changed |= self.update_histograms(data_list[4], data_list[7], data_list[3],
+                                                      data_list[6], data_list[5], data_list[8])
+        if show:
+            self.draw_frame(self.limits_changed)
+            self.limits_changed = False
+            # Handles the window events without waiting, the simulation continues right away
+            self.fig.canvas.flush_events()
+            if self.frame_rate:
+                self.next_frame = now + 1 / self.frame_rate
+        if save:
+            if self.video:
+                self.save_frame()
+            else:
+                file_name = f'{self.img_base}_{self.years_saved:05d}.{self.img_fmt}'
+                self.save_frame(os.path.join(self.img_dir, file_name))
             self.years_saved += 1
+
+
+def snapshot(data_list):
+    """
+    Makes a compact copy of the data from do_all_stats, to be sent to the render process.
+    The distribution maps are made into integer arrays instead of nested lists.
+    :param data_list: list. Data from do_all_stats.
+    :return: list. The same data, with the maps as arrays.
+    """
+    return list(data_list[:9]) + [np.asarray(data_list[9], dtype=np.int32),
+                                  np.asarray(data_list[10], dtype=np.int32)]
+
+
+def plot_worker(snapshots, connection, plot_args):
+    """
+    Runs in the render process. Makes the Plot, then updates it with the snapshots from the
+    queue until it gets None. 'wait' is answered with None when all snapshots before it are
+    drawn. An error is sent back and stops the process, soo it's raised in the main process.
+    :param snapshots: Queue. Snapshots and force, see PlotProcess.update_plot.
+    :param connection: Connection. Tells the main process if the Plot was made, and sends
+    answers and errors.
+    :param plot_args: tuple. Arguments for Plot.
+    :return: None
+    """
+    try:
+        plot = Plot(*plot_args)
+        connection.send(None)
+        while True:
+            message = snapshots.get()
+            if message is None:
+                break
+            elif message == 'wait':
+                connection.send(None)
+            else:
+                (data_list, force) = message
+                plot.update_plot(data_list, force)
+        plot.close()
+        plt.close(plot.fig)
+    except Exception as error:
+        connection.send(error)
+    connection.close()
+
+
+class PlotProcess:
+    """
+    Runs a Plot in a render process, with the same interface as Plot.
+    """
+    def __init__(self, map_layout, vis_years, img_years, img_fmt, img_dir, img_base, hist_specs,
+                 ymax_ani, cmax_ani, frame_rate=10, movie_file=None, movie_fps=10,
+                 queue_size=8):
+        """
+        This docstring belongs to PlotProcess __init__ it starts the render process, and waits
+        until it has made the Plot. The parameters are the same as for Plot.
+        :param queue_size: int. Highest number of snapshots waiting to be drawn, the simulation
+        waits when the queue is full.
+        """
+        if type(queue_size) != int or queue_size < 1:
+            raise ValueError("queue_size must be a positive whole number!")
+        self.queue = multiprocessing.Queue(queue_size)
+        (self.connection, worker_connection) = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=plot_worker, daemon=True,
+                                               args=(self.queue, worker_connection,
+                                                     (map_layout, vis_years, img_years, img_fmt,
+                                                      img_dir, img_base, hist_specs, ymax_ani,
+                                                      cmax_ani, frame_rate, movie_file,
+                                                      movie_fps)))
+        self.process.start()
+        self.receive()
+        atexit.register(self.close)
+
+    def stopped(self, error):
+        """
+        Cleans up after the render process has stopped, and raises it's error.
+        :param error: Exception. The error from the render process, or None if it stopped
+        without one.
+        :return: None
+        """
+        # Snapshots nobody will read must not keep the main process from exiting
+        self.queue.cancel_join_thread()
+        self.process.join()
+        atexit.unregister(self.close)
+        if error is None:
+            error = RuntimeError("The render process has stopped!")
+        raise error
+
+    def check(self):
+        """
+        Raises the error of the render process, if it has stopped.
+        :return: None
+        """
+        if self.connection.poll() or not self.process.is_alive():
+            try:
+                error = self.connection.recv() if self.connection.poll() else None
+            except EOFError:
+                error = None
+            self.stopped(error)
+
+    def receive(self):
+        """
+        Waits for the answer from the render process, while checking that it's still running.
+        :return: None
+        """
+        while not self.connection.poll(0.1):
+            if not self.process.is_alive():
+                self.check()
+        try:
+            answer = self.connection.recv()
+        except EOFError:
+            answer = RuntimeError("The render process has stopped!")
+        if answer is not None:
+            self.stopped(answer)
+
+    def put(self, message):
+        """
+        Puts a message in the queue, waits while it's full, but raises the error if the render
+        process stops.
+        :param message: Snapshot, 'wait' or None.
+        :return: None
+        """
+        while True:
+            self.check()
+            try:
+                self.queue.put(message, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def update_plot(self, data_list, force=False):
+        """
+        Puts a snapshot of the data in the queue, the render process draws it. Waits if the queue
+        is full.
+        :param data_list: list. Data from do_all_stats.
+        :param force: bool. If True, the frame is shown even if it's too early.
+        :return: None
+        """
+        self.put((snapshot(data_list), force))
+
+    def wait(self):
+        """
+        Waits until the render process has drawn and saved all the snapshots in the queue.
+        :return: None
+        """
+        self.put('wait')
+        self.receive()
+
+    def close(self):
+        """
+        Draws the last snapshots, finishes the movie and stops the render process.
+        :return: None
+        """
+        atexit.unregister(self.close)
+        if self.process.is_alive():
+            self.put(None)
+            self.process.join()
+            try:
+                error = self.connection.recv() if self.connection.poll() else None
+            except EOFError:
+                error = None
+            if error is not None:
+                self.stopped(error)
@@ -8,35 +8,65 @@ This file contains the class for the island or other geographies that can be use
 population simulator.
 This class makes the island, makes the map, adds population, simulates and collects data from
 the simulation.
+The island keeps a set of the cells with animals in them, soo only these cells are simulated and
+counted every year.
 """
 
-from .biome import Biomes
+import gc
+import heapq
+import itertools
+import numpy as np
+from .biome import Biomes, make_landscapes
+from .animals import make_species
+from .math_funcs import RandomStream, default_stream
+from .stats import StatsAccumulator
 
 
 class Island:
     """
     Here we create our island class
     """
-    def __init__(self, layout):
+    def __init__(self, layout, engine='object', seed=None, hist_specs=None):
         """
         This docstring belongs to Island __init__ it splits the layout too makes it in to a list
         containing strings.
         Calculates the height and the width of the map and stores these and
         makes a empty map based of these numbers.
-        Making instances for keeping track of the year and population history over time.
+        Making instances for keeping track of the year and population history over time, and
+        the set of active cells, which are the cells with animals. history_years has the year of
+        every count in the population history.
+        strip is the first row and the row after the last row that this island simulates, it's
+        only smaller than the whole map when the island is a part of a ParallelIsland.
         :param layout: str. A layout of the geography of the environment.
+        :param engine: str. How the cells store their animals, 'object', 'array' or
+        'vectorized'.
+        :param seed: int. Seed of the island's random stream, the shared default_stream is used
+        if None.
+        :param hist_specs: dict. Bins of the histograms in the statistics, see stats.py.
+        The island has it's own species and landscape classes, which all it's cells and animals
+        use, soo set_animal_parameters and set_landscape_parameters only change this island.
+        It also has it's own random stream, soo two islands don't draw from the same numbers.
         """
         self.map = layout.split()
+        self.engine = engine
         self.y = len(layout.split())
 
         temp_map = layout.split()
         self.x = len(temp_map[0])
 
-        self.cell = [[Biomes(m, n, "W") for n in range(self.x)] for m in range(self.y)]
+        self.species = make_species()
+        self.landscapes = make_landscapes()
+        self.random = default_stream if seed is None else RandomStream(seed)
+        self.cell = [[Biomes(m, n, "W", self.engine, self.species, self.landscapes, self.random)
+                      for n in range(self.x)] for m in range(self.y)]
 
+        self.stats = StatsAccumulator(hist_specs)
+        self.active_cells = set()
+        self.strip = (0, self.y)
         self.year = 0
         self.herbivore_pop_history = []
         self.carnivore_pop_history = []
+        self.history_years = []
 
     def make_island(self):
         """
@@ -44,26 +74,66 @@ class Island:
         then inputs a biome object to the corresponding cell, with data of the landtype.
         :return: None
         """
+        self.check_layout(self.map)
         for m in range(self.y):
-            if len(self.map[m]) != self.x:
+            for n in range(self.x):
+                self.cell[m][n] = Biomes(m, n, self.map[m][n], self.engine, self.species,
+                                         self.landscapes, self.random)
+        for row in self.cell:
+            for cell in row:
+                cell.island_map = self.cell
+        self.stats.year = -1
+
+    @staticmethod
+    def check_layout(map_rows):
+        """
+        Checks if the layout contains equal string length and has a boundary of water or fence
+        all the way around.
+        :param map_rows: list. The rows of the layout, as strings.
+        :return: None
+        """
+        y = len(map_rows)
+        x = len(map_rows[0])
+        for m in range(y):
+            if len(map_rows[m]) != x:
                 raise ValueError("Map has unequal width!")
-            elif (m == 0 or m == self.y-1) and ("D" in self.map[m] or "L" in self.map[m] or
-                                                "H" in self.map[m] or "M" in self.map[m]):
+            elif (m == 0 or m == y-1) and ("D" in map_rows[m] or "L" in map_rows[m] or
+                                           "H" in map_rows[m] or "M" in map_rows[m]):
                 raise ValueError("Map has no boundary at row " + str(m + 1))
             else:
-                for n in range(self.x):
-                    if (n == 0 or n == self.x-1) and self.map[m][n] != "W" and self.map[m][n] != \
-                            "F":
+                for n in range(x):
+                    if (n == 0 or n == x-1) and map_rows[m][n] != "W" and map_rows[m][n] != "F":
                         raise ValueError("Map has no boundary at", (n+1, m+1))
-                    else:
-                        self.cell[m][n] = Biomes(m, n, self.map[m][n])
 
-        Biomes.island_map = self.cell
+    @staticmethod
+    def check_columns(pop_param):
+        """
+        Checks the ages and weights of animals given as columns, for all the animals at once.
+        :param pop_param: dictionary. Contains 'species', 'age' and 'weight', where age and weight
+        are arrays or lists with one value per animal.
+        :return: tuple. The ages and the weights as arrays.
+        """
+        age = np.asarray(pop_param['age'], dtype=float)
+        weight = np.asarray(pop_param['weight'], dtype=float)
+        if age.ndim != 1 or age.shape != weight.shape:
+            raise ValueError("Ages and weights must have the same length!")
+        if np.isnan(weight).any():
+            raise ValueError("Animals must have a weight!")
+        if (weight < 0).any():
+            raise ValueError("Animals can't have negative weight!")
+        if (age != np.floor(age)).any():
+            raise ValueError("Animals must have a whole number as age!")
+        if (age < 0).any():
+            raise ValueError("Animals can't have negative age!")
+        return age.astype(np.int64), weight
 
     def add_pop(self, params):
         """
         Adds animals to a given location with specified parameters.
-        Tells the object in a given cell do to add_animal function
+        Tells the object in a given cell do to add_animal function.
+        A location can also be given with columns instead of a 'pop' list, like
+        {'loc': (2, 3), 'species': 'Herbivore', 'age': array, 'weight': array}, then all the
+        animals are checked once and added with add_animals.
         :param params: list. Contains a list with dictionaries of animals that should be added to
         island. Dictionaries contain location and parameters of the animal(s).
         :return: None
@@ -74,77 +144,211 @@ class Island:
                 raise ValueError(str(m) + " is not a valid Y coordinate")
             elif n > self.x:
                 raise ValueError(str(n) + " is not a valid X coordinate")
-            else:
+            elif 'pop' in pop_param:
                 for ani in pop_param['pop']:
                     self.cell[m - 1][n - 1].add_animal(ani)
+            else:
+                (age, weight) = self.check_columns(pop_param)
+                self.cell[m - 1][n - 1].add_animals(pop_param['species'], age, weight)
+            if self.cell[m - 1][n - 1].has_animals():
+                self.active_cells.add((m - 1, n - 1))
+        self.stats.year = -1
         self.do_count()
 
-    def simulate_island(self):
+    def simulate_island(self, count=True):
         """
-        Simulates on year, in every cell of the map.
+        Simulates on year, in every active cell of the map.
         Updates the year count, and updates land and list before the annual cycle of the
         cell is started.
+        The cells are simulated in the same order as the map, row by row. A cell that gets
+        migrants is made active, and if it comes later in the map it's simulated this year too.
+        Cells without animals after their annual cycle are removed from the active cells.
+        Empty cells are not refreshed, but their fodder is refreshed before their first annual
+        cycle with animals.
+        If the statistics are active, they are collected from every cell when all the cells are
+        done, soo animals that migrated to a cell that was already simulated are counted too.
+        :param count: bool. If False the animals are not counted, and nothing is added to the
+        population history this year.
         :return: None
         """
         self.year += 1
-        for m in range(self.y):
-            for n in range(self.x):
-                self.cell[m][n].refresh_land()
-                self.cell[m][n].order_lists()
-                self.cell[m][n].life_cycle()
-        self.do_count()
+        queue = sorted(self.active_cells)
+        while queue:
+            (m, n) = heapq.heappop(queue)
+            self.cell[m][n].refresh_land()
+            self.cell[m][n].order_lists()
+            self.cell[m][n].life_cycle()
+            for neighbour in ((m - 1, n), (m + 1, n), (m, n - 1), (m, n + 1)):
+                if neighbour not in self.active_cells and \
+                        self.cell[neighbour[0]][neighbour[1]].has_animals():
+                    self.active_cells.add(neighbour)
+                    if neighbour > (m, n) and self.strip[0] <= neighbour[0] < self.strip[1]:
+                        heapq.heappush(queue, neighbour)
+            if not self.cell[m][n].has_animals():
+                self.active_cells.discard((m, n))
+        if self.stats.active:
+            self.collect_stats()
+        if count:
+            self.do_count()
 
     def do_all_stats(self):
         """
-        Collect data needed for plotting. Iterates through each cell of the map.
+        Collect data needed for plotting. The histograms are taken from the statistics, if
+        they were not collected at the end of this year's annual cycle they are collected now, from
+        each active cell in the same order as the map.
         :return: list. Containing all the data need to plot one slide of the graphics.
 
-        Data being returned is year, population of Herbivores and Carnivores, list of fitness,
-        weight and age for both all Herbivores and Carnivores,
-        and a map of all the Herbivores and Carnivores
+        Data being returned is year, population of Herbivores and Carnivores, histogram counts
+        of fitness, age and weight for the Herbivores and then for the Carnivores, with the bins
+        in stats.edges, and a map of all the Herbivores and Carnivores
         """
-        herbivore_map = [[0 for _ in range(self.x)] for _ in range(self.y)]
-        carnivore_map = [[0 for _ in range(self.x)] for _ in range(self.y)]
-
-        island_h_fitness_list = []
-        island_h_age_list = []
-        island_h_weight_list = []
-
-        island_c_fitness_list = []
-        island_c_age_list = []
-        island_c_weight_list = []
-
-        for m in range(self.y):
-            for n in range(self.x):
-                herbivore_map[m][n] = len(self.cell[m][n].herbivore_list)
-                carnivore_map[m][n] = len(self.cell[m][n].carnivore_list)
-
-                island_h_fitness_list.extend(self.cell[m][n].h_fitness_list)
-                island_h_age_list.extend(self.cell[m][n].h_weight_list)
-                island_h_weight_list.extend(self.cell[m][n].h_age_list)
-
-                island_c_fitness_list.extend(self.cell[m][n].c_fitness_list)
-                island_c_age_list.extend(self.cell[m][n].c_weight_list)
-                island_c_weight_list.extend(self.cell[m][n].c_age_list)
+        if self.stats.year != self.year:
+            self.collect_stats()
+        (herbivore_map, carnivore_map) = self.count_map()
+        return [self.year, self.herbivore_pop_history[-1], self.carnivore_pop_history[-1]] + \
+            self.stats.histograms() + [herbivore_map.tolist(), carnivore_map.tolist()]
 
-        return [self.year, self.herbivore_pop_history[-1], self.carnivore_pop_history[-1],
-                island_h_fitness_list, island_h_age_list, island_h_weight_list,
-                island_c_fitness_list, island_c_age_list, island_c_weight_list, herbivore_map,
-                carnivore_map]
+    def collect_stats(self):
+        """
+        Collects the statistics of all animals on the island, at the end of the year if they are
+        active, or when they are asked for.
+        :return: None
+        """
+        self.stats.reset(self.year)
+        for (m, n) in sorted(self.active_cells):
+            self.cell[m][n].count_stats(self.stats)
 
     def do_count(self):
         """
-        Sums up all the Herbivores and Carnivores on the map, then updates instances of
+        Sums up all the Herbivores and Carnivores in the active cells, then updates instances of
         population history of the Herbivores and Carnivores.
         :return: None
         """
         herbivore_count = 0
         carnivore_count = 0
 
-        for m in range(self.y):
-            for n in range(self.x):
-                herbivore_count += len(self.cell[m][n].herbivore_list)
-                carnivore_count += len(self.cell[m][n].carnivore_list)
+        for (m, n) in self.active_cells:
+            herbivore_count += len(self.cell[m][n].herbivore_list)
+            carnivore_count += len(self.cell[m][n].carnivore_list)
 
         self.herbivore_pop_history.append(herbivore_count)
         self.carnivore_pop_history.append(carnivore_count)
+        self.history_years.append(self.year)
+
+    def count_map(self):
+        """
+        Gives the number of animals in every cell.
+        :return: tuple. Arrays with the number of Herbivores and Carnivores, with the same shape
+        as the map.
+        """
+        herbivore_map = np.zeros((self.y, self.x), dtype=np.int64)
+        carnivore_map = np.zeros((self.y, self.x), dtype=np.int64)
+        for (m, n) in self.active_cells:
+            herbivore_map[m, n] = len(self.cell[m][n].herbivore_list)
+            carnivore_map[m, n] = len(self.cell[m][n].carnivore_list)
+        return herbivore_map, carnivore_map
+
+    def sum_values(self):
+        """
+        Sums the age, weight and fitness of all animals of each species, used for the means in
+        the Recorder.
+        :return: array. One row per species, with the number of animals and the sum of age,
+        weight and fitness.
+        """
+        sums = np.zeros((2, 4))
+        for (m, n) in self.active_cells:
+            cell = self.cell[m][n]
+            for (row, animals) in enumerate((cell.herbivore_list, cell.carnivore_list)):
+                if not len(animals):
+                    continue
+                if self.engine == 'object':
+                    sums[row] += (len(animals), sum(ani.age for ani in animals),
+                                  sum(ani.weight for ani in animals),
+                                  sum(ani.fitness for ani in animals))
+                else:
+                    sums[row] += (len(animals), animals.age.sum(), animals.weight.sum(),
+                                  animals.fitness.sum())
+        return sums
+
+    def get_state(self):
+        """
+        Collects the state of the island as arrays, used by BioSim.save_checkpoint.
+        The animals of each species are stored as columns sorted by cell, where the cell is given
+        as row * width + column.
+        :return: dict. Arrays with the year, the population history, the fodder, the state of the
+        random stream and the columns cell, age, weight, fitness and stage of every species,
+        like 'Herbivore_age'.
+        """
+        state = {'year': np.array(self.year),
+                 'herbivore_history': np.array(self.herbivore_pop_history, dtype=np.int64),
+                 'carnivore_history': np.array(self.carnivore_pop_history, dtype=np.int64),
+                 'history_years': np.array(self.history_years, dtype=np.int64),
+                 'fodder': np.array([[cell.fodder for cell in row] for row in self.cell],
+                                    dtype=float).ravel()}
+        state.update(self.random.get_state())
+        cells = sorted(self.active_cells)
+        for name in ('Herbivore', 'Carnivore'):
+            animal_lists = [self.cell[m][n].herbivore_list if name == 'Herbivore' else
+                            self.cell[m][n].carnivore_list for (m, n) in cells]
+            state[name + '_cell'] = np.repeat(np.array([m * self.x + n for (m, n) in cells],
+                                                       dtype=np.int64),
+                                              [len(animals) for animals in animal_lists])
+            if self.engine == 'object':
+                animals = [ani for animal_list in animal_lists for ani in animal_list]
+                columns = ([ani.age for ani in animals], [ani.weight for ani in animals],
+                           [ani.fitness for ani in animals], [ani.stage for ani in animals])
+            else:
+                columns = ([population.age for population in animal_lists],
+                           [population.weight for population in animal_lists],
+                           [population.fitness for population in animal_lists],
+                           [population.stage for population in animal_lists])
+                columns = [np.concatenate(column) if column else [] for column in columns]
+            for column, values, dtype in zip(('age', 'weight', 'fitness', 'stage'), columns,
+                                             (np.int64, float, float, np.int8)):
+                state[name + '_' + column] = np.asarray(values, dtype=dtype)
+        return state
+
+    def set_state(self, state):
+        """
+        Makes the island again, and puts back the state from get_state.
+        The animals are put back one cell at a time, from slices of the columns. The garbage
+        collector is stopped meanwhile, since it would look through all the new Animal objects
+        of the 'object' engine again and again.
+        :param state: dict. Contains the arrays from get_state.
+        :return: None
+        """
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self.restore_state(state)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def restore_state(self, state):
+        """
+        Puts back the state from get_state, used by set_state.
+        :param state: dict. Contains the arrays from get_state.
+        :return: None
+        """
+        self.make_island()
+        self.active_cells = set()
+        self.year = int(state['year'])
+        self.herbivore_pop_history = state['herbivore_history'].tolist()
+        self.carnivore_pop_history = state['carnivore_history'].tolist()
+        self.history_years = state['history_years'].tolist()
+        self.random.set_state(state)
+        for (cell, fodder) in zip(itertools.chain.from_iterable(self.cell),
+                                  state['fodder'].tolist()):
+            cell.fodder = fodder
+        for name in ('Herbivore', 'Carnivore'):
+            cell_index = state[name + '_cell']
+            bounds = np.flatnonzero(np.diff(cell_index)) + 1
+            for (start, end) in zip(np.r_[0, bounds], np.r_[bounds, len(cell_index)]):
+                if start == end:
+                    continue
+                (m, n) = divmod(int(cell_index[start]), self.x)
+                columns = (state[name + '_' + column][start:end]
+                           for column in ('age', 'weight', 'fitness', 'stage'))
+                self.cell[m][n].restore_animals(name, *columns)
+                self.active_cells.add((m, n))
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Jon Augensen & Lars Øvergård, NMBU'
+__email__ = 'jon.augensen@nmbu.no / lars.overgard@hotmail.com'
+
+"""
+This file contains the log writer, which saves the number of animals every year.
+The file is kept open, and the rows are kept in memory until flush_years rows are collected,
+soo the file is only written to once in a while instead of opened and closed every year.
+The log can be a CSV file, or a binary file where every block of rows is stored column by
+column. The binary file starts with a header line with the column names, then every block is
+the number of rows followed by the columns, as 64 bit integers. read_log reads both formats.
+"""
+
+import atexit
+import json
+import numpy as np
+
+BINARY_HEADER = b'BIOSIMLOG\n'
+
+
+def column_names(shape=None):
+    """
+    Names of the columns in the log.
+    :param shape: tuple. Rows and columns of the map, if the count of every cell is logged.
+    :return: list. 'Year', 'Herbivore' and 'Carnivore', then 'Herbivore_1_1' and up for every
+    cell if shape is given, with the same coordinates as 'loc'.
+    """
+    names = ['Year', 'Herbivore', 'Carnivore']
+    if shape is not None:
+        for species in ('Herbivore', 'Carnivore'):
+            names.extend(species + '_' + str(m + 1) + '_' + str(n + 1)
+                         for m in range(shape[0]) for n in range(shape[1]))
+    return names
+
+
+class LogWriter:
+    """
+    Writes the animal counts to a log file, in blocks of rows.
+    """
+    def __init__(self, path, log_format='csv', flush_years=100, shape=None):
+        """
+        This docstring belongs to LogWriter __init__ it opens the file and writes the header.
+        An existing file is written over.
+        :param path: str. Path of the log file.
+        :param log_format: str. 'csv' or 'binary'.
+        :param flush_years: int. Number of rows kept in memory before they are written.
+        :param shape: tuple. Rows and columns of the map, the count of every cell is logged if
+        it's given.
+        """
+        if log_format not in ('csv', 'binary'):
+            raise ValueError("'" + str(log_format) + "' is not a valid log format!")
+        if type(flush_years) != int or flush_years < 1:
+            raise ValueError("flush_years must be a positive whole number!")
+        self.path = path
+        self.log_format = log_format
+        self.flush_years = flush_years
+        self.columns = column_names(shape)
+        self.rows = np.zeros((flush_years, len(self.columns)), dtype=np.int64)
+        self.row_count = 0
+        if log_format == 'csv':
+            self.file = open(path, 'w')
+            self.file.write(','.join(self.columns) + '\n')
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(BINARY_HEADER + json.dumps(self.columns).encode() + b'\n')
+        atexit.register(self.close)
+
+    def write(self, year, herbivores, carnivores, herbivore_map=None, carnivore_map=None):
+        """
+        Adds one row to the log, the rows are written when flush_years rows are collected.
+        :param year: int. The year.
+        :param herbivores: int. Number of Herbivores.
+        :param carnivores: int. Number of Carnivores.
+        :param herbivore_map: array. Number of Herbivores in every cell, only used if the log
+        has cell counts.
+        :param carnivore_map: array. Number of Carnivores in every cell.
+        :return: None
+        """
+        row = self.rows[self.row_count]
+        row[:3] = (year, herbivores, carnivores)
+        if len(self.columns) > 3:
+            cells = (len(self.columns) - 3) // 2
+            row[3:3 + cells] = np.ravel(herbivore_map)
+            row[3 + cells:] = np.ravel(carnivore_map)
+        self.row_count += 1
+        if self.row_count == self.flush_years:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the rows in memory to the file.
+        :return: None
+        """
+        if self.file.closed:
+            return
+        if self.row_count:
+            rows = self.rows[:self.row_count]
+            if self.log_format == 'csv':
+                self.file.write(''.join(','.join(map(str, row)) + '\n'
+                                        for row in rows.tolist()))
+            else:
+                self.file.write(np.int64(self.row_count).tobytes())
+                self.file.write(np.ascontiguousarray(rows.T).tobytes())
+            self.row_count = 0
+        self.file.flush()
+
+    def close(self):
+        """
+        Writes the last rows and closes the file.
+        :return: None
+        """
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+        atexit.unregister(self.close)
+
+
+def read_log(path):
+    """
+    Reads a log written by LogWriter, in either format.
+    :param path: str. Path of the log file.
+    :return: dict. Array with the values of every column, by column name.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data.startswith(BINARY_HEADER):
+        start = len(BINARY_HEADER)
+        end = data.index(b'\n', start)
+        columns = json.loads(data[start:end])
+        blocks = []
+        position = end + 1
+        while position < len(data):
+            rows = int(np.frombuffer(data, np.int64, 1, position)[0])
+            position += 8
+            blocks.append(np.frombuffer(data, np.int64, rows * len(columns),
+                                        position).reshape(len(columns), rows))
+            position += rows * len(columns) * 8
+        values = np.concatenate(blocks, axis=1) if blocks else \
+            np.zeros((len(columns), 0), dtype=np.int64)
+    else:
+        lines = data.decode().split()
+        columns = lines[0].split(',')
+        values = np.array([line.split(',') for line in lines[1:]],
+                          dtype=np.int64).reshape(-1, len(columns)).T
+    return {name: values[number] for number, name in enumerate(columns)}
@@ -7,10 +7,33 @@ __email__ = 'jon.augensen@nmbu.no / lars.overgard@hotmail.com'
 This file contains functions need for different classes.
 It contain functions needed for fitness updates, gives random number and a random
 calf weight based on gaussian distribution.
+Every simulation has it's own RandomStream, with a NumPy generator. The array versions are used
+by the vectorized engine, and draw many numbers at once. The functions outside RandomStream use
+default_stream.
+The fitness is calculated with lookup tables. The age term is stored for all integer ages below
+AGE_TABLE_LENGTH, and the weight term can be interpolated from a table, if the species has a
+weight_table_step above 0. The step is a species parameter like the others, soo it's set with
+set_animal_parameters and only used by that simulation.
+The tables are made the first time they are needed for a set of parameters.
 """
 
+import json
 import math
-import random
+import numpy as np
+
+AGE_TABLE_LENGTH = 256
+WEIGHT_TABLE_MAX = 250
+_age_tables = {}
+_weight_tables = {}
+
+
+def set_seed(seed):
+    """
+    Seeds default_stream, which is used by islands and cells made without their own stream.
+    :param seed: int. The random seed.
+    :return: None
+    """
+    default_stream.seed(seed)
 
 
 def qua(x_1, x_2, phi):
@@ -30,21 +53,288 @@ def qua(x_1, x_2, phi):
     return qu
 
 
+def qua_array(x_1, x_2, phi):
+    """
+    Same as qua, but for a whole array of ages or weights at once.
+    :param x_1: array. Ages of the animals/weights of the animals
+    :param x_2: int. Age half / weight half - Parameter
+    :param phi: float. phi age/ phi weight - Parameter
+    :return: array. Half of the fitness calculation, for every animal.
+    """
+    with np.errstate(over='ignore'):
+        return 1 / (1 + np.exp(phi * (np.asarray(x_1) - x_2)))
+
+
+def clear_tables():
+    """
+    Removes all lookup tables, they are made again with the current parameters when needed.
+    Called when the animal parameters are changed.
+    :return: None
+    """
+    _age_tables.clear()
+    _weight_tables.clear()
+
+
+def weight_table_error(phi_weight, step):
+    """
+    Gives the largest error of the interpolated weight term. The error of linear interpolation
+    is at most max|f''| * step**2 / 8, and for the logistic function max|f''| is
+    phi_weight**2 * sqrt(3) / 18.
+    :param phi_weight: float. phi weight - Parameter
+    :param step: float. Distance between the weights in the table.
+    :return: float. Largest error of the weight term.
+    """
+    return phi_weight ** 2 * math.sqrt(3) / 18 * step ** 2 / 8
+
+
+def age_table(a_half, phi_age):
+    """
+    Gives the age term for all integer ages below AGE_TABLE_LENGTH.
+    :param a_half: float. Age half - Parameter
+    :param phi_age: float. phi age - Parameter
+    :return: tuple. The table as a list and as an array.
+    """
+    table = _age_tables.get((a_half, phi_age))
+    if table is None:
+        values = [qua(age, a_half, phi_age) for age in range(AGE_TABLE_LENGTH)]
+        table = (values, np.array(values))
+        _age_tables[a_half, phi_age] = table
+    return table
+
+
+def weight_table(w_half, phi_weight, step):
+    """
+    Gives the weight term for weights from 0 to WEIGHT_TABLE_MAX, with step between them.
+    With linear interpolation the error is at most phi_weight**2 * step**2 / 83, see
+    weight_table_error.
+    :param w_half: float. Weight half - Parameter
+    :param phi_weight: float. phi weight - Parameter
+    :param step: float. weight_table_step - Parameter, distance between the weights.
+    :return: tuple. The table as a list and as an array, and the weights as an array.
+    """
+    table = _weight_tables.get((w_half, phi_weight, step))
+    if table is None:
+        weights = np.arange(0, WEIGHT_TABLE_MAX + step, step)
+        values = [qua(weight, w_half, -phi_weight) for weight in weights.tolist()]
+        table = (values, np.array(values), weights)
+        _weight_tables[w_half, phi_weight, step] = table
+    return table
+
+
+def calculate_fitness(age, weight, params):
+    """
+    Calculates the fitness of one animal, with the age term from the lookup table.
+    :param age: int. Age of the animal.
+    :param weight: float. Weight of the animal.
+    :param params: class. The species of the animal, gives a_half, phi_age, w_half,
+    phi_weight and weight_table_step.
+    :return: float. Fitness of the animal.
+    """
+    if weight <= 0:
+        return 0
+    table = _age_tables.get((params.a_half, params.phi_age))
+    if table is None:
+        table = age_table(params.a_half, params.phi_age)
+    if type(age) is int and age < AGE_TABLE_LENGTH:
+        age_part = table[0][age]
+    else:
+        age_part = qua(age, params.a_half, params.phi_age)
+    step = params.weight_table_step
+    if not step:
+        weight_part = 1 / (1 + math.exp(-params.phi_weight * (weight - params.w_half)))
+    elif weight < WEIGHT_TABLE_MAX:
+        values = weight_table(params.w_half, params.phi_weight, step)[0]
+        position = weight / step
+        index = int(position)
+        weight_part = values[index] + (position - index) * (values[index + 1] - values[index])
+    else:
+        weight_part = qua(weight, params.w_half, -params.phi_weight)
+    return age_part * weight_part
+
+
+def calculate_fitness_array(age, weight, params):
+    """
+    Same as calculate_fitness, but for a whole array of animals at once.
+    :param age: array. Ages of the animals.
+    :param weight: array. Weights of the animals.
+    :param params: class. The species of the animals.
+    :return: array. Fitness of the animals.
+    """
+    age = np.asarray(age)
+    weight = np.asarray(weight)
+    age_values = age_table(params.a_half, params.phi_age)[1]
+    in_table = age < AGE_TABLE_LENGTH
+    if in_table.all():
+        age_part = age_values[age]
+    else:
+        age_part = qua_array(age, params.a_half, params.phi_age)
+        age_part[in_table] = age_values[age[in_table]]
+
+    if params.weight_table_step:
+        weight_values, weights = weight_table(params.w_half, params.phi_weight,
+                                              params.weight_table_step)[1:]
+        weight_part = np.interp(weight, weights, weight_values)
+        outside = weight >= WEIGHT_TABLE_MAX
+        weight_part[outside] = qua_array(weight[outside], params.w_half, -params.phi_weight)
+    else:
+        weight_part = qua_array(weight, params.w_half, -params.phi_weight)
+
+    fitness = age_part * weight_part
+    fitness[weight <= 0] = 0
+    return fitness
+
+
+class RandomStream:
+    """
+    The random numbers of one simulation, drawn from it's own NumPy generator.
+    Single numbers are taken from blocks that are drawn in advance, soo the generator is only
+    called once for every block_size numbers. The array methods draw straight from the
+    generator.
+    """
+    block_size = 1024
+
+    def __init__(self, seed=None):
+        """
+        This docstring belongs to RandomStream __init__ it makes the generator.
+        :param seed: int. The random seed, a random seed is used if None.
+        """
+        self.generator = np.random.default_rng(seed)
+        self._uniforms = []
+        self._normals = []
+
+    def seed(self, seed):
+        """
+        Starts the stream again from a seed, numbers left in the blocks are thrown away.
+        :param seed: int. The random seed.
+        :return: None
+        """
+        self.generator = np.random.default_rng(seed)
+        self._uniforms = []
+        self._normals = []
+
+    def random_number(self):
+        """
+        Gives one random number from the block, a new block is drawn when it's empty.
+        :return: float. Random number between 0 <= x < 1
+        """
+        if not self._uniforms:
+            self._uniforms = self.generator.random(self.block_size).tolist()
+        return self._uniforms.pop()
+
+    def gaussian_weight(self, w_birth, sigma_birth):
+        """
+        Randomly generates a calf weight, from a block of standard normal numbers.
+        :param w_birth: float. Mean birth weight of the animals.
+        :param sigma_birth: float. Variance of birth weight of the animals.
+        :return: float. Calf weight.
+        """
+        if not self._normals:
+            self._normals = self.generator.standard_normal(self.block_size).tolist()
+        return w_birth + sigma_birth * self._normals.pop()
+
+    def random_numbers(self, size):
+        """
+        Same as random_number, but gives many random numbers at once.
+        :param size: int. Number of random numbers.
+        :return: array. Random numbers between 0 <= x < 1
+        """
+        return self.generator.random(size)
+
+    def gaussian_weights(self, w_birth, sigma_birth, size):
+        """
+        Same as gaussian_weight, but gives many calf weights at once.
+        :param w_birth: float. Mean birth weight of the animals.
+        :param sigma_birth: float. Variance of birth weight of the animals.
+        :param size: int. Number of weights.
+        :return: array. Calf weights.
+        """
+        return self.generator.normal(w_birth, sigma_birth, size)
+
+    def permutation(self, size):
+        """
+        Gives a random order of the numbers from 0 up to size.
+        :param size: int. Number of positions.
+        :return: array. The positions in random order.
+        """
+        return self.generator.permutation(size)
+
+    def shuffle(self, items):
+        """
+        Puts the items of a list in a random order.
+        :param items: list. The list to shuffle, it's changed.
+        :return: None
+        """
+        if len(items) > 1:
+            items[:] = [items[i] for i in self.generator.permutation(len(items)).tolist()]
+
+    def get_state(self):
+        """
+        Gives the state of the generator and the numbers left in the blocks, as arrays soo they
+        can be saved in a checkpoint.
+        :return: dict. 'random_generator' is the generator state as JSON text, 'random_uniforms'
+        and 'random_normals' are the numbers left in the blocks.
+        """
+        return {'random_generator': np.array(json.dumps(self.generator.bit_generator.state)),
+                'random_uniforms': np.array(self._uniforms, dtype=float),
+                'random_normals': np.array(self._normals, dtype=float)}
+
+    def set_state(self, state):
+        """
+        Continues the stream from a state given by get_state.
+        :param state: dict. Contains the arrays from get_state.
+        :return: None
+        """
+        self.generator.bit_generator.state = json.loads(str(state['random_generator']))
+        self._uniforms = state['random_uniforms'].tolist()
+        self._normals = state['random_normals'].tolist()
+
+
+default_stream = RandomStream()
+
+
 def gaussian_weight(w_birth, sigma_birth):
     """
     Randomly generates a weight using the mean weight for a calf and the variance.
-    Dependent of the species.
+    Dependent of the species. Drawn from default_stream.
     :param w_birth: float. Mean birth weight of the animals.
     :param sigma_birth: float.  Variance of birth weight of the animals.
     :return: float. Calf weight.
     """
-    return random.gauss(w_birth, sigma_birth)
+    return default_stream.gaussian_weight(w_birth, sigma_birth)
 
 
 def random_number():
     """
-    Generates a random number, uses a random seed, which is added to the random module
-    from the simulation.py file.
-    :return: float. Random number between 0 <= x <= 1
+    Generates a random number from default_stream.
+    :return: float. Random number between 0 <= x < 1
+    """
+    return default_stream.random_number()
+
+
+def gaussian_weights(w_birth, sigma_birth, size):
+    """
+    Same as gaussian_weight, but gives many calf weights at once.
+    :param w_birth: float. Mean birth weight of the animals.
+    :param sigma_birth: float. Variance of birth weight of the animals.
+    :param size: int. Number of weights.
+    :return: array. Calf weights.
+    """
+    return default_stream.gaussian_weights(w_birth, sigma_birth, size)
+
+
+def random_numbers(size):
+    """
+    Same as random_number, but gives many random numbers at once.
+    :param size: int. Number of random numbers.
+    :return: array. Random numbers between 0 <= x < 1
+    """
+    return default_stream.random_numbers(size)
+
+
+def permutation(size):
+    """
+    Gives a random order of the numbers from 0 up to size.
+    :param size: int. Number of positions.
+    :return: array. The positions in random order.
     """
-    return random.random()
+    return default_stream.permutation(size)
@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Jon Augensen & Lars Øvergård, NMBU'
+__email__ = 'jon.augensen@nmbu.no / lars.overgard@hotmail.com'
+
+"""
+This file contains the island used by the 'parallel' engine.
+The rows of the map are split into strips, and every strip is simulated by it's own worker
+process. Each worker has a whole Island, but only simulates the cells in it's strip.
+Migrants that leave the strip end up in the row over or under it, these are sent to the worker
+that owns the row after every year. Every worker has it's own random stream, made from the seed.
+Migrants going down into the next strip are simulated the year after, not the same year as
+with one Island, soo the results are not the same as with the 'vectorized' engine.
+"""
+
+import multiprocessing
+import numpy as np
+from .island import Island
+from .animals import Animal, make_species
+from .biome import make_landscapes
+from .math_funcs import clear_tables
+from .stats import StatsAccumulator
+
+
+def parameter_state(species, landscapes):
+    """
+    Collects the parameters of all species and landscapes, soo they can be sent to the workers.
+    :param species: dict. Species classes, by name.
+    :param landscapes: dict. Landscape classes, by letter.
+    :return: dict. Parameters of every class, by species name or landscape letter.
+    """
+    classes = dict(species, **landscapes)
+    return {key: {name: getattr(cls, name) for name in dir(cls)
+                  if not name.startswith('_') and isinstance(getattr(cls, name), (int, float))}
+            for key, cls in classes.items()}
+
+
+def set_parameter_state(state, species, landscapes):
+    """
+    Sets the parameters from parameter_state on species and landscape classes.
+    :param state: dict. Parameters of every class, by species name or landscape letter.
+    :param species: dict. Species classes, by name.
+    :param landscapes: dict. Landscape classes, by letter.
+    :return: None
+    """
+    Animal.params_version += 1
+    clear_tables()
+    classes = dict(species, **landscapes)
+    for key, cls in classes.items():
+        for name, value in state[key].items():
+            setattr(cls, name, value)
+
+
+class StripIsland(Island):
+    """
+    Island that only simulates the rows in it's strip, used by the workers.
+    """
+    def __init__(self, layout, engine, strip, seed=None, hist_specs=None):
+        """
+        This docstring belongs to StripIsland __init__.
+        :param layout: str. A layout of the geography of the environment.
+        :param engine: str. How the cells store their animals, 'object', 'array' or
+        'vectorized'.
+        :param strip: tuple. First row and the row after the last row of the strip.
+        :param seed: int. Seed of the strip's random stream.
+        :param hist_specs: dict. Bins of the histograms in the statistics.
+        """
+        super().__init__(layout, engine, seed, hist_specs)
+        self.strip = strip
+
+    def take_ghosts(self):
+        """
+        Removes all animals that have migrated out of the strip.
+        :return: list. ((row, column), (herbivores, carnivores)) for every cell outside the
+        strip with animals. The animals of each species are sent as (age, weight, fitness,
+        stage) arrays, also for the 'object' engine, since the species classes of an island
+        can't be pickled.
+        """
+        ghosts = []
+        for (m, n) in sorted(self.active_cells):
+            if self.strip[0] <= m < self.strip[1]:
+                continue
+            cell = self.cell[m][n]
+            if self.engine == 'object':
+                ghosts.append(((m, n), tuple(
+                    (np.array([ani.age for ani in animals], dtype=np.int64),
+                     np.array([ani.weight for ani in animals], dtype=float),
+                     np.array([ani.fitness for ani in animals], dtype=float),
+                     np.array([ani.stage for ani in animals], dtype=np.int8))
+                    for animals in (cell.herbivore_list, cell.carnivore_list))))
+                cell.herbivore_list = []
+                cell.carnivore_list = []
+            else:
+                animals = []
+                for population in (cell.herbivore_list, cell.carnivore_list):
+                    animals.append(population.take(np.arange(len(population))))
+                    population.keep(np.zeros(len(population), dtype=bool))
+                ghosts.append(((m, n), tuple(animals)))
+            cell.prey_index = None
+            self.active_cells.discard((m, n))
+        return ghosts
+
+    def put_migrants(self, migrants):
+        """
+        Adds migrants from the other workers to the cells in this strip.
+        :param migrants: list. Same as the list from take_ghosts.
+        :return: None
+        """
+        for ((m, n), (herbivores, carnivores)) in migrants:
+            cell = self.cell[m][n]
+            cell.restore_animals('Herbivore', *herbivores)
+            cell.restore_animals('Carnivore', *carnivores)
+            cell.prey_index = None
+            if cell.has_animals():
+                self.active_cells.add((m, n))
+
+    def count(self):
+        """
+        Counts the animals in the strip.
+        :return: tuple. Number of Herbivores and Carnivores.
+        """
+        return (sum(len(self.cell[m][n].herbivore_list) for (m, n) in self.active_cells),
+                sum(len(self.cell[m][n].carnivore_list) for (m, n) in self.active_cells))
+
+
+def strip_worker(connection, layout, engine, strip, seed, hist_specs):
+    """
+    Runs in a worker process, and does what the ParallelIsland asks for until it's stopped.
+    Errors are sent back, soo they are raised in the main process.
+    :param connection: Connection. The worker's end of the pipe to the ParallelIsland.
+    :param layout: str. A layout of the geography of the environment.
+    :param engine: str. Engine used for the cells.
+    :param strip: tuple. First row and the row after the last row of the strip.
+    :param seed: int. Seed of this worker's random stream.
+    :param hist_specs: dict. Bins of the histograms in the statistics.
+    :return: None
+    """
+    island = StripIsland(layout, engine, strip, seed, hist_specs)
+    island.make_island()
+    # The statistics are collected after the migrants from the other strips have come
+    collect_stats = False
+    while True:
+        (command, data) = connection.recv()
+        if command == 'stop':
+            break
+        try:
+            if command == 'params':
+                set_parameter_state(data, island.species, island.landscapes)
+                answer = None
+            elif command == 'add':
+                island.add_pop(data)
+                answer = island.count()
+            elif command == 'simulate':
+                collect_stats = data
+                island.simulate_island()
+                answer = island.take_ghosts()
+            elif command == 'migrants':
+                island.put_migrants(data)
+                if collect_stats:
+                    island.collect_stats()
+                answer = island.count()
+            elif command == 'sums':
+                answer = island.sum_values()
+            elif command == 'get_state':
+                answer = island.get_state()
+            elif command == 'set_state':
+                island.set_state(data)
+                # The history is not in the worker's state, soo it starts at the restored year
+                island.do_count()
+                answer = island.count()
+            else:
+                answer = island.do_all_stats()
+            # Sent here, soo an answer that can't be pickled is reported as an error too
+            connection.send(answer)
+        except Exception as error:
+            connection.send(error)
+    connection.close()
+
+
+class ParallelIsland:
+    """
+    Here we create our island class for the 'parallel' engine. It has the same interface as
+    Island.
+    """
+    def __init__(self, layout, seed, workers=None, engine='vectorized', hist_specs=None):
+        """
+        This docstring belongs to ParallelIsland __init__ it splits the layout and decides how
+        many workers to use.
+        :param layout: str. A layout of the geography of the environment.
+        :param seed: int. Seed used to make the random streams of the workers.
+        :param workers: int. Number of worker processes, the number of CPUs if None.
+        :param engine: str. Engine used by the workers for the cells, 'object', 'array' or
+        'vectorized'.
+        :param hist_specs: dict. Bins of the histograms in the statistics, see stats.py.
+        The species and landscape classes of the ParallelIsland are the ones changed by
+        set_animal_parameters and set_landscape_parameters, they are sent to the workers.
+        """
+        self.layout = layout
+        self.map = layout.split()
+        self.y = len(self.map)
+        self.x = len(self.map[0])
+        self.seed = seed
+        self.workers = min(workers or multiprocessing.cpu_count(), self.y)
+        self.engine = engine
+        self.species = make_species()
+        self.landscapes = make_landscapes()
+        self.hist_specs = hist_specs
+        # Only used for the bins and for telling the workers if the statistics are active
+        self.stats = StatsAccumulator(hist_specs)
+
+        self.strips = []
+        self.processes = []
+        self.connections = []
+        self.parameters = None
+
+        self.year = 0
+        self.herbivore_pop_history = []
+        self.carnivore_pop_history = []
+        self.history_years = []
+
+    def make_strips(self):
+        """
+        Splits the rows in strips with about the same number of land cells in each.
+        :return: list. (first row, row after the last row) for every strip.
+        """
+        land = np.array([sum(letter not in "WF" for letter in row) for row in self.map])
+        cumulative = np.cumsum(land)
+        bounds = np.searchsorted(cumulative, cumulative[-1] * np.arange(1, self.workers) /
+                                 self.workers, 'right')
+        bounds = np.unique(np.concatenate(([0], bounds, [self.y])))
+        return [(int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:])]
+
+    def make_island(self):
+        """
+        Checks the layout, then starts one worker for every strip.
+        :return: None
+        """
+        Island.check_layout(self.map)
+        self.strips = self.make_strips()
+        seeds = [int(sequence.generate_state(1)[0])
+                 for sequence in np.random.SeedSequence(self.seed).spawn(len(self.strips))]
+        for strip, seed in zip(self.strips, seeds):
+            (connection, worker_connection) = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=strip_worker, daemon=True,
+                                              args=(worker_connection, self.layout, self.engine,
+                                                    strip, seed, self.hist_specs))
+            process.start()
+            self.processes.append(process)
+            self.connections.append(connection)
+
+    def ask_all(self, messages):
+        """
+        Sends one message to every worker, then waits for all the answers.
+        :param messages: list. (command, data) for every worker.
+        :return: list. The answer from every worker.
+        """
+        for connection, message in zip(self.connections, messages):
+            connection.send(message)
+        answers = [connection.recv() for connection in self.connections]
+        for answer in answers:
+            if isinstance(answer, Exception):
+                raise answer
+        return answers
+
+    def owner(self, row):
+        """
+        Finds the worker that simulates a row.
+        :param row: int. Row of the map, starting at 0.
+        :return: int. Number of the worker.
+        """
+        for number, (start, end) in enumerate(self.strips):
+            if start <= row < end:
+                return number
+
+    def send_parameters(self):
+        """
+        Sends the species and landscape parameters to the workers, if they have changed.
+        :return: None
+        """
+        state = parameter_state(self.species, self.landscapes)
+        if state != self.parameters:
+            self.ask_all([('params', state)] * len(self.connections))
+            self.parameters = state
+
+    def add_pop(self, params):
+        """
+        Adds animals to a given location with specified parameters, by sending them to the
+        worker that owns the location.
+        :param params: list. Contains a list with dictionaries of animals that should be added to
+        island. Dictionaries contain location and parameters of the animal(s).
+        :return: None
+        """
+        pops = [[] for _ in self.connections]
+        for pop_param in params:
+            (m, n) = pop_param['loc']
+            if m > self.y:
+                raise ValueError(str(m) + " is not a valid Y coordinate")
+            elif n > self.x:
+                raise ValueError(str(n) + " is not a valid X coordinate")
+            pops[self.owner(m - 1)].append(pop_param)
+        self.send_parameters()
+        self.do_count(self.ask_all([('add', pop) for pop in pops]))
+
+    def simulate_island(self, count=True):
+        """
+        Simulates one year in all the strips at the same time, then sends the migrants that
+        left a strip to the worker of the strip they came to.
+        :param count: bool. If False nothing is added to the population history this year.
+        :return: None
+        """
+        self.year += 1
+        self.send_parameters()
+        migrants = [[] for _ in self.connections]
+        for ghosts in self.ask_all([('simulate', self.stats.active)] * len(self.connections)):
+            for ((m, n), animals) in ghosts:
+                migrants[self.owner(m)].append(((m, n), animals))
+        counts = self.ask_all([('migrants', cells) for cells in migrants])
+        if count:
+            self.do_count(counts)
+
+    def do_all_stats(self):
+        """
+        Collect data needed for plotting from all the workers, in the same order as
+        Island.do_all_stats.
+        :return: list. Containing all the data need to plot one slide of the graphics.
+        """
+        answers = self.ask_all([('stats', None)] * len(self.connections))
+        stats = [self.year, self.herbivore_pop_history[-1], self.carnivore_pop_history[-1]]
+        for position in range(3, 9):
+            stats.append(np.sum([answer[position] for answer in answers], axis=0))
+        for position in (9, 10):
+            stats.append(np.sum([answer[position] for answer in answers], axis=0).tolist())
+        return stats
+
+    def count_map(self):
+        """
+        Gives the number of animals in every cell, collected from the workers.
+        :return: tuple. Arrays with the number of Herbivores and Carnivores.
+        """
+        stats = self.do_all_stats()
+        return np.array(stats[9], dtype=np.int64), np.array(stats[10], dtype=np.int64)
+
+    def sum_values(self):
+        """
+        Sums the age, weight and fitness of all animals of each species, in all the workers.
+        :return: array. One row per species, with the number of animals and the sums.
+        """
+        return np.sum(self.ask_all([('sums', None)] * len(self.connections)), axis=0)
+
+    def get_state(self):
+        """
+        Collects the state of all the workers, in the same form as Island.get_state. The
+        columns of the animals come from the workers in the order of the strips, soo they are
+        still sorted by cell. The fodder of every row is taken from the worker that owns it,
+        and the random stream of every worker is kept with the number of the worker, like
+        'worker_0_random_generator'.
+        :return: dict. Arrays with the state of the island.
+        """
+        answers = self.ask_all([('get_state', None)] * len(self.connections))
+        state = {'year': np.array(self.year),
+                 'herbivore_history': np.array(self.herbivore_pop_history, dtype=np.int64),
+                 'carnivore_history': np.array(self.carnivore_pop_history, dtype=np.int64),
+                 'history_years': np.array(self.history_years, dtype=np.int64),
+                 'strips': np.array(self.strips, dtype=np.int64),
+                 'fodder': np.concatenate([answer['fodder'].reshape(self.y, self.x)[start:end]
+                                           for (answer, (start, end)) in
+                                           zip(answers, self.strips)]).ravel()}
+        for name in ('Herbivore', 'Carnivore'):
+            for column in ('cell', 'age', 'weight', 'fitness', 'stage'):
+                key = name + '_' + column
+                state[key] = np.concatenate([answer[key] for answer in answers])
+        for (number, answer) in enumerate(answers):
+            for key in ('random_generator', 'random_uniforms', 'random_normals'):
+                state['worker_' + str(number) + '_' + key] = answer[key]
+        return state
+
+    def set_state(self, state):
+        """
+        Sends the state from get_state to the workers, every worker gets the animals in it's
+        strip and it's own random stream. The workers must have the same strips as when the
+        state was saved.
+        :param state: dict. Contains the arrays from get_state.
+        :return: None
+        """
+        if state['strips'].tolist() != [list(strip) for strip in self.strips]:
+            raise ValueError("The checkpoint was saved with other strips, use the same number "
+                             "of workers!")
+        messages = []
+        for (number, (start, end)) in enumerate(self.strips):
+            worker_state = {'year': state['year'], 'fodder': state['fodder'],
+                            'herbivore_history': np.zeros(0, dtype=np.int64),
+                            'carnivore_history': np.zeros(0, dtype=np.int64),
+                            'history_years': np.zeros(0, dtype=np.int64)}
+            for key in ('random_generator', 'random_uniforms', 'random_normals'):
+                worker_state[key] = state['worker_' + str(number) + '_' + key]
+            for name in ('Herbivore', 'Carnivore'):
+                (first, last) = np.searchsorted(state[name + '_cell'],
+                                                (start * self.x, end * self.x))
+                for column in ('cell', 'age', 'weight', 'fitness', 'stage'):
+                    worker_state[name + '_' + column] = state[name + '_' + column][first:last]
+            messages.append(('set_state', worker_state))
+        self.ask_all(messages)
+        self.year = int(state['year'])
+        self.herbivore_pop_history = state['herbivore_history'].tolist()
+        self.carnivore_pop_history = state['carnivore_history'].tolist()
+        self.history_years = state['history_years'].tolist()
+
+    def do_count(self, counts):
+        """
+        Updates instances of population history of the Herbivores and Carnivores.
+        :param counts: list. Number of Herbivores and Carnivores from every worker.
+        :return: None
+        """
+        self.herbivore_pop_history.append(sum(count[0] for count in counts))
+        self.carnivore_pop_history.append(sum(count[1] for count in counts))
+        self.history_years.append(self.year)
+
+    def close(self):
+        """
+        Stops all the workers. Workers that have already stopped are skipped.
+        :return: None
+        """
+        for connection in self.connections:
+            try:
+                connection.send(('stop', None))
+            except OSError:
+                pass
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
@@ -0,0 +1,545 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Jon Augensen & Lars Øvergård, NMBU'
+__email__ = 'jon.augensen@nmbu.no / lars.overgard@hotmail.com'
+
+"""
+This file contains the array-backed population store, used by the 'array' engine.
+Instead of one Animal object per animal, a cell keeps one Population per species, where
+age, weight, fitness and stage are stored in NumPy arrays.
+The annual cycle steps follow the same rules and random draws as the Animal methods.
+VectorizedPopulation is used by the 'vectorized' engine, it does every step as array operations
+with random numbers drawn in bulk. It gives the same results statistically, but not the same
+numbers for a given seed.
+"""
+
+import numpy as np
+from .math_funcs import calculate_fitness, calculate_fitness_array, default_stream
+
+
+def hunt(params, random_stream, hunter_age, hunter_weight, hunter_fitness, prey_fitness,
+         prey_weight):
+    """
+    Carnivores hunting in one cell, in the order they are given. The Herbivores must be sorted
+    after fitness, lowest first. Every Carnivore walks this order and skips the Herbivores
+    already eaten, soo the Herbivores are only sorted once.
+    :param params: class. Carnivores, gives the species parameters.
+    :param random_stream: class object. The RandomStream to draw from.
+    :param hunter_age: list. Ages of the Carnivores.
+    :param hunter_weight: list. Weights of the Carnivores, updated when they eat.
+    :param hunter_fitness: list. Fitness of the Carnivores, updated when they eat.
+    :param prey_fitness: list. Fitness of the Herbivores, sorted from low to high.
+    :param prey_weight: list. Weights of the Herbivores, in the same order.
+    :return: array of bool. True for the Herbivores that were eaten.
+    """
+    eaten = [False] * len(prey_fitness)
+    first_alive = 0
+    for i in range(len(hunter_fitness)):
+        fitness = hunter_fitness[i]
+        weight = hunter_weight[i]
+        food_eaten = 0
+        herb_id = first_alive
+        while herb_id < len(prey_fitness) and food_eaten < params.F and \
+                fitness > prey_fitness[herb_id]:
+            if eaten[herb_id]:
+                herb_id += 1
+                continue
+            if random_stream.random_number() < (fitness - prey_fitness[herb_id]) / \
+                    params.DeltaPhiMax:
+                weight += prey_weight[herb_id] * params.beta
+                fitness = calculate_fitness(hunter_age[i], weight, params)
+                food_eaten += prey_weight[herb_id]
+                eaten[herb_id] = True
+            herb_id += 1
+        while first_alive < len(eaten) and eaten[first_alive]:
+            first_alive += 1
+        hunter_weight[i] = weight
+        hunter_fitness[i] = fitness
+    return np.array(eaten, dtype=bool)
+
+
+class Population:
+    """
+    Here we create our population class, one set of arrays for one species in one cell.
+    """
+    columns = {'_age': np.int64, '_weight': float, '_fitness': float, '_stage': np.int8}
+
+    def __init__(self, species_id, random_stream=None, capacity=8):
+        """
+        This docstring belongs to Population __init__ it creates empty arrays for age, weight,
+        fitness and stage. The arrays are bigger than needed, soo animals can be appended
+        without making new arrays every time.
+        :param species_id: class. Herbivores or Carnivores, gives the species parameters.
+        :param random_stream: class object. The RandomStream of the cell, default_stream is used
+        if None.
+        :param capacity: int. Number of animals there is room for before the arrays grow.
+        The arrays are given by the class attribute columns, name and type of each array.
+        """
+        self.species_id = species_id
+        self.random = random_stream or default_stream
+        self.size = 0
+        for name, dtype in self.columns.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def age(self):
+        """Ages of the animals in the population."""
+        return self._age[:self.size]
+
+    @property
+    def weight(self):
+        """Weights of the animals in the population."""
+        return self._weight[:self.size]
+
+    @property
+    def fitness(self):
+        """Fitness of the animals in the population."""
+        return self._fitness[:self.size]
+
+    @property
+    def stage(self):
+        """Stage in the annual cycle of the animals in the population."""
+        return self._stage[:self.size]
+
+    def _reserve(self, new_size):
+        """
+        Makes the arrays bigger if there is not room for new_size animals.
+        The capacity is doubled, soo appending is cheap on average.
+        :param new_size: int. Number of animals the arrays must have room for.
+        :return: None
+        """
+        capacity = len(self._weight)
+        if new_size <= capacity:
+            return
+        while capacity < new_size:
+            capacity *= 2
+        for name in self.columns:
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def fitness_of(self, age, weight):
+        """
+        Calculates the fitness of one animal of this species, with the same formula as
+        Animal.fitness_update.
+        :param age: int. Age of the animal.
+        :param weight: float. Weight of the animal.
+        :return: float. Fitness of the animal.
+        """
+        return calculate_fitness(age, weight, self.species_id)
+
+    def append(self, age, weight, fitness=None, stage=None):
+        """
+        Adds one animal to the end of the population.
+        Fitness is calculated and stage is set like in Animal, if they are not given.
+        :param age: int. Age of the animal.
+        :param weight: float. Weight of the animal.
+        :param fitness: float. Fitness of the animal, used when an animal migrates.
+        :param stage: int. Stage of the animal, used when an animal migrates.
+        :return: None
+        """
+        if weight < 0:
+            raise ValueError("Animals can't have negative weight!")
+        if age < 0:
+            raise ValueError("Animals can't have negative age!")
+        if fitness is None:
+            fitness = self.fitness_of(age, weight)
+        if stage is None:
+            stage = 2 if age == 0 else 0
+
+        self._reserve(self.size + 1)
+        self._age[self.size] = age
+        self._weight[self.size] = weight
+        self._fitness[self.size] = fitness
+        self._stage[self.size] = stage
+        self.size += 1
+
+    def extend(self, age, weight, fitness, stage):
+        """
+        Adds many animals to the end of the population at once.
+        :param age: array. Ages of the animals.
+        :param weight: array. Weights of the animals.
+        :param fitness: array. Fitness of the animals.
+        :param stage: array. Stages of the animals.
+        :return: None
+        """
+        new_size = self.size + len(age)
+        self._reserve(new_size)
+        self._age[self.size:new_size] = age
+        self._weight[self.size:new_size] = weight
+        self._fitness[self.size:new_size] = fitness
+        self._stage[self.size:new_size] = stage
+        self.size = new_size
+
+    def add_animals(self, age, weight):
+        """
+        Adds many new animals at once. Fitness and stage are set like in append, but the values
+        must be checked before.
+        :param age: array. Ages of the animals.
+        :param weight: array. Weights of the animals.
+        :return: None
+        """
+        fitness = [self.fitness_of(ani_age, ani_weight)
+                   for ani_age, ani_weight in zip(age.tolist(), weight.tolist())]
+        self.extend(age, weight, fitness, np.where(age == 0, 2, 0))
+
+    def take(self, index):
+        """
+        Gives the data of some of the animals, they are not removed.
+        :param index: array. Positions of the animals.
+        :return: tuple. (age, weight, fitness, stage) arrays, ready for extend.
+        """
+        return (self.age[index], self.weight[index], self.fitness[index], self.stage[index])
+
+    def keep(self, mask):
+        """
+        Removes all animals where mask is False, the order of the others is kept.
+        :param mask: array of bool. True for the animals that should stay.
+        :return: None
+        """
+        mask = np.asarray(mask, dtype=bool)
+        new_size = int(mask.sum())
+        for name in self.columns:
+            arr = getattr(self, name)
+            arr[:new_size] = arr[:self.size][mask]
+        self.size = new_size
+
+    def reorder(self, index):
+        """
+        Puts the animals in a new order.
+        :param index: list. Old positions of the animals, in the new order.
+        :return: None
+        """
+        index = np.asarray(index, dtype=np.int64)
+        for name in self.columns:
+            arr = getattr(self, name)
+            arr[:self.size] = arr[:self.size][index]
+
+    def shuffle(self):
+        """
+        Puts the animals in a random order, used for the Herbivores eating order.
+        :return: None
+        """
+        if self.size > 1:
+            self.reorder(self.random.permutation(self.size))
+
+    def sort_by_fitness(self):
+        """
+        Sorts the animals after fitness, fittest first, used for the Carnivores eating order.
+        :return: None
+        """
+        fitness = self.fitness.tolist()
+        self.reorder(sorted(range(self.size), key=fitness.__getitem__, reverse=True))
+
+    def draw_numbers(self, size):
+        """
+        Gives random numbers, one at a time from the random stream like the Animal methods.
+        :param size: int. Number of random numbers.
+        :return: list. Random numbers between 0 <= x < 1
+        """
+        return [self.random.random_number() for _ in range(size)]
+
+    def herbivore_feeding(self, cell):
+        """
+        Herbivores in stage 0 eat in the current order, like Herbivores.feeding.
+        :param cell: class object. The cell the population is in.
+        :return: None
+        """
+        stage = self.stage
+        weight = self.weight.tolist()
+        for i in range(self.size):
+            if stage[i] == 0:
+                stage[i] = 1
+                food = self.species_id.beta * self.species_id.F
+                foods = self.species_id.F
+                if foods >= cell.fodder:
+                    food = self.species_id.beta * cell.fodder
+                    foods = cell.fodder
+                weight[i] += food
+                cell.eats_fodder(foods)
+        self.weight[:] = weight
+
+    def carnivore_feeding(self, cell):
+        """
+        Carnivores in stage 0 hunt in the current order, like Carnivores.feeding.
+        Every Carnivore tries the Herbivores still alive, from the lowest fitness and up.
+        The Herbivores are sorted after fitness once, and eaten Herbivores are skipped.
+        :param cell: class object. The cell the population is in, it contains the Herbivores.
+        :return: None
+        """
+        prey = cell.herbivore_list
+        prey_fitness = prey.fitness.tolist()
+        prey_weight = prey.weight.tolist()
+        herb_fitness_list = sorted(range(len(prey)), key=prey_fitness.__getitem__)
+        alive = [True] * len(prey)
+        prey_start = 0
+
+        stage = self.stage
+        age = self.age.tolist()
+        weight = self.weight.tolist()
+        fitness = self.fitness.tolist()
+        for i in range(self.size):
+            if stage[i] != 0:
+                continue
+            stage[i] = 1
+            food_eaten = 0
+            herb_id = prey_start
+            while herb_id < len(herb_fitness_list) and food_eaten < self.species_id.F and \
+                    fitness[i] > prey_fitness[herb_fitness_list[herb_id]]:
+                unfit_herb = herb_fitness_list[herb_id]
+                if alive[unfit_herb]:
+                    eat_prop = ((fitness[i] - prey_fitness[unfit_herb]) /
+                                self.species_id.DeltaPhiMax)
+                    if self.random.random_number() < eat_prop:
+                        weight[i] += prey_weight[unfit_herb] * self.species_id.beta
+                        fitness[i] = self.fitness_of(age[i], weight[i])
+                        food_eaten += prey_weight[unfit_herb]
+                        alive[unfit_herb] = False
+                herb_id += 1
+            while prey_start < len(herb_fitness_list) and not alive[herb_fitness_list[prey_start]]:
+                prey_start += 1
+
+        self.weight[:] = weight
+        self.fitness[:] = fitness
+        if not all(alive):
+            prey.keep(alive)
+
+    def birth(self):
+        """
+        Animals in stage 1 get a chance to have a calf, like Animal.birth.
+        Calves are added to the end of the population with stage 2.
+        :return: None
+        """
+        animal_count = self.size
+        params = self.species_id
+        stage = self.stage
+        age = self.age.tolist()
+        weight = self.weight.tolist()
+        fitness = self.fitness.tolist()
+        calves = []
+        for i in range(animal_count):
+            if stage[i] != 1:
+                continue
+            stage[i] = 2
+            calf_weight = self.random.gaussian_weight(params.w_birth, params.sigma_birth)
+            if weight[i] > params.zeta * (params.w_birth + params.sigma_birth) and \
+                    weight[i] > params.xi * calf_weight:
+                if animal_count >= 2:
+                    fitness[i] = self.fitness_of(age[i], weight[i])
+                    birth_prop = min(1.0, params.gamma * fitness[i] * (animal_count - 1))
+                    if self.random.random_number() <= birth_prop:
+                        calves.append(calf_weight)
+                        weight[i] -= params.xi * calf_weight
+
+        self.weight[:] = weight
+        self.fitness[:] = fitness
+        for calf_weight in calves:
+            self.append(0, calf_weight)
+
+    def migration(self):
+        """
+        Animals in stage 2 are checked if they will migrate, like Animal.migration.
+        :return: list. Positions of the animals that want to migrate.
+        """
+        stage = self.stage
+        age = self.age.tolist()
+        weight = self.weight.tolist()
+        fitness = self.fitness.tolist()
+        migrators = []
+        for i in range(self.size):
+            if stage[i] == 2:
+                stage[i] = 3
+                fitness[i] = self.fitness_of(age[i], weight[i])
+                if self.random.random_number() < self.species_id.mu * fitness[i]:
+                    migrators.append(i)
+        self.fitness[:] = fitness
+        return migrators
+
+    def ages_weight(self):
+        """
+        Animals in stage 3 get one year older and lose weight, like Animal.ages_weight.
+        :return: None
+        """
+        olds = self.stage == 3
+        self.stage[olds] = 4
+        self.age[olds] += 1
+        self.weight[olds] -= self.species_id.eta * self.weight[olds]
+
+    def death(self):
+        """
+        Animals in stage 4 are checked if they die, like Animal.death, dead animals are removed.
+        :return: None
+        """
+        stage = self.stage
+        age = self.age.tolist()
+        weight = self.weight.tolist()
+        fitness = self.fitness.tolist()
+        alive = [True] * self.size
+        for i in range(self.size):
+            if stage[i] == 4:
+                stage[i] = 0
+                fitness[i] = self.fitness_of(age[i], weight[i])
+                props_death = self.species_id.omega * (1 - fitness[i])
+                if weight[i] <= 0:
+                    alive[i] = False
+                elif self.random.random_number() <= props_death:
+                    alive[i] = False
+        self.fitness[:] = fitness
+        if not all(alive):
+            self.keep(alive)
+
+
+class VectorizedPopulation(Population):
+    """
+    Population where every step of the annual cycle is done with array operations.
+    """
+
+    def fitness_update(self, index=None):
+        """
+        Calculates the fitness of the animals with one NumPy expression.
+        :param index: array. Positions of the animals to update, all animals if None.
+        :return: array. The new fitness of the animals.
+        """
+        if index is None:
+            index = slice(None)
+        fitness = calculate_fitness_array(self.age[index], self.weight[index], self.species_id)
+        self.fitness[index] = fitness
+        return fitness
+
+    def add_animals(self, age, weight):
+        """
+        Same as Population.add_animals, but the fitness is calculated for all at once.
+        :param age: array. Ages of the animals.
+        :param weight: array. Weights of the animals.
+        :return: None
+        """
+        start = self.size
+        self.extend(age, weight, 0.0, np.where(age == 0, 2, 0))
+        self.fitness_update(slice(start, self.size))
+
+    def shuffle(self):
+        """
+        Puts the animals in a random order, with the NumPy generator of the random stream.
+        :return: None
+        """
+        self.reorder(self.random.permutation(self.size))
+
+    def sort_by_fitness(self):
+        """
+        Sorts the animals after fitness, fittest first.
+        :return: None
+        """
+        self.reorder(np.argsort(-self.fitness, kind='stable'))
+
+    def draw_numbers(self, size):
+        """
+        Gives random numbers, all drawn at once from the NumPy generator of the random stream.
+        :param size: int. Number of random numbers.
+        :return: array. Random numbers between 0 <= x < 1
+        """
+        return self.random.random_numbers(size)
+
+    def herbivore_feeding(self, cell):
+        """
+        Herbivores in stage 0 eat in the current order. Each Herbivore eats F, or what is left
+        after the Herbivores before it, found with a cumulative sum.
+        :param cell: class object. The cell the population is in.
+        :return: None
+        """
+        eaters = np.flatnonzero(self.stage == 0)
+        if not len(eaters):
+            return
+        appetite = self.species_id.F
+        eaten_before = appetite * np.arange(len(eaters))
+        foods = np.clip(cell.fodder - eaten_before, 0, appetite)
+        self.stage[eaters] = 1
+        self.weight[eaters] += self.species_id.beta * foods
+        cell.eats_fodder(foods.sum())
+
+    def carnivore_feeding(self, cell):
+        """
+        Carnivores in stage 0 hunt in the current order. The Herbivores are sorted once after
+        fitness, and every Carnivore walks this order and skips the Herbivores already eaten.
+        Random numbers are drawn in blocks.
+        :param cell: class object. The cell the population is in, it contains the Herbivores.
+        :return: None
+        """
+        hunters = np.flatnonzero(self.stage == 0)
+        self.stage[hunters] = 1
+        prey = cell.herbivore_list
+        if not len(hunters) or not len(prey):
+            return
+
+        prey_order = np.argsort(prey.fitness, kind='stable')
+        hunter_weight = self.weight[hunters].tolist()
+        hunter_fitness = self.fitness[hunters].tolist()
+        eaten = hunt(self.species_id, self.random, self.age[hunters].tolist(), hunter_weight,
+                     hunter_fitness, prey.fitness[prey_order].tolist(),
+                     prey.weight[prey_order].tolist())
+
+        self.weight[hunters] = hunter_weight
+        self.fitness[hunters] = hunter_fitness
+        if eaten.any():
+            alive = np.ones(len(prey), dtype=bool)
+            alive[prey_order[eaten]] = False
+            prey.keep(alive)
+
+    def birth(self):
+        """
+        Animals in stage 1 get a chance to have a calf. Calf weights and random numbers are
+        drawn for all of them at once, and the calves are added with one extend.
+        :return: None
+        """
+        parents = np.flatnonzero(self.stage == 1)
+        if not len(parents):
+            return
+        params = self.species_id
+        animal_count = self.size
+        self.stage[parents] = 2
+        calf_weight = self.random.gaussian_weights(params.w_birth, params.sigma_birth, len(parents))
+        weight = self.weight[parents]
+        fitness = self.fitness_update(parents)
+        birth_prop = np.minimum(1.0, params.gamma * fitness * (animal_count - 1))
+        born = (weight > params.zeta * (params.w_birth + params.sigma_birth)) & \
+            (weight > params.xi * calf_weight) & \
+            (self.draw_numbers(len(parents)) <= birth_prop)
+        if animal_count < 2 or not born.any():
+            return
+        self.weight[parents[born]] -= params.xi * calf_weight[born]
+
+        calf_weight = calf_weight[born]
+        calf_age = np.zeros(len(calf_weight), dtype=np.int64)
+        start = self.size
+        self.extend(calf_age, calf_weight, 0, 2)
+        self.fitness_update(slice(start, self.size))
+
+    def migration(self):
+        """
+        Animals in stage 2 are checked if they will migrate, all at once.
+        :return: array. Positions of the animals that want to migrate.
+        """
+        movers = np.flatnonzero(self.stage == 2)
+        self.stage[movers] = 3
+        fitness = self.fitness_update(movers)
+        return movers[self.draw_numbers(len(movers)) < self.species_id.mu * fitness]
+
+    def death(self):
+        """
+        Animals in stage 4 are checked if they die, all at once, dead animals are removed.
+        :return: None
+        """
+        olds = np.flatnonzero(self.stage == 4)
+        if not len(olds):
+            return
+        self.stage[olds] = 0
+        fitness = self.fitness_update(olds)
+        dead = (self.weight[olds] <= 0) | \
+            (self.draw_numbers(len(olds)) <= self.species_id.omega * (1 - fitness))
+        if dead.any():
+            alive = np.ones(self.size, dtype=bool)
+            alive[olds[dead]] = False
+            self.keep(alive)
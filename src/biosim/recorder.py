@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Jon Augensen & Lars Øvergård, NMBU'
+__email__ = 'jon.augensen@nmbu.no / lars.overgard@hotmail.com'
+
+"""
+This file contains the recorder, which keeps the history of a simulation in NumPy arrays.
+For every recorded year it stores the number of animals in every cell, and the mean age, weight
+and fitness of both species. The arrays have room for chunk_years years, and get chunk_years
+more rows when they are full, soo nothing is copied every year.
+The arrays can be kept in memory, or in memory-mapped files in a folder, where they can be
+read with read_recording while the simulation is running or after it's done.
+"""
+
+import json
+import os
+import numpy as np
+
+SPECIES = ('Herbivore', 'Carnivore')
+MEAN_VALUES = ('age', 'weight', 'fitness')
+
+
+class Recorder:
+    """
+    Records the state of an island every year, in columns with one row per year.
+    """
+    def __init__(self, shape, path=None, chunk_years=256):
+        """
+        This docstring belongs to Recorder __init__ it makes the first chunk of the arrays.
+        :param shape: tuple. Rows and columns of the map.
+        :param path: str. Folder for the memory-mapped files, the arrays are kept in memory if
+        None. Files from an earlier recording in the folder are written over.
+        :param chunk_years: int. Number of years the arrays grow with when they are full.
+        """
+        if type(chunk_years) != int or chunk_years < 1:
+            raise ValueError("chunk_years must be a positive whole number!")
+        self.path = path
+        self.chunk_years = chunk_years
+        self.columns = {'year': (np.int64, ()),
+                        'herbivore_map': (np.int32, tuple(shape)),
+                        'carnivore_map': (np.int32, tuple(shape)),
+                        'means': (float, (len(SPECIES), len(MEAN_VALUES)))}
+        self.rows = 0
+        self.capacity = 0
+        self.arrays = {}
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+        self.grow()
+
+    def grow(self):
+        """
+        Makes room for chunk_years more years in every array. In memory the arrays are copied
+        to bigger arrays, in files the files are made longer and mapped again.
+        :return: None
+        """
+        capacity = self.capacity + self.chunk_years
+        for name, (dtype, shape) in self.columns.items():
+            if self.path is None:
+                array = np.zeros((capacity,) + shape, dtype=dtype)
+                if self.capacity:
+                    array[:self.rows] = self.arrays[name][:self.rows]
+            else:
+                file_name = os.path.join(self.path, name + '.bin')
+                if name in self.arrays:
+                    self.arrays[name].flush()
+                    del self.arrays[name]
+                with open(file_name, 'r+b' if self.capacity else 'wb') as f:
+                    f.truncate(capacity * int(np.prod(shape, dtype=np.int64)) *
+                               np.dtype(dtype).itemsize)
+                array = np.memmap(file_name, dtype=dtype, mode='r+', shape=(capacity,) + shape)
+            self.arrays[name] = array
+        self.capacity = capacity
+        self.flush()
+
+    def record(self, island):
+        """
+        Adds one row with the state of the island.
+        :param island: class object. Island, FlatIsland or ParallelIsland.
+        :return: None
+        """
+        if self.rows == self.capacity:
+            self.grow()
+        (herbivore_map, carnivore_map) = island.count_map()
+        sums = island.sum_values()
+        self.arrays['year'][self.rows] = island.year
+        self.arrays['herbivore_map'][self.rows] = herbivore_map
+        self.arrays['carnivore_map'][self.rows] = carnivore_map
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.arrays['means'][self.rows] = sums[:, 1:] / sums[:, :1]
+        self.rows += 1
+
+    def __len__(self):
+        """
+        Number of recorded years.
+        """
+        return self.rows
+
+    def __getitem__(self, name):
+        """
+        Gives the recorded rows of one column.
+        :param name: str. 'year', 'herbivore_map', 'carnivore_map' or 'means'.
+        :return: array. One row per recorded year.
+        """
+        return self.arrays[name][:self.rows]
+
+    def mean(self, species, value):
+        """
+        Gives the mean of one value of one species, for every recorded year.
+        :param species: str. 'Herbivore' or 'Carnivore'.
+        :param value: str. 'age', 'weight' or 'fitness'.
+        :return: array. The mean, NaN in years without animals of the species.
+        """
+        return self['means'][:, SPECIES.index(species), MEAN_VALUES.index(value)]
+
+    def flush(self):
+        """
+        Writes the memory-mapped arrays and the number of rows to the folder.
+        :return: None
+        """
+        if self.path is None:
+            return
+        for array in self.arrays.values():
+            array.flush()
+        info = {'rows': self.rows,
+                'columns': {name: [np.dtype(dtype).str, list(shape)]
+                            for name, (dtype, shape) in self.columns.items()}}
+        with open(os.path.join(self.path, 'recording.json'), 'w') as f:
+            json.dump(info, f)
+
+
+def read_recording(path):
+    """
+    Reads a recording from a folder, without loading the arrays into memory.
+    :param path: str. Folder of the recording.
+    :return: dict. Read-only memory-mapped array of every column, with one row per recorded year.
+    """
+    with open(os.path.join(path, 'recording.json')) as f:
+        info = json.load(f)
+    rows = info['rows']
+    arrays = {}
+    for name, (dtype, shape) in info['columns'].items():
+        if rows:
+            arrays[name] = np.memmap(os.path.join(path, name + '.bin'), dtype=dtype, mode='r',
+                                     shape=(rows,) + tuple(shape))
+        else:
+            arrays[name] = np.zeros((0,) + tuple(shape), dtype=dtype)
+    return arrays
@@ -10,12 +10,18 @@ and is used to control and modify our setup.
 Only the code in the function is added by our team (Jon & Lars).
 """
 
-import random
+import json
 import os
+import subprocess
+import numpy as np
 from .island import Island
-from .animals import Herbivores, Carnivores
-from .biome import Lowland, Highland, Desert, Water, Fence, Mountain
-from .graphics import Plot
+from .flat_island import FlatIsland
+from .parallel import ParallelIsland, parameter_state, set_parameter_state
+from .animals import Animal
+from .graphics import Plot, PlotProcess
+from .log_writer import LogWriter
+from .recorder import Recorder
+from .math_funcs import clear_tables
 
 
 class BioSim:
@@ -24,7 +30,10 @@ class BioSim:
     """
     def __init__(self, island_map, ini_pop, seed, vis_years=1, ymax_animals=None, cmax_animals=None,
                  hist_specs=None, img_dir=None, img_base=None, img_fmt='png', img_years=None,
-                 log_file=None):
+                 log_file=None, engine='object', workers=None, log_format='csv', log_cells=False,
+                 log_flush_years=100, record=False, record_dir=None, headless=False,
+                 frame_rate=10, render_process=False, render_queue=8, movie_file=None,
+                 movie_fps=10):
         """
         This docstring belongs to biosim __init__
         :param island_map: Multi-line string specifying island geography
@@ -38,7 +47,38 @@ class BioSim:
         :param img_base: String with beginning of file name for figures
         :param img_fmt: String with file type for figures, e.g. ’png’
         :param img_years: years between visualizations saved to files (default: vis_years)
-        :param log_file: If given, write animal counts to this file
+        :param log_file: If given, write animal counts to this file, see log_writer.LogWriter
+        :param engine: String with how animals are stored, 'object' (one Animal object per
+        animal), 'array' (NumPy arrays per species and cell, uses much less memory) or
+        'vectorized' (same arrays, but the annual cycle is done with NumPy operations) or
+        'flat' (all animals on the island in one set of arrays, fastest for big maps, but
+        migrants into earlier cells age and die the same year, and animals added with age 0 eat
+        and breed the first year, soo the populations are not the same as with the other
+        engines) or
+        'parallel' (the map is split in strips of rows, simulated by worker processes)
+        :param workers: Number of worker processes for the 'parallel' engine, default is the
+        number of CPUs
+        :param log_format: String with the format of the log file, 'csv' or 'binary'
+        :param log_cells: If True, the number of animals in every cell is also logged
+        :param log_flush_years: Number of years kept in memory before they are written to the
+        log file, the log is also written at the end of simulate
+        :param record: If True, the number of animals in every cell and the mean age, weight and
+        fitness of both species are recorded every year, see recorder.Recorder
+        :param record_dir: String with path to a folder where the recording is kept in
+        memory-mapped files, it's kept in memory if None
+        :param headless: If True, no graphics are made whatever vis_years is, and the animals are
+        only counted in the years the counts are used, which is when they are logged, when a
+        checkpoint is saved and the last year of every simulate. The population history then
+        only has these years, island.history_years tells which years they are
+        :param frame_rate: Highest number of window updates per second, updates that come faster
+        are dropped, but the images are still saved. Every update is shown if None
+        :param render_process: If True, the plots are drawn and saved by a render process, see
+        graphics.PlotProcess, soo the simulation continues while the images are made
+        :param render_queue: Highest number of years waiting to be drawn by the render process
+        :param movie_file: String with path to a movie, like 'sim.mp4'. If given, the figures of
+        img_years are sent straight to ffmpeg while simulating, see video_writer.VideoWriter,
+        instead of being saved as images. make_movie finishes the movie
+        :param movie_fps: Frames per second in the movie
         If ymax_animals is None, the y-axis limit should be adjusted automatically.
         If cmax_animals is None, sensible, fixed default values should be used.
         cmax_animals is a dict mapping species names to numbers, e.g.,
@@ -47,19 +87,22 @@ class BioSim:
         For each property, a dictionary providing the maximum value and the bin width must be
         given, e.g.,
         {’weight’: {’max’: 80, ’delta’: 2}, ’fitness’: {’max’: 1.0, ’delta’: 0.05}}
-        Permitted properties are ’weight’, ’age’, ’fitness’.
+        Permitted properties are ’weight’, ’age’, ’fitness’. Animals with a value above max are
+        counted in the last bin, soo the last bar is max - delta and up.
         If img_dir is None, no figures are written to file. Filenames are formed as
         f’{os.path.join(img_dir, img_base}_{img_number:05d}.{img_fmt}’
         where img_number are consecutive image numbers starting from 0.
         img_dir and img_base must either be both None or both strings.
 
-        Sets the random seed, creates the island, and adds animals, will add none if zero given.
+        Creates the island with it's own random stream from the seed, and adds animals, will add
+        none if zero given.
         If desired, it will show plots and update it once to show initialized animals.
         """
         self.island_map = island_map
         self.ini_pop = ini_pop
         self.seed = seed
-        self.vis_years = vis_years
+        self.vis_years = 0 if headless else vis_years
+        self.headless = headless
         self.ymax_animals = ymax_animals
         self.cmax_animals = cmax_animals
         self.hist_specs = hist_specs
@@ -67,132 +110,225 @@ class BioSim:
         self.img_base = img_base
         self.img_fmt = img_fmt
         self.log_file = log_file
+        self.engine = engine
+        self.workers = workers
+        self.movie_file = movie_file
+        self.movie_fps = movie_fps
         self.plot_window = 0
+        self.log_writer = None
+        self.log_cells = log_cells
+        self.recorder = None
 
         if img_years or img_years == 0:
             self.img_years = img_years
         else:
             self.img_years = vis_years
 
-        random.seed(self.seed)
-        self.island = Island(self.island_map)
+        if self.engine == 'flat':
+            self.island = FlatIsland(self.island_map, self.seed, self.hist_specs)
+        elif self.engine == 'parallel':
+            self.island = ParallelIsland(self.island_map, self.seed, self.workers,
+                                         hist_specs=self.hist_specs)
+        else:
+            self.island = Island(self.island_map, self.engine, self.seed, self.hist_specs)
         self.island.make_island()
         self.island.add_pop(self.ini_pop)
+        if record:
+            self.recorder = Recorder((self.island.y, self.island.x), record_dir)
+            self.recorder.record(self.island)
+        if self.log_file:
+            self.log_writer = LogWriter(self.log_file, log_format, log_flush_years,
+                                        (self.island.y, self.island.x) if log_cells else None)
         if self.vis_years and self.vis_years != 0:
-            self.plot_window = Plot(self.island_map, self.vis_years, self.img_years, self.img_fmt,
-                                    self.img_dir, self.img_base, self.hist_specs, self.ymax_animals,
-                                    self.cmax_animals)
-            self.plot_window.update_plot(self.island.do_all_stats())
+            plot_args = (self.island_map, self.vis_years, self.img_years, self.img_fmt,
+                         self.img_dir, self.img_base, self.hist_specs, self.ymax_animals,
+                         self.cmax_animals, frame_rate, movie_file, movie_fps)
+            if render_process:
+                self.plot_window = PlotProcess(*plot_args, queue_size=render_queue)
+            else:
+                self.plot_window = Plot(*plot_args)
+            self.plot_window.update_plot(self.island.do_all_stats(), force=True)
 
-    @staticmethod
-    def set_animal_parameters(species, params):
+    def set_animal_parameters(self, species, params):
         """
         Set parameters for animal species.
         :param species: String, name of animal species
         :param params: Dict with valid parameter specification for species
+        The parameters are only changed for this simulation, every island has it's own species
+        classes.
+        All parameters are checked before any of them are changed. Then the fitness stored by
+        existing animals is marked as outdated, and the fitness lookup tables are made again.
         """
-        if species == "Herbivore":
-            for param in params:
-                if hasattr(Herbivores, param):
-                    setattr(Herbivores, param, params[param])
-                else:
-                    raise ValueError("'" + param + "' is not a parameter in " + species +
-                                     ". Check spelling!")
-        elif species == "Carnivore":
-            for param in params:
-                if hasattr(Carnivores, param):
-                    setattr(Carnivores, param, params[param])
-                else:
-                    raise ValueError("'" + param + "' is not a parameter in " + species +
-                                     ". Check spelling!")
-        else:
+        if species not in self.island.species:
             raise ValueError("'" + species + "' is not in this simulation. Check spelling!")
+        for param, value in params.items():
+            if not hasattr(self.island.species[species], param):
+                raise ValueError("'" + param + "' is not a parameter in " + species +
+                                 ". Check spelling!")
+            if isinstance(value, (int, float)) and value < 0:
+                raise ValueError("'" + param + "' in " + species + " can't be negative!")
+        for param, value in params.items():
+            setattr(self.island.species[species], param, value)
+        Animal.params_version += 1
+        clear_tables()
 
     @staticmethod
-    def set_landscape_parameters(landscape, params):
+    def ensemble(island_map, ini_pop, seeds, years, animal_params=None, landscape_params=None,
+                 engine='object', processes=None, quantiles=(0.05, 0.5, 0.95)):
+        """
+        Simulates the same scenario once for every seed in a process pool, without graphics.
+        See ensemble.run_ensemble.
+        :param island_map: Multi-line string specifying island geography
+        :param ini_pop: List of dictionaries specifying initial population
+        :param seeds: List of seeds, one simulation per seed
+        :param years: Number of years to simulate
+        :param animal_params: Dict with parameters for set_animal_parameters, by species
+        :param landscape_params: Dict with parameters for set_landscape_parameters, by landscape
+        :param engine: Engine used by the simulations
+        :param processes: Number of worker processes, default is the number of CPUs
+        :param quantiles: Quantiles to calculate for every year
+        :return: Dict with the herbivore and carnivore counts per seed and year, their mean and
+        quantiles
+        """
+        # Imported here since the ensemble module uses BioSim
+        from .ensemble import run_ensemble
+        return run_ensemble(island_map, ini_pop, seeds, years, animal_params, landscape_params,
+                            engine, processes, quantiles)
+
+    def set_landscape_parameters(self, landscape, params):
         """
         Set parameters for landscape type.
         :param landscape: String, code letter for landscape
         :param params: Dict with valid parameter specification for landscape
+        The parameters are only changed for this simulation.
         """
-        if landscape == "D":
-            for param in params:
-                if hasattr(Desert, param):
-                    setattr(Desert, param, params[param])
-                else:
-                    raise ValueError("'" + param + "' is not a parameter in " + landscape +
-                                     ". Check spelling!")
-        elif landscape == "W":
-            for param in params:
-                if hasattr(Water, param):
-                    setattr(Water, param, params[param])
-                else:
-                    raise ValueError("'" + param + "' is not a parameter in " + landscape +
-                                     ". Check spelling!")
-        elif landscape == "L":
-            for param in params:
-                if hasattr(Lowland, param):
-                    setattr(Lowland, param, params[param])
-                else:
-                    raise ValueError("'" + param + "' is not a parameter in " + landscape +
-                                     ". Check spelling!")
-        elif landscape == "H":
-            for param in params:
-                if hasattr(Highland, param):
-                    setattr(Highland, param, params[param])
-                else:
-                    raise ValueError("'" + param + "' is not a parameter in " + landscape +
-                                     ". Check spelling!")
-        elif landscape == "M":
-            for param in params:
-                if hasattr(Mountain, param):
-                    setattr(Mountain, param, params[param])
-                else:
-                    raise ValueError("'" + param + "' is not a parameter in " + landscape +
-                                     ". Check spelling!")
-        elif landscape == "F":
-            for param in params:
-                if hasattr(Fence, param):
-                    setattr(Fence, param, params[param])
-                else:
-                    raise ValueError("'" + param + "' is not a parameter in " + landscape +
-                                     ". Check spelling!")
-        else:
+        if landscape not in self.island.landscapes:
             raise ValueError("'" + landscape + "' is not in simulation. Check spelling!")
+        for param in params:
+            if hasattr(self.island.landscapes[landscape], param):
+                setattr(self.island.landscapes[landscape], param, params[param])
+            else:
+                raise ValueError("'" + param + "' is not a parameter in " + landscape +
+                                 ". Check spelling!")
 
-    def simulate(self, num_years):
+    def simulate(self, num_years, checkpoint_years=None, checkpoint_path=None):
         """
         Run simulation while visualizing the result.
-        Will also create a folder, if it doesn't exist, with a text file which contains a log over
-        the population in the sim for each year. File will be save to a folder named logs, and it's
-        name will be determined by the user and the current seed.
+        If a log_file was given, the number of animals every year is added to the log, and the
+        log is written to the file at the end. With a render process, it waits at the end until
+        all the years are drawn and saved.
         :param num_years: number of years to simulate
+        :param checkpoint_years: years between automatic checkpoints, none are saved if None
+        :param checkpoint_path: file the checkpoints are saved to, see save_checkpoint, it's
+        written over every time
         """
         if type(num_years) != int:
             raise ValueError("Year must be a whole number and can't be written!")
         elif num_years < 0:
             raise ValueError("Year can not be negative!")
+        elif checkpoint_years and not checkpoint_path:
+            raise ValueError("A checkpoint_path is needed to save checkpoints!")
         else:
-            path_name = ''
-            if self.log_file:
-                path_name = '../logs/' + self.log_file + str(self.seed)
-                if not os.path.isdir('../logs/'):
-                    os.mkdir('../logs/')
             for year in range(num_years):
-                self.island.simulate_island()
+                next_year = self.island.year + 1
+                self.island.stats.active = bool(self.vis_years) and \
+                    next_year % self.vis_years == 0
+                count = not self.headless or self.log_writer is not None or \
+                    year == num_years - 1 or \
+                    bool(checkpoint_years) and next_year % checkpoint_years == 0
+                self.island.simulate_island(count)
                 if self.vis_years and self.vis_years != 0 and self.island.year % \
                         self.vis_years == 0:
-                    self.plot_window.update_plot(self.island.do_all_stats())
-                if self.log_file:
-                    f = open(path_name, "a")
-                    f.write('Year: ' + str(self.island.year) + ' Herbivores: '
-                            + str(self.island.herbivore_pop_history[-1]) + ' Carnivores: ' +
-                            str(self.island.carnivore_pop_history[-1]) + " \n")
-                    f.close()
+                    self.plot_window.update_plot(self.island.do_all_stats(),
+                                                 force=year == num_years - 1)
+                if self.log_writer:
+                    self.log_writer.write(self.island.year, self.island.herbivore_pop_history[-1],
+                                          self.island.carnivore_pop_history[-1],
+                                          *(self.island.count_map() if self.log_cells else ()))
+                if self.recorder:
+                    self.recorder.record(self.island)
+                if checkpoint_years and self.island.year % checkpoint_years == 0:
+                    self.save_checkpoint(checkpoint_path)
+            if self.plot_window:
+                self.plot_window.wait()
+            if self.log_writer:
+                self.log_writer.flush()
+            if self.recorder:
+                self.recorder.flush()
+
+    def close(self):
+        """
+        Stops the worker processes of the 'parallel' engine and the render process, finishes
+        the movie and writes the rest of the log and the recording. The simulation can't be
+        continued after this. BioSim can also be used in a with statement, which closes it at
+        the end.
+        """
+        if self.engine == 'parallel':
+            self.island.close()
+        if self.plot_window:
+            self.plot_window.close()
+        if self.log_writer:
+            self.log_writer.close()
+        if self.recorder:
+            self.recorder.flush()
+
+    def __enter__(self):
+        """Gives the simulation to the with statement."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Closes the simulation at the end of the with statement."""
+        self.close()
+
+    def save_checkpoint(self, path):
+        """
+        Saves the whole state of the simulation to a NumPy .npz file, soo it can be continued
+        with load_checkpoint. The animals are saved as columns of age, weight, fitness and stage,
+        together with the fodder, the year, the population history, the random stream and the
+        parameters. The file is written to a temporary file first, soo an old checkpoint is not
+        lost if the program stops while saving. The log is written to it's file at the same
+        time, soo it's up to date with the checkpoint.
+        With the 'parallel' engine the state is collected from the workers, with the random
+        stream of every worker.
+        :param path: Name of the checkpoint file
+        """
+        state = self.island.get_state()
+        state['island_map'] = np.array(self.island_map)
+        state['engine'] = np.array(self.engine)
+        state['parameters'] = np.array(json.dumps(parameter_state(self.island.species,
+                                                                  self.island.landscapes)))
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, **state)
+        os.replace(path + '.tmp', path)
+        if self.log_writer:
+            self.log_writer.flush()
+
+    def load_checkpoint(self, path):
+        """
+        Continues the simulation from a checkpoint saved by save_checkpoint. The animals, the
+        year, the history, the random stream and the parameters are all replaced.
+        The simulation must have the same map and engine as the one that was saved, and with
+        the 'parallel' engine also the same number of workers.
+        :param path: Name of the checkpoint file
+        """
+        with np.load(path) as data:
+            state = {key: data[key] for key in data.files}
+        if str(state['island_map']).split() != self.island_map.split():
+            raise ValueError("The checkpoint is from a different map!")
+        if str(state['engine']) != self.engine:
+            raise ValueError("The checkpoint is from the '" + str(state['engine']) +
+                             "' engine!")
+        set_parameter_state(json.loads(str(state['parameters'])), self.island.species,
+                            self.island.landscapes)
+        self.island.set_state(state)
 
     def add_population(self, population):
         """
         Add a population to the island
+        A location can be given with a list of animals, {'loc': (10, 10), 'pop': [...]}, or
+        with columns, {'loc': (10, 10), 'species': 'Herbivore', 'age': ages,
+        'weight': weights}, where ages and weights are NumPy arrays. Columns are checked once
+        and loaded directly into the cell, which is much faster for many animals.
         :param population: List of dictionaries specifying population
         """
         self.island.add_pop(population)
@@ -214,12 +350,17 @@ class BioSim:
                 'Carnivore': self.island.carnivore_pop_history[-1]}
 
     def make_movie(self):
-        """Create MPEG4 movie from visualization images saved."""
+        """
+        Create MPEG4 movie from visualization images saved.
+        If a movie_file was given, the movie was made while simulating, and this finishes it.
+        Nothing more can be added to it after this.
+        """
+        if self.movie_file:
+            if self.plot_window:
+                self.plot_window.close()
+            return
         if not os.path.isdir('../video/'):
             os.mkdir('../video/')
-        os.system("ffmpeg -r 1 -i ../" + self.img_dir + "/" + self.img_base + "_0000%01d.png "
-                                                                              "-vcodec "
-                                                                              "mpeg4 -y "
-                                                                              "../video/"
-                                                                              "simulation_movie."
-                                                                              "mp4")
+        subprocess.run(['ffmpeg', '-r', str(self.movie_fps), '-i',
+                        os.path.join(self.img_dir, self.img_base + '_%05d.' + self.img_fmt),
+                        '-vcodec', 'mpeg4', '-y', '../video/simulation_movie.mp4'], check=True)
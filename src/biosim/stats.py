@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Jon Augensen & Lars Øvergård, NMBU'
+__email__ = 'jon.augensen@nmbu.no / lars.overgard@hotmail.com'
+
+"""
+This file contains the statistics of the animals used for the histograms.
+Instead of lists with the age, weight and fitness of every animal, the StatsAccumulator keeps
+a histogram with fixed bins and the running moments (count, sum and sum of squares) for each
+species. The cells add their animals when the island is done with the year, soo the memory
+used only depends on the number of bins.
+The bins are given by hist_specs, like {'weight': {'max': 80, 'delta': 2}}. Values above max
+are not dropped, they are counted in the last bin, soo every histogram still has all the animals
+and the last bar means max or more.
+"""
+
+import numpy as np
+
+PROPERTIES = ('fitness', 'age', 'weight')
+DEFAULT_HIST_SPECS = {'fitness': {'max': 1.0, 'delta': 0.05},
+                      'age': {'max': 60, 'delta': 2},
+                      'weight': {'max': 60, 'delta': 2}}
+
+
+def check_hist_specs(hist_specs):
+    """
+    Checks the histogram specifications, and fills in the default for missing properties.
+    :param hist_specs: dict. 'max' and 'delta' for 'fitness', 'age' or 'weight', the default
+    is used for all if None. Values above 'max' are counted in the last bin.
+    :return: dict. Specification of all three properties.
+    """
+    specs = dict(DEFAULT_HIST_SPECS)
+    for name, spec in (hist_specs or {}).items():
+        if name not in PROPERTIES:
+            raise ValueError("'" + str(name) + "' is not a property with a histogram!")
+        if spec['delta'] <= 0 or spec['max'] < spec['delta']:
+            raise ValueError("The histogram of " + name + " must have max >= delta > 0!")
+        specs[name] = spec
+    return specs
+
+
+def bin_edges(hist_specs):
+    """
+    Gives the edges of the bins of every histogram.
+    :param hist_specs: dict. Histogram specifications, see check_hist_specs.
+    :return: dict. Array with the bin edges, from 0 to max, by property.
+    """
+    specs = check_hist_specs(hist_specs)
+    return {name: np.arange(int(round(specs[name]['max'] / specs[name]['delta'])) + 1) *
+            specs[name]['delta'] for name in PROPERTIES}
+
+
+class StatsAccumulator:
+    """
+    Histograms and running moments of age, weight and fitness, for both species.
+    """
+    def __init__(self, hist_specs=None):
+        """
+        This docstring belongs to StatsAccumulator __init__ it makes the empty histograms.
+        active tells if the cells should add their animals at the end of the year. If it's
+        False, nothing is added, and the statistics are collected when they are asked for.
+        :param hist_specs: dict. Histogram specifications, see check_hist_specs.
+        """
+        self.edges = bin_edges(hist_specs)
+        self.delta = {name: self.edges[name][1] for name in PROPERTIES}
+        self.counts = {name: np.zeros((2, len(self.edges[name]) - 1), dtype=np.int64)
+                       for name in PROPERTIES}
+        # Count, sum and sum of squares, for every species and property
+        self.moments = np.zeros((2, len(PROPERTIES), 3))
+        self.active = False
+        self.year = -1
+
+    def reset(self, year):
+        """
+        Empties the histograms and moments, before the statistics of a new year are added.
+        :param year: int. The year the statistics are for.
+        :return: None
+        """
+        for counts in self.counts.values():
+            counts[:] = 0
+        self.moments[:] = 0
+        self.year = year
+
+    def add(self, code, fitness, age, weight):
+        """
+        Adds animals of one species. Values above the max of a histogram are clipped into the
+        last bin, soo the last bin counts every animal from max - delta and up. The moments
+        use the real values.
+        :param code: int. HERBIVORE or CARNIVORE.
+        :param fitness: array. Fitness of the animals.
+        :param age: array. Ages of the animals.
+        :param weight: array. Weights of the animals.
+        :return: None
+        """
+        if not len(fitness):
+            return
+        for (number, name, values) in ((0, 'fitness', fitness), (1, 'age', age),
+                                       (2, 'weight', weight)):
+            values = np.asarray(values, dtype=float)
+            bins = self.counts[name].shape[1]
+            index = np.clip((values / self.delta[name]).astype(np.int64), 0, bins - 1)
+            self.counts[name][code] += np.bincount(index, minlength=bins)
+            self.moments[code, number] += (len(values), values.sum(), (values * values).sum())
+
+    def histograms(self):
+        """
+        Gives the histograms in the same order as Island.do_all_stats.
+        :return: list. Counts of Herbivore fitness, age and weight, then Carnivore fitness, age
+        and weight.
+        """
+        return [self.counts[name][code].copy() for code in (0, 1) for name in PROPERTIES]
+
+    def mean(self, code, name):
+        """
+        Gives the mean of one property of one species.
+        :param code: int. HERBIVORE or CARNIVORE.
+        :param name: str. 'fitness', 'age' or 'weight'.
+        :return: float. The mean, NaN if there are no animals.
+        """
+        (count, total, _) = self.moments[code, PROPERTIES.index(name)]
+        return total / count if count else float('nan')
+
+    def std(self, code, name):
+        """
+        Gives the standard deviation of one property of one species.
+        :param code: int. HERBIVORE or CARNIVORE.
+        :param name: str. 'fitness', 'age' or 'weight'.
+        :return: float. The standard deviation, NaN if there are no animals.
+        """
+        (count, total, squares) = self.moments[code, PROPERTIES.index(name)]
+        if not count:
+            return float('nan')
+        return float(np.sqrt(max(squares / count - (total / count) ** 2, 0.0)))
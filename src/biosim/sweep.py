@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Jon Augensen & Lars Øvergård, NMBU'
+__email__ = 'jon.augensen@nmbu.no / lars.overgard@hotmail.com'
+
+"""
+This file contains the parameter sweep, which simulates the same scenario for many sets of
+animal and landscape parameters.
+Parameters are named 'Herbivore.mu', 'Carnivore.F' or 'L.f_max', the species name or the
+landscape letter, then the parameter. Every point of the sweep is simulated in a process pool.
+The parameters are set on each simulation, soo the points don't affect each other.
+Finished points can be saved in a folder, and are read from there instead of simulated again
+when the same sweep is run again, soo an interrupted sweep continues where it stopped.
+"""
+
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import numpy as np
+from .simulation import BioSim
+from .animals import species_classes
+from .biome import landscape_classes
+from .parallel import parameter_state
+
+
+def grid_points(grid):
+    """
+    Makes all combinations of the parameter values.
+    :param grid: dict. List of values for every parameter, by parameter name.
+    :return: list. One dict of parameter values for every point.
+    """
+    names = sorted(grid)
+    values = itertools.product(*(grid[name] for name in names))
+    return [dict(zip(names, point)) for point in values]
+
+
+def sample_points(ranges, samples, seed):
+    """
+    Draws random parameter values, uniformly between a lowest and highest value.
+    :param ranges: dict. (lowest, highest) value for every parameter, by parameter name.
+    :param samples: int. Number of points to draw.
+    :param seed: int. Seed for the random draws.
+    :return: list. One dict of parameter values for every point.
+    """
+    generator = np.random.default_rng(seed)
+    names = sorted(ranges)
+    values = {name: generator.uniform(*ranges[name], samples).tolist() for name in names}
+    return [{name: values[name][number] for name in names} for number in range(samples)]
+
+
+def set_point(sim, point):
+    """
+    Sets the parameters of one point on a simulation.
+    :param sim: class object. The BioSim to change.
+    :param point: dict. Parameter values, by parameter name.
+    :return: None
+    """
+    for name, value in point.items():
+        (target, param) = name.split('.')
+        if target in ('Herbivore', 'Carnivore'):
+            sim.set_animal_parameters(target, {param: value})
+        else:
+            sim.set_landscape_parameters(target, {param: value})
+
+
+def summary(history, years):
+    """
+    Summary metrics of the population history of one species, for many seeds.
+    :param history: array. One row per seed, one column per year.
+    :param years: int. Number of years simulated.
+    :return: dict. 'final' is the mean count in the last year, 'mean' the mean count over the
+    last half of the years and 'extinct' the part of the seeds where the species died out.
+    """
+    return {'final': float(history[:, -1].mean()),
+            'mean': float(history[:, years // 2 + 1:].mean()) if years else
+            float(history.mean()),
+            'extinct': float((history[:, -1] == 0).mean())}
+
+
+def run_point(task):
+    """
+    Simulates one point for all the seeds, in a worker process.
+    :param task: tuple. (key, point, island_map, ini_pop, years, seeds, engine)
+    :return: tuple. The key and the result of the point.
+    """
+    (key, point, island_map, ini_pop, years, seeds, engine) = task
+    history = {'Herbivore': [], 'Carnivore': []}
+    for seed in seeds:
+        with BioSim(island_map=island_map, ini_pop=ini_pop, seed=seed, vis_years=0,
+                    engine=engine) as sim:
+            set_point(sim, point)
+            sim.simulate(years)
+        history['Herbivore'].append(sim.island.herbivore_pop_history)
+        history['Carnivore'].append(sim.island.carnivore_pop_history)
+    result = {'params': point}
+    for species in history:
+        result[species] = summary(np.array(history[species]), years)
+    return key, result
+
+
+def point_key(point, island_map, ini_pop, years, seeds, engine, base_parameters):
+    """
+    Makes a name for a point, which changes if anything that affects the result changes.
+    :param point: dict. Parameter values, by parameter name.
+    :param island_map: str. Multi-line string specifying island geography.
+    :param ini_pop: list. Dictionaries specifying initial population.
+    :param years: int. Number of years to simulate.
+    :param seeds: list. Seeds to simulate for the point.
+    :param engine: str. Engine used by the simulations.
+    :param base_parameters: dict. Default parameters, from parameter_state.
+    :return: str. Hash of the point and the scenario.
+    """
+    text = json.dumps([point, island_map, ini_pop, years, list(seeds), engine, base_parameters],
+                      sort_keys=True, default=str)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+
+def run_sweep(island_map, ini_pop, years, grid=None, ranges=None, samples=10, sample_seed=0,
+              seeds=(1,), engine='object', processes=None, cache_dir=None):
+    """
+    Simulates the scenario for every point of a parameter grid or of a random sample.
+    :param island_map: str. Multi-line string specifying island geography.
+    :param ini_pop: list. Dictionaries specifying initial population.
+    :param years: int. Number of years to simulate.
+    :param grid: dict. List of values for every parameter, every combination is simulated.
+    :param ranges: dict. (lowest, highest) for every parameter, used if grid is None.
+    :param samples: int. Number of random points drawn from ranges.
+    :param sample_seed: int. Seed for drawing the random points.
+    :param seeds: list. Seeds to simulate for every point.
+    :param engine: str. Engine used by the simulations, not 'parallel'.
+    :param processes: int. Number of worker processes, the number of CPUs if None.
+    :param cache_dir: str. Folder where finished points are saved, nothing is saved if None.
+    :return: list. One dict for every point, in the same order as the points, with 'params'
+    and the summary of 'Herbivore' and 'Carnivore'.
+    """
+    if engine == 'parallel':
+        raise ValueError("The 'parallel' engine can't be used in a sweep!")
+    if grid is not None:
+        points = grid_points(grid)
+    elif ranges is not None:
+        points = sample_points(ranges, samples, sample_seed)
+    else:
+        raise ValueError("A sweep needs a grid or ranges of parameters!")
+
+    base_parameters = parameter_state(species_classes, landscape_classes)
+    keys = [point_key(point, island_map, ini_pop, years, seeds, engine, base_parameters)
+            for point in points]
+    results = {}
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        for key in keys:
+            path = os.path.join(cache_dir, key + '.json')
+            if os.path.isfile(path):
+                with open(path) as f:
+                    results[key] = json.load(f)
+
+    tasks = [(key, point, island_map, ini_pop, years, list(seeds), engine)
+             for key, point in zip(keys, points) if key not in results]
+    if tasks:
+        with multiprocessing.Pool(processes) as pool:
+            for key, result in pool.imap_unordered(run_point, tasks):
+                results[key] = result
+                if cache_dir:
+                    path = os.path.join(cache_dir, key + '.json')
+                    with open(path + '.tmp', 'w') as f:
+                        json.dump(result, f)
+                    os.replace(path + '.tmp', path)
+    return [results[key] for key in keys]
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+__author__ = 'Jon Augensen & Lars Øvergård, NMBU'
+__email__ = 'jon.augensen@nmbu.no / lars.overgard@hotmail.com'
+
+"""
+This file contains the video writer, which makes a movie while the simulation runs.
+ffmpeg is started once, and every frame is sent to it as raw RGBA pixels from the figure
+canvas, through a pipe. Soo no image files are written, and the movie is done when the
+simulation is done.
+All frames in a movie have the same size. If the window is resized while simulating, the frames
+are cut or padded with white to the size of the first frame.
+"""
+
+import atexit
+import subprocess
+import numpy as np
+
+
+class VideoWriter:
+    """
+    Sends frames to an ffmpeg process, which encodes them to a movie file.
+    """
+    def __init__(self, path, width, height, fps=10, codec='mpeg4', ffmpeg='ffmpeg'):
+        """
+        This docstring belongs to VideoWriter __init__ it starts ffmpeg. An existing file is
+        written over.
+        :param path: str. Path of the movie file, the type is given by the ending, like '.mp4'.
+        :param width: int. Width of the frames in pixels.
+        :param height: int. Height of the frames in pixels.
+        :param fps: int. Frames per second in the movie.
+        :param codec: str. The ffmpeg video codec.
+        :param ffmpeg: str. The ffmpeg program.
+        """
+        self.path = path
+        self.size = (int(height), int(width))
+        self.frames = 0
+        # The size is padded to even numbers, since most codecs need it
+        command = [ffmpeg, '-y', '-loglevel', 'error',
+                   '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', str(width) + 'x' + str(height),
+                   '-r', str(fps), '-i', '-',
+                   '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-vcodec', codec,
+                   '-pix_fmt', 'yuv420p', path]
+        try:
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+        except FileNotFoundError:
+            raise ValueError("'" + ffmpeg + "' was not found, it's needed to write movies!")
+        atexit.register(self.close)
+
+    def write(self, frame):
+        """
+        Sends one frame to ffmpeg. A frame with another size than the movie is cut or padded
+        with white at the right and bottom.
+        :param frame: array. RGBA pixels with shape (height, width, 4), like
+        canvas.buffer_rgba().
+        :return: None
+        """
+        frame = np.asarray(frame, dtype=np.uint8)[:self.size[0], :self.size[1]]
+        if frame.shape[:2] != self.size:
+            padded = np.full(self.size + (4,), 255, dtype=np.uint8)
+            padded[:frame.shape[0], :frame.shape[1]] = frame
+            frame = padded
+        self.process.stdin.write(np.ascontiguousarray(frame).tobytes())
+        self.frames += 1
+
+    def close(self):
+        """
+        Tells ffmpeg there are no more frames, and waits until the movie is written.
+        :return: None
+        """
+        atexit.unregister(self.close)
+        if self.process.stdin.closed:
+            return
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError("ffmpeg could not write the movie '" + self.path + "'!")
@@ -5,7 +5,8 @@
     and numbers.
 """
 
-from biosim.animals import Animal
+from biosim.animals import Animal, HERBIVORE, CARNIVORE
+from biosim import animals
 import pytest
 
 
@@ -84,3 +85,33 @@ def test_herbivore_fitness_update():
     animal_herbivore.weight = new_weight
 
     assert animal_herbivore.fitness_update() != old_fitness
+
+
+def test_fitness_kept_until_changed(mocker):
+    """Testing that the fitness is not calculated again when age and weight are the same"""
+    animal_herbivore = Animal({'species': 'Herbivore', 'age': 10, 'weight': 50})
+    spy = mocker.spy(animals, 'calculate_fitness')
+    animal_herbivore.fitness_update()
+    assert spy.call_count == 0
+    animal_herbivore.weight = 40
+    animal_herbivore.fitness_update()
+    assert spy.call_count == 1
+
+
+def test_fitness_outdated_after_aging():
+    """Testing that the fitness is calculated again after the animal gets older"""
+    animal_herbivore = Animal({'species': 'Herbivore', 'age': 40, 'weight': 50})
+    old_fitness = animal_herbivore.fitness
+    animal_herbivore.ages_weight()
+    assert animal_herbivore.fitness_update() < old_fitness
+
+
+def test_species_shared():
+    """Testing that animals of the same species share the species parameters and have no dict"""
+    herbivore_1 = Animal({'species': 'Herbivore', 'age': 10, 'weight': 50})
+    herbivore_2 = Animal({'species': 'Herbivore', 'age': 5, 'weight': 20})
+    carnivore = Animal({'species': 'Carnivore', 'age': 5, 'weight': 20})
+    assert herbivore_1.species_id is herbivore_2.species_id
+    assert herbivore_1.code == HERBIVORE and carnivore.code == CARNIVORE
+    assert carnivore.species == 'Carnivore'
+    assert not hasattr(herbivore_1, '__dict__')
@@ -165,3 +165,48 @@ def test_biome_adding_migrator():
     cell.add_animal(animal_params)
     cell_2.add_migrator(cell.herbivore_list[0])
     assert cell_2.herbivore_list
+
+
+def test_biome_update_lists_keeps_order():
+    """Testing that removing dead animals keeps the order of the animals still alive"""
+    cell = Biomes(1, 1, "L")
+    for age in range(1, 6):
+        cell.add_animal({'species': 'Herbivore', 'age': age, 'weight': 50})
+    cell.dead_animal_list.extend([cell.herbivore_list[1], cell.herbivore_list[3]])
+    cell.update_lists(cell.herbivore_list)
+    assert [herb.age for herb in cell.herbivore_list] == [1, 3, 5]
+
+
+def test_biome_eaten_herbivore_removed():
+    """Testing that a Herbivore eaten by a Carnivore is removed after the lists are updated"""
+    cell = Biomes(1, 1, "L")
+    cell.add_animal({'species': 'Herbivore', 'age': 100, 'weight': 1})
+    cell.add_animal({'species': 'Carnivore', 'age': 5, 'weight': 50})
+    cell.carnivore_list[0].fitness = 20
+    cell.carnivore_list[0].feeding_type(cell)
+    assert not cell.herbivore_list[0].alive
+    cell.update_lists(cell.herbivore_list)
+    assert cell.herbivore_list == []
+
+
+def test_biome_prey_index_sorted():
+    """Testing that the prey index is sorted after fitness and only made once"""
+    cell = Biomes(1, 1, "L")
+    for weight in [30, 5, 15]:
+        cell.add_animal({'species': 'Herbivore', 'age': 10, 'weight': weight})
+    prey = cell.prey()
+    assert [herb.weight for herb in prey] == [5, 15, 30]
+    assert cell.prey() is prey
+
+
+def test_biome_prey_index_skips_eaten():
+    """Testing that a second Carnivore does not eat a Herbivore already eaten"""
+    cell = Biomes(1, 1, "L")
+    cell.add_animal({'species': 'Herbivore', 'age': 100, 'weight': 1})
+    for _ in range(2):
+        cell.add_animal({'species': 'Carnivore', 'age': 5, 'weight': 50})
+    for carnivore in cell.carnivore_list:
+        carnivore.fitness = 20
+        carnivore.feeding_type(cell)
+    assert len(cell.dead_animal_list) == 1
+    assert cell.carnivore_list[1].weight == 50
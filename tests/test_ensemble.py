@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+"""
+    This file contains simple test for checking, if ensemble.py gives the same results as
+    simulating every seed with BioSim.
+"""
+
+from biosim.simulation import BioSim
+from biosim.animals import Herbivores
+import pytest
+
+map_layout = "WWWW\nWLLW\nWLLW\nWWWW"
+ini_pop = [{'loc': (2, 2), 'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                                   for _ in range(20)]}]
+
+
+def test_ensemble_same_as_biosim():
+    """Testing that every member of the ensemble has the same history as one BioSim"""
+    results = BioSim.ensemble(map_layout, ini_pop, seeds=[1, 2, 3], years=10, processes=2)
+    assert results['Herbivore']['counts'].shape == (3, 11)
+    sim = BioSim(island_map=map_layout, ini_pop=ini_pop, seed=2, vis_years=0)
+    sim.simulate(10)
+    assert list(results['Herbivore']['counts'][1]) == sim.island.herbivore_pop_history
+    assert results['Herbivore']['mean'][0] == 20
+    assert results['Herbivore']['quantiles'].shape == (3, 11)
+
+
+def test_ensemble_parameters():
+    """Testing that parameters are only changed in the workers"""
+    results = BioSim.ensemble(map_layout, ini_pop, seeds=[1, 2], years=5, processes=1,
+                              animal_params={'Herbivore': {'omega': 0}})
+    assert (results['Herbivore']['counts'][:, -1] >= 20).all()
+    assert Herbivores.omega == 0.4
+
+
+def test_ensemble_no_seeds():
+    """Testing that an ensemble without seeds raises an error"""
+    with pytest.raises(ValueError):
+        BioSim.ensemble(map_layout, ini_pop, seeds=[], years=5)
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+"""
+    This file contains simple test for checking, if flat_island.py delivers right types of
+    variables and simulates the whole island correctly.
+"""
+
+from biosim.flat_island import FlatIsland
+from biosim.island import Island
+from biosim.animals import Herbivores
+import numpy as np
+import textwrap
+import pytest
+
+
+@pytest.fixture
+def flat_island():
+    """Return a small island with Herbivores and Carnivores in one cell"""
+    map_layout = textwrap.dedent("""\
+                                 WWWWW
+                                 WLLHW
+                                 WDLMW
+                                 WWWWW""")
+    herbivores = [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)]
+    carnivores = [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(10)]
+    island = FlatIsland(map_layout)
+    island.make_island()
+    island.add_pop([{'loc': (2, 2), 'pop': herbivores + carnivores}])
+    return island
+
+
+def test_flat_island_add_pop(flat_island):
+    """Testing that animals are added to the correct cell"""
+    assert flat_island.herbivore_pop_history[-1] == 50
+    assert flat_island.carnivore_pop_history[-1] == 10
+    assert set(flat_island.herbivores.cell) == {1 * flat_island.x + 1}
+
+
+def test_flat_island_illegal_landscape():
+    """Testing that a map with a landtype that is not in the simulator will raise a ValueError"""
+    with pytest.raises(ValueError):
+        FlatIsland("WWW\nWRW\nWWW").make_island()
+
+
+def test_flat_island_illegal_spawn():
+    """Testing that adding animals in water will raise a ValueError"""
+    island = FlatIsland("WWW\nWLW\nWWW")
+    island.make_island()
+    with pytest.raises(ValueError):
+        island.add_pop([{'loc': (1, 2),
+                         'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}]}])
+
+
+def test_flat_island_feeding():
+    """Testing that Herbivores eat until the fodder in their cell is gone"""
+    island = FlatIsland("WWWW\nWMMW\nWWWW")
+    island.make_island()
+    island.add_pop([{'loc': (2, 2),
+                     'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                             for _ in range(8)]},
+                    {'loc': (2, 3),
+                     'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}]}])
+    island.fodder = island.landscape_values('f_max').astype(float)
+    island.feeding()
+    assert list(island.fodder[[5, 6]]) == [0, 50 - Herbivores.F]
+    assert sorted(island.herbivores.weight) == pytest.approx(
+        [20] * 3 + [20 + Herbivores.beta * Herbivores.F] * 6)
+
+
+def test_flat_island_migration_stays_on_land(flat_island):
+    """Testing that no animals migrates into water"""
+    for _ in range(10):
+        flat_island.simulate_island()
+    availability = flat_island.landscape_values('availability')
+    assert availability[flat_island.herbivores.cell].all()
+    assert availability[flat_island.carnivores.cell].all()
+
+
+def test_flat_island_do_all_stats(flat_island):
+    """Checking that do all stats will return the same type of list as Island"""
+    data_list = flat_island.do_all_stats()
+    assert len(data_list) == 11
+    assert data_list[3].sum() == 50
+    assert data_list[9][1][1] == 50
+
+
+def test_flat_island_same_as_island_in_one_cell():
+    """Testing that the flat engine gives the same Herbivore population as the vectorized
+    engine, when there is only one cell"""
+    map_layout = "WWW\nWLW\nWWW"
+    ini_pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)]}]
+    history = {}
+    for island_class in [FlatIsland, Island]:
+        if island_class is Island:
+            island = Island(map_layout, 'vectorized', seed=5)
+        else:
+            island = FlatIsland(map_layout, seed=5)
+        island.make_island()
+        island.add_pop(ini_pop)
+        for _ in range(20):
+            island.simulate_island()
+        history[island_class] = island.herbivore_pop_history
+    assert history[FlatIsland] == history[Island]
+
+
+def test_flat_island_add_columns(flat_island):
+    """Testing that animals given as columns are added to the right cell"""
+    flat_island.add_pop([{'loc': (2, 3), 'species': 'Carnivore', 'age': [1, 2],
+                          'weight': [10.0, 12.0]}])
+    assert flat_island.carnivore_pop_history[-1] == 12
+    assert flat_island.cell_counts(flat_island.carnivores)[1][2] == 2
+
+
+def engine_means(ini_pop, years, seeds):
+    """Simulates the same island with the flat and the vectorized engine for some seeds, and
+    gives the mean populations of the last half of the years for every seed"""
+    map_layout = "WWWWWWW\nWLLLLLW\nWLLLLLW\nWLLLLLW\nWLLLLLW\nWLLLLLW\nWWWWWWW"
+    means = {'flat': [], 'vectorized': []}
+    for seed in seeds:
+        for island in [FlatIsland(map_layout, seed=seed),
+                       Island(map_layout, 'vectorized', seed=seed)]:
+            island.make_island()
+            island.add_pop(ini_pop)
+            for _ in range(years):
+                island.simulate_island()
+            means[island.engine].append((np.mean(island.herbivore_pop_history[years // 2:]),
+                                         np.mean(island.carnivore_pop_history[years // 2:])))
+    flat = np.array(means['flat'])
+    vectorized = np.array(means['vectorized'])
+    spread = np.sqrt((flat.var(axis=0, ddof=1) + vectorized.var(axis=0, ddof=1)) / 2)
+    return flat.mean(axis=0), vectorized.mean(axis=0), spread
+
+
+def test_flat_island_close_to_island_in_many_cells():
+    """Testing that the flat engine gives the same Herbivore population as the vectorized
+    engine on a map with migration, within 3 times the spread between the seeds"""
+    ini_pop = [{'loc': (4, 4),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(100)]}]
+    flat_mean, island_mean, spread = engine_means(ini_pop, 40, range(1, 6))
+    assert abs(flat_mean[0] - island_mean[0]) <= 3 * spread[0]
+
+
+def test_flat_island_fewer_carnivores_in_many_cells():
+    """Testing that the flat engine has fewer Carnivores than the vectorized engine on a map with
+    migration, more than the spread between the seeds, since it is not the same model. See the
+    top of flat_island.py"""
+    herbivores = [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(100)]
+    carnivores = [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(20)]
+    ini_pop = [{'loc': (4, 4), 'pop': herbivores + carnivores}]
+    flat_mean, island_mean, spread = engine_means(ini_pop, 60, range(1, 6))
+    assert island_mean[1] - flat_mean[1] > spread[1]
+    assert flat_mean[1] == pytest.approx(island_mean[1], rel=0.25)
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+"""
+    This file contains simple test for checking, if graphics.py reuses it's artists.
+"""
+
+import matplotlib
+# The backend must be chosen before pyplot is imported, soo the imports below come after it
+matplotlib.use('Agg')
+from biosim.graphics import Plot, PlotProcess  # noqa: E402
+from biosim.island import Island  # noqa: E402
+import matplotlib.pyplot as plt  # noqa: E402
+import os  # noqa: E402
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def plot():
+    """Plot of a small island"""
+    plot = Plot("WWWW\nWLHW\nWWWW", 1, 1, 'png', None, None, None, None, None)
+    yield plot
+    plt.close(plot.fig)
+
+
+def test_plot_artists_are_reused(plot):
+    """Testing that updates don't add new artists to the figure"""
+    island = Island("WWWW\nWLHW\nWWWW")
+    island.make_island()
+    island.add_pop([{'loc': (2, 2), 'species': 'Herbivore', 'age': [5] * 40,
+                     'weight': [20] * 40}])
+    plot.update_plot(island.do_all_stats(), force=True)
+    artists = [len(ax.get_children()) for ax in plot.fig.axes]
+    for _ in range(5):
+        island.simulate_island()
+        plot.update_plot(island.do_all_stats(), force=True)
+    assert [len(ax.get_children()) for ax in plot.fig.axes] == artists
+    assert plot.counter_size == 6
+    assert plot.line_herbi.get_xdata().tolist() == [0, 1, 2, 3, 4, 5]
+    heights = [patch.get_height() for patch in plot.hist_bars['age'][0].patches]
+    assert sum(heights) == island.herbivore_pop_history[-1]
+    assert plot.ax_animal_counter.get_ylim()[1] >= 40
+
+
+def test_plot_drops_frames(plot):
+    """Testing that updates coming faster than the frame rate are dropped, but still counted"""
+    island = Island("WWWW\nWLHW\nWWWW")
+    island.make_island()
+    island.add_pop([{'loc': (2, 2), 'species': 'Herbivore', 'age': [5] * 10,
+                     'weight': [20] * 10}])
+    plot.interactive = True
+    plot.frame_rate = 0.001
+    plot.update_plot(island.do_all_stats())
+    island.simulate_island()
+    plot.update_plot(island.do_all_stats())
+    assert plot.frames_dropped == 1
+    assert plot.counter_size == 2
+    plot.update_plot(island.do_all_stats(), force=True)
+    assert plot.frames_dropped == 1
+
+
+def test_plot_process_saves_images(tmp_path, monkeypatch):
+    """Testing that the render process draws and saves every snapshot in the queue"""
+    os.mkdir(tmp_path / 'run')
+    monkeypatch.chdir(tmp_path / 'run')
+    island = Island("WWWW\nWLHW\nWWWW")
+    island.make_island()
+    island.add_pop([{'loc': (2, 2), 'species': 'Herbivore', 'age': [5] * 10,
+                     'weight': [20] * 10}])
+    plot = PlotProcess("WWWW\nWLHW\nWWWW", 1, 1, 'png', 'img', 'sim', None, None, None,
+                       queue_size=2)
+    for _ in range(4):
+        island.simulate_island()
+        plot.update_plot(island.do_all_stats())
+    plot.wait()
+    assert len(os.listdir(tmp_path / 'run' / 'img')) == 4
+    plot.close()
+    assert not plot.process.is_alive()
+
+
+def test_plot_process_raises_plot_errors():
+    """Testing that an error when making the Plot is raised in the main process"""
+    with pytest.raises(ValueError):
+        PlotProcess("WWWW\nWLHW\nWWWW", 2, 3, 'png', None, None, None, None, None)
+
+
+def test_distribution_levels():
+    """Testing that every cell gets the level of the range it's in, without changing the map"""
+    counts = [[0, 4, 5, 19], [20, 100, 149, 150], [199, 200, 1000, 60]]
+    levels = Plot.adjust_distribution(counts, [5, 20, 60, 100, 150, 200])
+    assert levels.tolist() == [[0, 0, 1, 1], [2, 4, 4, 5], [5, 5, 5, 3]]
+    assert counts[0] == [0, 4, 5, 19]
+
+
+def test_distribution_cmax():
+    """Testing that cmax_animals scales the color levels of the distribution maps"""
+    plot = Plot("WWWW\nWLHW\nWWWW", 1, 1, 'png', None, None, None, None,
+                {'Herbivore': 20, 'Carnivore': 100})
+    assert plot.herbivore_range.tolist() == [0.5, 2, 6, 10, 15, 20]
+    assert plot.carnivore_range.tolist() == [4, 20, 40, 60, 80, 100]
+    herbivores = [[0, 0, 0, 0], [0, 15, 3, 0], [0, 0, 0, 0]]
+    plot.update_distribution(herbivores, herbivores)
+    colors = plot.img_herbi.get_array()
+    assert tuple(colors[1, 1]) == (0.0, 0.2, 0.0)
+    assert tuple(colors[1, 2]) == (0.0, 0.8, 0.0)
+    assert tuple(plot.img_carni.get_array()[1, 1]) == (1.0, 0.0, 0.0)
+    plt.close(plot.fig)
+
+
+def test_plot_process_raises_update_errors(tmp_path, monkeypatch):
+    """Testing that an error in the render process after it has started is raised in the main
+    process, instead of the simulation waiting for ever"""
+    os.mkdir(tmp_path / 'run')
+    monkeypatch.chdir(tmp_path / 'run')
+    island = Island("WWWW\nWLHW\nWWWW")
+    island.make_island()
+    plot = PlotProcess("WWWW\nWLHW\nWWWW", 1, 1, 'bogus', 'img', 'sim', None, None, None,
+                       queue_size=1)
+    with pytest.raises(ValueError):
+        for _ in range(20):
+            island.simulate_island()
+            plot.update_plot(island.do_all_stats())
+        plot.wait()
+    assert not plot.process.is_alive()
+    with pytest.raises(RuntimeError):
+        plot.update_plot(island.do_all_stats())
+    plot.close()
+
+
+def test_draw_frame_draws_own_figure(plot, monkeypatch):
+    """Testing that the plot draws it's own figure, even if another figure is the active one"""
+    drawn = []
+    monkeypatch.setattr(plot.fig.canvas, 'draw_idle', lambda: drawn.append(plot.fig))
+    other = plt.figure()
+    plot.draw_frame(True)
+    assert drawn == [plot.fig]
+    plt.close(other)
@@ -5,7 +5,9 @@
 """
 
 from biosim.island import Island
+from biosim.animals import Herbivores
 import textwrap
+import numpy as np
 import pytest
 
 
@@ -225,3 +227,99 @@ def test_island_do_all_stats():
     data_list = island.do_all_stats()
     assert type(data_list) == list
     assert len(data_list) == expected_list_len
+
+
+def test_island_active_cells():
+    """Testing that only cells with animals are active, and that migrants make cells active"""
+    map_layout = """\
+           WWWWW
+           WLLLW
+           WWWWW"""
+    map_layout = textwrap.dedent(map_layout)
+    island = Island(map_layout)
+    island.make_island()
+    island.add_pop([{'loc': (2, 3), 'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 50}
+                                            for _ in range(50)]}])
+    assert island.active_cells == {(1, 2)}
+    for _ in range(5):
+        island.simulate_island()
+    occupied = {(m, n) for m in range(3) for n in range(5) if island.cell[m][n].has_animals()}
+    assert island.active_cells == occupied
+    assert len(occupied) > 1
+    assert island.herbivore_pop_history[-1] == sum(len(island.cell[m][n].herbivore_list)
+                                                   for (m, n) in occupied)
+
+
+@pytest.mark.parametrize('engine', ['object', 'array', 'vectorized'])
+def test_island_add_columns(engine):
+    """Testing that animals given as columns are added like animals given in a list"""
+    map_layout = """\
+           WWW
+           WLW
+           WWW"""
+    map_layout = textwrap.dedent(map_layout)
+    island = Island(map_layout, engine)
+    island.make_island()
+    island.add_pop([{'loc': (2, 2), 'species': 'Herbivore', 'age': np.array([0, 5, 10]),
+                     'weight': np.array([8.0, 20.0, 30.0])},
+                    {'loc': (2, 2), 'species': 'Carnivore', 'age': [3], 'weight': [15.0]}])
+    cell = island.cell[1][1]
+    assert island.herbivore_pop_history[-1] == 3
+    assert island.carnivore_pop_history[-1] == 1
+    if engine == 'object':
+        stages = [ani.stage for ani in cell.herbivore_list]
+    else:
+        stages = cell.herbivore_list.stage.tolist()
+    assert stages == [2, 0, 0]
+    with pytest.raises(ValueError):
+        island.add_pop([{'loc': (2, 2), 'species': 'Herbivore', 'age': [1, 2],
+                         'weight': [10.0, -1.0]}])
+    with pytest.raises(ValueError):
+        island.add_pop([{'loc': (2, 2), 'species': 'Herbivore', 'age': [1, 2.5],
+                         'weight': [10.0, 12.0]}])
+    with pytest.raises(ValueError):
+        island.add_pop([{'loc': (2, 2), 'species': 'Herbivore', 'age': [1, 2],
+                         'weight': [10.0, np.nan]}])
+    with pytest.raises(ValueError):
+        island.add_pop([{'loc': (1, 1), 'species': 'Herbivore', 'age': [1], 'weight': [10.0]}])
+    assert island.herbivore_pop_history[-1] == 3
+
+
+def test_island_own_parameters():
+    """Testing that two islands have their own parameters and their own map"""
+    map_layout = "WWW\nWLW\nWWW"
+    island_1 = Island(map_layout)
+    island_2 = Island(map_layout)
+    island_1.make_island()
+    island_2.make_island()
+    island_1.species['Herbivore'].F = 20
+    island_1.landscapes['L'].f_max = 100
+    assert island_2.species['Herbivore'].F == 10
+    assert Herbivores.F == 10
+    island_1.cell[1][1].refresh_land()
+    island_2.cell[1][1].refresh_land()
+    assert island_1.cell[1][1].fodder == 100
+    assert island_2.cell[1][1].fodder == 800
+    assert island_1.cell[1][1].island_map is island_1.cell
+    assert island_2.cell[1][1].island_map is island_2.cell
+
+
+@pytest.mark.parametrize('engine', ['object', 'vectorized'])
+def test_island_own_random_stream(engine):
+    """Testing that two islands with the same seed give the same history, also when they are
+    simulated one year at a time after each other"""
+    map_layout = "WWWW\nWLLW\nWWWW"
+    ini_pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(20)]}]
+    islands = [Island(map_layout, engine, seed=3) for _ in range(3)]
+    for island in islands:
+        island.make_island()
+        island.add_pop(ini_pop)
+    for _ in range(10):
+        islands[0].simulate_island()
+        islands[1].simulate_island()
+    for _ in range(10):
+        islands[2].simulate_island()
+    assert islands[0].random is not islands[1].random
+    assert islands[0].herbivore_pop_history == islands[1].herbivore_pop_history
+    assert islands[0].herbivore_pop_history == islands[2].herbivore_pop_history
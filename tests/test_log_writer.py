@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+"""
+    This file contains simple test for checking, if log_writer.py writes logs that can be read.
+"""
+
+from biosim.log_writer import LogWriter, read_log, column_names
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize('log_format', ['csv', 'binary'])
+def test_log_writer_read_back(tmp_path, log_format):
+    """Testing that the rows are only written every flush_years, and that read_log gives the
+    same columns back"""
+    path = str(tmp_path / 'log')
+    writer = LogWriter(path, log_format, flush_years=3, shape=(2, 2))
+    for year in range(1, 8):
+        writer.write(year, 10 * year, year, np.full((2, 2), year), np.eye(2, dtype=int))
+        if year == 4:
+            assert len(read_log(path)['Year']) == 3
+    writer.close()
+    log = read_log(path)
+    assert list(log) == column_names((2, 2))
+    assert log['Year'].tolist() == list(range(1, 8))
+    assert log['Herbivore'].tolist() == [10 * year for year in range(1, 8)]
+    assert log['Herbivore_2_1'].tolist() == list(range(1, 8))
+    assert log['Carnivore_1_1'].tolist() == [1] * 7
+    assert log['Carnivore_1_2'].tolist() == [0] * 7
+
+
+def test_log_writer_wrong_format(tmp_path):
+    """Testing that only csv and binary logs can be made"""
+    with pytest.raises(ValueError):
+        LogWriter(str(tmp_path / 'log'), 'txt')
+    with pytest.raises(ValueError):
+        LogWriter(str(tmp_path / 'log'), 'csv', flush_years=0)
@@ -5,7 +5,12 @@
     "test_qua" also checks for correct calculation.
 """
 
-from biosim.math_funcs import qua, gaussian_weight, random_number
+import pytest
+import numpy as np
+from biosim.math_funcs import qua, gaussian_weight, random_number, qua_array, random_numbers, \
+    age_table, clear_tables, calculate_fitness, calculate_fitness_array, \
+    weight_table_error, RandomStream
+from biosim.animals import Herbivores, make_species
 
 
 def test_qua():
@@ -22,3 +27,74 @@ def test_gaussian_weight():
 def test_random_number():
     """Test the random_number function and if it returns correct type"""
     assert type(random_number()) == float
+
+
+def test_qua_array():
+    """Test that qua_array gives the same numbers as qua"""
+    ages = [0, 10, 40, 80]
+    assert list(qua_array(ages, 40, 0.6)) == pytest.approx([qua(age, 40, 0.6) for age in ages])
+
+
+def test_random_numbers():
+    """Test the random_numbers function and if it returns the correct amount of numbers"""
+    numbers = random_numbers(10)
+    assert len(numbers) == 10
+    assert all(0 <= number < 1 for number in numbers)
+
+
+def test_age_table():
+    """Test that the age table gives the same numbers as qua"""
+    table = age_table(40, 0.6)[0]
+    assert table[10] == qua(10, 40, 0.6)
+    assert table[200] == qua(200, 40, 0.6)
+
+
+def test_clear_tables():
+    """Test that the age table is made again after the tables are cleared"""
+    table = age_table(40, 0.6)
+    assert age_table(40, 0.6) is table
+    clear_tables()
+    assert age_table(40, 0.6) is not table
+
+
+def test_calculate_fitness():
+    """Test that the fitness is the same with and without the table, also for old animals"""
+    for age in [0, 10, 300]:
+        expected = qua(age, Herbivores.a_half, Herbivores.phi_age) * \
+            qua(20, Herbivores.w_half, -Herbivores.phi_weight)
+        assert calculate_fitness(age, 20, Herbivores) == expected
+    assert calculate_fitness(10, 0, Herbivores) == 0
+    ages = np.array([0, 10, 300])
+    weights = np.array([20.0, 0.0, 35.5])
+    expected = [calculate_fitness(age, weight, Herbivores)
+                for age, weight in zip([0, 10, 300], [20.0, 0.0, 35.5])]
+    assert list(calculate_fitness_array(ages, weights, Herbivores)) == pytest.approx(expected)
+
+
+def test_weight_table():
+    """Test that the interpolated weight term is inside the error bound, and that the table is
+    only used by the species it's turned on for"""
+    weights = np.linspace(0.1, 300, 1000)
+    exact = calculate_fitness_array(np.full(1000, 5), weights, Herbivores)
+    species = make_species()
+    species['Herbivore'].weight_table_step = 0.5
+    interpolated = calculate_fitness_array(np.full(1000, 5), weights, species['Herbivore'])
+    scalar = [calculate_fitness(5, weight, species['Herbivore']) for weight in weights.tolist()]
+    assert calculate_fitness_array(np.full(1000, 5), weights, Herbivores).tolist() == \
+        exact.tolist()
+    bound = weight_table_error(Herbivores.phi_weight, 0.5)
+    assert np.abs(interpolated - exact).max() <= bound
+    assert np.abs(np.array(scalar) - exact).max() <= bound
+
+
+def test_random_stream():
+    """Test that two streams with the same seed give the same numbers, also after the buffered
+    block is used up, and that the scalar numbers come from the NumPy generator"""
+    stream_1 = RandomStream(7)
+    stream_2 = RandomStream(7)
+    numbers = [stream_1.random_number() for _ in range(RandomStream.block_size + 10)]
+    assert numbers == [stream_2.random_number() for _ in range(RandomStream.block_size + 10)]
+    block = np.random.default_rng(7).random(RandomStream.block_size).tolist()
+    assert numbers[:5] == block[::-1][:5]
+    stream_1.seed(7)
+    assert stream_1.random_number() == numbers[0]
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+"""
+    This file contains simple test for checking, if parallel.py splits the island correctly and
+    moves migrants between the workers.
+"""
+
+from biosim.parallel import ParallelIsland, parameter_state, set_parameter_state
+from biosim.animals import Herbivores, make_species
+from biosim.biome import make_landscapes
+import textwrap
+import pytest
+
+
+@pytest.fixture
+def parallel_island():
+    """Return an island with two workers, and Herbivores in the first strip"""
+    map_layout = textwrap.dedent("""\
+                                 WWWW
+                                 WLLW
+                                 WLLW
+                                 WLLW
+                                 WLLW
+                                 WWWW""")
+    island = ParallelIsland(map_layout, seed=3, workers=2)
+    island.make_island()
+    island.add_pop([{'loc': (3, 2),
+                     'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                             for _ in range(50)]}])
+    yield island
+    island.close()
+
+
+def test_parallel_island_strips(parallel_island):
+    """Testing that the rows are split in strips with the same number of land cells"""
+    assert parallel_island.strips == [(0, 3), (3, 6)]
+
+
+def test_parallel_island_migrants(parallel_island):
+    """Testing that animals migrate into the other strip, and are counted there"""
+    for _ in range(5):
+        parallel_island.simulate_island()
+    data_list = parallel_island.do_all_stats()
+    herbivore_map = data_list[9]
+    assert sum(map(sum, herbivore_map)) == parallel_island.herbivore_pop_history[-1]
+    assert sum(herbivore_map[3]) + sum(herbivore_map[4]) > 0
+
+
+def test_parallel_island_errors(parallel_island):
+    """Testing that errors in the workers are raised in the main process"""
+    with pytest.raises(ValueError):
+        parallel_island.add_pop([{'loc': (5, 2), 'pop': [{'species': 'Herbivore', 'age': 5,
+                                                          'weight': -1}]}])
+
+
+def test_parameter_state():
+    """Testing that the parameters can be collected and set on other classes"""
+    (species, landscapes) = (make_species(), make_landscapes())
+    species['Herbivore'].mu = 0.5
+    state = parameter_state(species, landscapes)
+    assert state['Herbivore']['mu'] == 0.5
+    assert state['L']['f_max'] == 800
+    (other_species, other_landscapes) = (make_species(), make_landscapes())
+    set_parameter_state(state, other_species, other_landscapes)
+    assert other_species['Herbivore'].mu == 0.5
+    assert Herbivores.mu == 0.25
+
+
+@pytest.mark.parametrize('engine', ['object', 'array'])
+def test_parallel_island_engines(engine):
+    """Testing that migrants are moved between the workers with every engine of the cells"""
+    herbivores = [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)]
+    carnivores = [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(5)]
+    island = ParallelIsland("WWWW\nWLLW\nWLLW\nWLLW\nWLLW\nWWWW", seed=3, workers=2,
+                            engine=engine)
+    island.make_island()
+    island.add_pop([{'loc': (3, 2), 'pop': herbivores + carnivores}])
+    for _ in range(5):
+        island.simulate_island()
+    herbivore_map = island.do_all_stats()[9]
+    assert sum(map(sum, herbivore_map)) == island.herbivore_pop_history[-1]
+    assert sum(herbivore_map[3]) + sum(herbivore_map[4]) > 0
+    island.close()
+
+
+def test_parallel_island_close_dead_worker(parallel_island):
+    """Testing that close works when a worker has already stopped"""
+    parallel_island.processes[0].terminate()
+    parallel_island.processes[0].join()
+    parallel_island.close()
+    assert parallel_island.processes == []
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""
+    This file contains simple test for checking, if population.py stores the animals correctly
+    and gives the same results as the Animal objects.
+"""
+
+from biosim.population import Population, VectorizedPopulation
+from biosim.animals import Animal, Herbivores, Carnivores
+from biosim.biome import Biomes
+from biosim.island import Island
+import textwrap
+import pytest
+
+
+def test_population_append():
+    """Testing that animals can be added and the population gets correct length"""
+    herd = Population(Herbivores)
+    animal_count = 20
+    for _ in range(animal_count):
+        herd.append(5, 20)
+    assert len(herd) == animal_count
+    assert list(herd.age) == [5] * animal_count
+
+
+def test_population_fitness_same_as_animal():
+    """Testing that the population gives the same fitness as an Animal object"""
+    herd = Population(Carnivores)
+    herd.append(10, 30)
+    animal = Animal({'species': 'Carnivore', 'age': 10, 'weight': 30})
+    assert herd.fitness[0] == animal.fitness
+
+
+def test_population_negative_weight():
+    """Testing that a negative weight will raise a ValueError"""
+    with pytest.raises(ValueError):
+        Population(Herbivores).append(10, -5)
+
+
+def test_population_new_born_stage():
+    """Testing that a new born calf gets the correct stage, in its annual cycle"""
+    herd = Population(Herbivores)
+    herd.append(0, 8)
+    assert herd.stage[0] == 2
+
+
+def test_population_keep():
+    """Testing that keep removes the animals and keeps the order of the rest"""
+    herd = Population(Herbivores)
+    for age in range(5):
+        herd.append(age + 1, 20)
+    herd.keep([True, False, True, False, True])
+    assert list(herd.age) == [1, 3, 5]
+
+
+def test_population_ages_weight():
+    """Testing that animals in stage 3 get older and lose weight"""
+    herd = Population(Herbivores)
+    herd.append(10, 20, stage=3)
+    herd.ages_weight()
+    assert herd.age[0] == 11
+    assert herd.weight[0] == 20 - Herbivores.eta * 20
+
+
+def test_biome_array_engine():
+    """Testing that a cell with the array engine stores animals in populations"""
+    cell = Biomes(1, 1, "L", engine='array')
+    cell.add_animal({'species': 'Herbivore', 'age': 10, 'weight': 50})
+    assert isinstance(cell.herbivore_list, Population)
+    assert len(cell.herbivore_list) == 1
+
+
+def test_biome_illegal_engine():
+    """Testing that an engine that is not in the simulator will raise a ValueError"""
+    with pytest.raises(ValueError):
+        Biomes(1, 1, "L", engine='quantum')
+
+
+def test_array_engine_same_as_object_engine():
+    """Testing that the array engine gives the same population as the object engine,
+    with the same random seed"""
+    map_layout = textwrap.dedent("""\
+                                 WWWWW
+                                 WLLHW
+                                 WLDDW
+                                 WWWWW""")
+    herbivores = [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)]
+    carnivores = [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(10)]
+    ini_pop = [{'loc': (2, 2), 'pop': herbivores + carnivores}]
+    history = {}
+    for engine in ['object', 'array']:
+        island = Island(map_layout, engine, seed=1)
+        island.make_island()
+        island.add_pop(ini_pop)
+        for _ in range(20):
+            island.simulate_island()
+        history[engine] = (island.herbivore_pop_history, island.carnivore_pop_history)
+    assert history['object'] == history['array']
+
+
+def test_vectorized_fitness_same_as_scalar():
+    """Testing that the vectorized fitness is the same as the fitness of one animal at a time"""
+    herd = VectorizedPopulation(Herbivores)
+    for age, weight in [(1, 10), (10, 35), (50, 5), (3, 0)]:
+        herd.append(age, weight)
+    scalar_fitness = herd.fitness.copy()
+    assert herd.fitness_update() == pytest.approx(scalar_fitness)
+
+
+def test_vectorized_herbivore_feeding():
+    """Testing that Herbivores eat the fodder in order, until it's gone"""
+    cell = Biomes(1, 1, "M", engine='vectorized')
+    animal_count = 8
+    for _ in range(animal_count):
+        cell.add_animal({'species': 'Herbivore', 'age': 10, 'weight': 10})
+    cell.herbivore_list.herbivore_feeding(cell)
+    assert cell.fodder == 0
+    assert list(cell.herbivore_list.weight) == pytest.approx(
+        [10 + Herbivores.beta * Herbivores.F] * 5 + [10] * 3)
+
+
+def test_vectorized_engine_same_statistics():
+    """Testing that the vectorized engine gives the same mean population as the object engine,
+    for a Herbivore population in one cell"""
+    map_layout = "WWW\nWLW\nWWW"
+    ini_pop = [{'loc': (2, 2),
+                'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)]}]
+    mean_count = {}
+    for engine in ['object', 'vectorized']:
+        counts = []
+        for seed in range(3):
+            island = Island(map_layout, engine, seed=seed)
+            island.make_island()
+            island.add_pop(ini_pop)
+            for _ in range(40):
+                island.simulate_island()
+            counts.extend(island.herbivore_pop_history[20:])
+        mean_count[engine] = sum(counts) / len(counts)
+    assert mean_count['vectorized'] == pytest.approx(mean_count['object'], rel=0.1)
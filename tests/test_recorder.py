@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+"""
+    This file contains simple test for checking, if recorder.py records the right values.
+"""
+
+from biosim.recorder import Recorder, read_recording
+from biosim.island import Island
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def island():
+    """Island with Herbivores in one cell and Carnivores in another"""
+    island = Island("WWWW\nWLLW\nWWWW")
+    island.make_island()
+    island.add_pop([{'loc': (2, 2), 'species': 'Herbivore', 'age': [2, 4], 'weight': [10, 20]},
+                    {'loc': (2, 3), 'species': 'Carnivore', 'age': [6], 'weight': [8]}])
+    return island
+
+
+@pytest.mark.parametrize('in_file', [False, True])
+def test_recorder_grows(tmp_path, island, in_file):
+    """Testing that the recorder keeps all years when it grows, in memory and in files"""
+    path = str(tmp_path / 'recording') if in_file else None
+    recorder = Recorder((island.y, island.x), path, chunk_years=2)
+    for _ in range(5):
+        recorder.record(island)
+        island.year += 1
+    assert len(recorder) == 5
+    assert recorder.capacity == 6
+    assert recorder['year'].tolist() == [0, 1, 2, 3, 4]
+    assert recorder['herbivore_map'][4, 1, 1] == 2
+    assert recorder['carnivore_map'][4, 1, 2] == 1
+    assert recorder.mean('Herbivore', 'age').tolist() == [3.0] * 5
+    assert recorder.mean('Carnivore', 'weight').tolist() == [8.0] * 5
+    if in_file:
+        recorder.flush()
+        recording = read_recording(path)
+        assert recording['year'].tolist() == [0, 1, 2, 3, 4]
+        assert np.array_equal(recording['herbivore_map'], recorder['herbivore_map'])
+
+
+def test_recorder_no_animals():
+    """Testing that the mean is NaN for a species without animals"""
+    island = Island("WWW\nWLW\nWWW")
+    island.make_island()
+    recorder = Recorder((3, 3))
+    recorder.record(island)
+    assert np.isnan(recorder.mean('Carnivore', 'fitness')[0])
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+"""
+    This file contains simple test for checking, if simulation.py can save and load checkpoints.
+"""
+
+from biosim.simulation import BioSim
+from biosim.log_writer import read_log
+from biosim.animals import Animal
+import textwrap
+import pytest
+
+map_layout = textwrap.dedent("""\
+                             WWWWW
+                             WLLHW
+                             WLDDW
+                             WWWWW""")
+herbivores = [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)]
+carnivores = [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(10)]
+ini_pop = [{'loc': (2, 2), 'pop': herbivores + carnivores}]
+
+
+@pytest.mark.parametrize('engine', ['object', 'array', 'vectorized', 'flat', 'parallel'])
+def test_checkpoint_continues_same(tmp_path, engine):
+    """Testing that a simulation loaded from a checkpoint continues exactly like the one that
+    was saved, with the parameters it had"""
+    path = str(tmp_path / 'sim.npz')
+    sim = BioSim(map_layout, ini_pop, seed=4, vis_years=0, engine=engine, workers=2)
+    sim.set_animal_parameters('Herbivore', {'F': 15})
+    sim.simulate(5, checkpoint_years=5, checkpoint_path=path)
+    sim.simulate(10)
+
+    loaded = BioSim(map_layout, [], seed=1, vis_years=0, engine=engine, workers=2)
+    loaded.load_checkpoint(path)
+    assert loaded.year == 5
+    assert loaded.island.species['Herbivore'].F == 15
+    loaded.simulate(10)
+    sim.close()
+    loaded.close()
+    assert loaded.island.herbivore_pop_history == sim.island.herbivore_pop_history
+    assert loaded.island.carnivore_pop_history == sim.island.carnivore_pop_history
+
+
+@pytest.mark.parametrize('engine', ['object', 'array', 'vectorized', 'flat', 'parallel'])
+def test_checkpoint_stats_after_load(tmp_path, engine):
+    """Testing that the statistics and the map of a loaded simulation can be made right away,
+    before it has simulated any years"""
+    path = str(tmp_path / 'sim.npz')
+    sim = BioSim(map_layout, ini_pop, seed=4, vis_years=0, engine=engine, workers=2)
+    sim.simulate(5, checkpoint_years=5, checkpoint_path=path)
+    loaded = BioSim(map_layout, [], seed=1, vis_years=0, engine=engine, workers=2)
+    loaded.load_checkpoint(path)
+    data_list = loaded.island.do_all_stats()
+    herbivore_map, carnivore_map = loaded.island.count_map()
+    sim_herbivore_map, sim_carnivore_map = sim.island.count_map()
+    sim.close()
+    loaded.close()
+    assert data_list[1:3] == [sim.island.herbivore_pop_history[-1],
+                              sim.island.carnivore_pop_history[-1]]
+    assert (herbivore_map == sim_herbivore_map).all()
+    assert (carnivore_map == sim_carnivore_map).all()
+
+
+def test_checkpoint_wrong_simulation(tmp_path):
+    """Testing that a checkpoint can't be loaded by a simulation with a different engine, map or
+    number of workers, and that checkpoints need a path"""
+    path = str(tmp_path / 'sim.npz')
+    sim = BioSim(map_layout, ini_pop, seed=4, vis_years=0)
+    sim.save_checkpoint(path)
+    with pytest.raises(ValueError):
+        BioSim(map_layout, [], seed=4, vis_years=0, engine='array').load_checkpoint(path)
+    with pytest.raises(ValueError):
+        BioSim("WWW\nWLW\nWWW", [], seed=4, vis_years=0).load_checkpoint(path)
+    with pytest.raises(ValueError):
+        sim.simulate(2, checkpoint_years=1)
+    parallel = BioSim(map_layout, ini_pop, seed=4, vis_years=0, engine='parallel', workers=2)
+    parallel.save_checkpoint(path)
+    other = BioSim(map_layout, [], seed=4, vis_years=0, engine='parallel', workers=1)
+    with pytest.raises(ValueError):
+        other.load_checkpoint(path)
+    parallel.close()
+    other.close()
+
+
+def test_simulation_log_file(tmp_path):
+    """Testing that the log file has the count of every year, and the cell counts"""
+    path = str(tmp_path / 'log.csv')
+    sim = BioSim(map_layout, ini_pop, seed=4, vis_years=0, log_file=path, log_cells=True)
+    sim.simulate(5)
+    log = read_log(path)
+    assert log['Year'].tolist() == [1, 2, 3, 4, 5]
+    assert log['Herbivore'].tolist() == sim.island.herbivore_pop_history[1:]
+    herbivore_map = sim.island.count_map()[0]
+    assert log['Herbivore_2_2'][-1] == herbivore_map[1, 1]
+
+
+@pytest.mark.parametrize('engine', ['object', 'flat', 'parallel'])
+def test_simulation_record(engine):
+    """Testing that the recording has the start and every simulated year, and that the cell
+    counts add up to the population history"""
+    sim = BioSim(map_layout, ini_pop, seed=4, vis_years=0, engine=engine, workers=2, record=True)
+    sim.simulate(3)
+    sim.close()
+    assert sim.recorder['year'].tolist() == [0, 1, 2, 3]
+    assert sim.recorder['herbivore_map'].sum(axis=(1, 2)).tolist() == \
+        sim.island.herbivore_pop_history
+    assert sim.recorder['carnivore_map'].sum(axis=(1, 2)).tolist() == \
+        sim.island.carnivore_pop_history
+
+
+@pytest.mark.parametrize('engine', ['object', 'vectorized', 'flat'])
+def test_simulation_headless(tmp_path, engine):
+    """Testing that a headless simulation gives the same animals as a normal one, but only
+    counts them when the counts are used"""
+    sim = BioSim(map_layout, ini_pop, seed=4, vis_years=0, engine=engine)
+    sim.simulate(10)
+    headless = BioSim(map_layout, ini_pop, seed=4, vis_years=1, engine=engine, headless=True)
+    headless.simulate(10, checkpoint_years=4, checkpoint_path=str(tmp_path / 'sim.npz'))
+    assert headless.plot_window == 0
+    assert headless.num_animals_per_species == sim.num_animals_per_species
+    assert headless.island.history_years == [0, 4, 8, 10]
+    assert headless.island.herbivore_pop_history == [sim.island.herbivore_pop_history[year]
+                                                     for year in (0, 4, 8, 10)]
+
+
+def test_simulation_render_process(tmp_path, monkeypatch):
+    """Testing that simulate waits for the render process to save all the images"""
+    (tmp_path / 'run').mkdir()
+    monkeypatch.chdir(tmp_path / 'run')
+    sim = BioSim(map_layout, ini_pop, seed=4, vis_years=1, img_dir='img', img_base='sim',
+                 render_process=True, render_queue=2)
+    sim.simulate(5)
+    assert len(list((tmp_path / 'run' / 'img').iterdir())) == 6
+    sim.close()
+
+
+def test_simulation_close_stops_workers():
+    """Testing that the worker processes of the 'parallel' engine are stopped at the end of a
+    with statement"""
+    with BioSim(map_layout, ini_pop, seed=4, vis_years=0, engine='parallel', workers=2) as sim:
+        sim.simulate(2)
+        processes = list(sim.island.processes)
+        assert all(process.is_alive() for process in processes)
+    assert not any(process.is_alive() for process in processes)
+    assert sim.island.processes == []
+
+
+def test_rejected_parameters_keep_fitness():
+    """Testing that a call to set_animal_parameters with a wrong parameter changes nothing, and
+    does not mark the stored fitness as outdated"""
+    sim = BioSim(map_layout, ini_pop, seed=4, vis_years=0)
+    version = Animal.params_version
+    for params in ({'F': 15, 'height': 3}, {'F': 15, 'mu': -0.5}):
+        with pytest.raises(ValueError):
+            sim.set_animal_parameters('Herbivore', params)
+    assert Animal.params_version == version
+    assert sim.island.species['Herbivore'].F != 15
+    sim.set_animal_parameters('Herbivore', {'F': 15})
+    assert Animal.params_version == version + 1
+    assert sim.island.species['Herbivore'].F == 15
+
+
+def test_weight_table_step_per_simulation():
+    """Testing that the weight table step is set like the other parameters, and only changes
+    the simulation it's set in"""
+    sim = BioSim(map_layout, ini_pop, seed=4, vis_years=0)
+    other = BioSim(map_layout, ini_pop, seed=4, vis_years=0)
+    sim.set_animal_parameters('Herbivore', {'weight_table_step': 0.5})
+    assert sim.island.species['Herbivore'].weight_table_step == 0.5
+    assert other.island.species['Herbivore'].weight_table_step == 0
+    sim.simulate(3)
+    other.simulate(3)
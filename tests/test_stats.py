@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+"""
+    This file contains simple test for checking, if stats.py counts the animals right.
+"""
+
+from biosim.stats import StatsAccumulator, bin_edges, check_hist_specs
+from biosim.island import Island
+from biosim.flat_island import FlatIsland
+from biosim.parallel import ParallelIsland
+import numpy as np
+import pytest
+
+
+def test_bin_edges():
+    """Testing that the bins go from 0 to max, and that the default is used for the rest"""
+    edges = bin_edges({'weight': {'max': 80, 'delta': 2}})
+    assert edges['weight'][-1] == 80
+    assert len(edges['weight']) == 41
+    assert edges['fitness'][-1] == pytest.approx(1.0)
+    with pytest.raises(ValueError):
+        check_hist_specs({'height': {'max': 10, 'delta': 1}})
+    with pytest.raises(ValueError):
+        check_hist_specs({'age': {'max': 10, 'delta': 0}})
+
+
+def test_stats_add():
+    """Testing the histogram and the moments, and that values above max are in the last bin"""
+    stats = StatsAccumulator({'age': {'max': 10, 'delta': 2}})
+    stats.add(0, [0.5, 0.5], [1, 3], [10, 20])
+    stats.add(0, [0.5], [50], [30])
+    assert stats.counts['age'][0].tolist() == [1, 1, 0, 0, 1]
+    assert stats.counts['age'][1].sum() == 0
+    assert stats.mean(0, 'weight') == pytest.approx(20)
+    assert stats.std(0, 'weight') == pytest.approx(np.std([10, 20, 30]))
+    assert np.isnan(stats.mean(1, 'weight'))
+    stats.reset(1)
+    assert stats.counts['age'].sum() == 0
+
+
+@pytest.mark.parametrize('engine', ['object', 'vectorized', 'flat'])
+def test_stats_active_same_as_collected(engine):
+    """Testing that the statistics collected at the end of the year are the same as the ones
+    collected when asked for"""
+    map_layout = "WWW\nWLW\nWWW"
+    herbivores = [{'species': 'Herbivore', 'age': 5, 'weight': 20} for _ in range(50)]
+    carnivores = [{'species': 'Carnivore', 'age': 5, 'weight': 20} for _ in range(5)]
+    ini_pop = [{'loc': (2, 2), 'pop': herbivores + carnivores}]
+    island = FlatIsland(map_layout, seed=2) if engine == 'flat' else \
+        Island(map_layout, engine, seed=2)
+    island.make_island()
+    island.add_pop(ini_pop)
+    island.stats.active = True
+    island.simulate_island()
+    during = island.do_all_stats()
+    island.collect_stats()
+    after = island.do_all_stats()
+    for position in range(3, 9):
+        assert during[position].tolist() == after[position].tolist()
+    assert during[4].sum() == island.herbivore_pop_history[-1]
+    assert during[7].sum() == island.carnivore_pop_history[-1]
+
+
+@pytest.mark.parametrize('engine', ['object', 'array', 'vectorized', 'flat', 'parallel'])
+def test_stats_count_migrants(engine):
+    """Testing that the histograms and maps have every animal after a year with migration,
+    also the ones that migrated up or left into cells that were already simulated"""
+    map_layout = "WWWWWWW\nWLLLLLW\nWLLLLLW\nWLLLLLW\nWLLLLLW\nWLLLLLW\nWWWWWWW"
+    herbivores = [{'species': 'Herbivore', 'age': 5, 'weight': 40} for _ in range(200)]
+    carnivores = [{'species': 'Carnivore', 'age': 5, 'weight': 40} for _ in range(40)]
+    ini_pop = [{'loc': (4, 4), 'pop': herbivores + carnivores}]
+    if engine == 'flat':
+        island = FlatIsland(map_layout, seed=2)
+    elif engine == 'parallel':
+        island = ParallelIsland(map_layout, seed=2, workers=2)
+    else:
+        island = Island(map_layout, engine, seed=2)
+    island.make_island()
+    island.add_pop(ini_pop)
+    for _ in range(3):
+        island.stats.active = True
+        island.simulate_island()
+        data_list = island.do_all_stats()
+        for (position, history) in ((4, island.herbivore_pop_history),
+                                    (7, island.carnivore_pop_history)):
+            assert data_list[position].sum() == history[-1]
+        assert sum(map(sum, data_list[9])) == island.herbivore_pop_history[-1]
+    if engine == 'parallel':
+        island.close()
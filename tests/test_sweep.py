@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+"""
+    This file contains simple test for checking, if sweep.py makes the right points, and saves
+    and reads finished points.
+"""
+
+from biosim.sweep import grid_points, sample_points, run_sweep
+from biosim.animals import Herbivores
+import json
+import os
+
+map_layout = "WWWW\nWLLW\nWLLW\nWWWW"
+ini_pop = [{'loc': (2, 2), 'pop': [{'species': 'Herbivore', 'age': 5, 'weight': 20}
+                                   for _ in range(20)]}]
+
+
+def test_grid_points():
+    """Testing that the grid gives every combination of the values"""
+    points = grid_points({'Herbivore.mu': [0.1, 0.2], 'L.f_max': [100, 200, 300]})
+    assert len(points) == 6
+    assert {'Herbivore.mu': 0.2, 'L.f_max': 100} in points
+
+
+def test_sample_points():
+    """Testing that random points are inside the ranges, and the same for the same seed"""
+    points = sample_points({'Herbivore.gamma': (0.1, 0.3)}, 5, seed=2)
+    assert len(points) == 5
+    assert all(0.1 <= point['Herbivore.gamma'] <= 0.3 for point in points)
+    assert points == sample_points({'Herbivore.gamma': (0.1, 0.3)}, 5, seed=2)
+
+
+def test_sweep_cache(tmp_path):
+    """Testing that finished points are saved, and read again instead of simulated"""
+    grid = {'Herbivore.omega': [0, 0.4]}
+    results = run_sweep(map_layout, ini_pop, 5, grid=grid, processes=1,
+                        cache_dir=str(tmp_path))
+    assert results[0]['Herbivore']['extinct'] == 0
+    assert results[0]['Herbivore']['final'] >= 20
+    assert Herbivores.omega == 0.4
+    files = os.listdir(tmp_path)
+    assert len(files) == 2
+    path = os.path.join(tmp_path, files[0])
+    with open(path) as f:
+        result = json.load(f)
+    result['Herbivore']['final'] = -1
+    with open(path, 'w') as f:
+        json.dump(result, f)
+    again = run_sweep(map_layout, ini_pop, 5, grid=grid, processes=1, cache_dir=str(tmp_path))
+    assert -1 in [point['Herbivore']['final'] for point in again]
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+
+"""
+    This file contains simple test for checking, if video_writer.py sends the frames to ffmpeg.
+    A small Python script is used instead of ffmpeg, it writes the number of bytes it gets to
+    the movie file.
+"""
+
+from biosim.video_writer import VideoWriter
+from biosim.simulation import BioSim
+import numpy as np
+import os
+import subprocess
+import sys
+import pytest
+
+
+@pytest.fixture
+def fake_ffmpeg(tmp_path, monkeypatch):
+    """Puts a fake ffmpeg first in PATH"""
+    script = tmp_path / 'ffmpeg'
+    script.write_text('#!' + sys.executable + '\n'
+                      'import sys\n'
+                      'data = sys.stdin.buffer.read()\n'
+                      'open(sys.argv[-1], "w").write(str(len(data)))\n')
+    script.chmod(0o755)
+    monkeypatch.setenv('PATH', str(tmp_path) + os.pathsep + os.environ['PATH'])
+    return script
+
+
+def test_video_writer_pipes_frames(tmp_path, fake_ffmpeg):
+    """Testing that every frame is sent to ffmpeg as raw RGBA pixels"""
+    path = str(tmp_path / 'sim.mp4')
+    video = VideoWriter(path, 6, 4)
+    for _ in range(3):
+        video.write(np.zeros((4, 6, 4), dtype=np.uint8))
+    video.close()
+    assert video.frames == 3
+    assert open(path).read() == str(3 * 4 * 6 * 4)
+
+
+def test_video_writer_other_size(tmp_path, fake_ffmpeg, monkeypatch):
+    """Testing that frames with another size than the movie are cut or padded to it's size"""
+    video = VideoWriter(str(tmp_path / 'sim.mp4'), 6, 4)
+    sent = []
+    monkeypatch.setattr(video.process.stdin, 'write', sent.append)
+    video.write(np.zeros((6, 4, 4), dtype=np.uint8))
+    frame = np.frombuffer(sent[0], dtype=np.uint8).reshape(4, 6, 4)
+    assert frame[:, :4].max() == 0
+    assert frame[:, 4:].min() == 255
+    video.write(np.zeros((8, 9, 4), dtype=np.uint8))
+    assert len(sent[1]) == 4 * 6 * 4
+    monkeypatch.undo()
+    video.close()
+
+
+def test_video_writer_no_ffmpeg(tmp_path):
+    """Testing that a missing ffmpeg gives a ValueError"""
+    with pytest.raises(ValueError):
+        VideoWriter(str(tmp_path / 'sim.mp4'), 6, 4, ffmpeg=str(tmp_path / 'no_ffmpeg'))
+
+
+def test_simulation_movie(tmp_path, fake_ffmpeg):
+    """Testing that BioSim streams the figure to the movie, without any image files"""
+    path = str(tmp_path / 'sim.mp4')
+    sim = BioSim("WWWW\nWLHW\nWWWW", [], seed=1, vis_years=1, img_years=2, movie_file=path)
+    sim.simulate(4)
+    sim.make_movie()
+    frame = sim.plot_window.video.size
+    assert sim.plot_window.years_saved == 3
+    assert open(path).read() == str(3 * frame[0] * frame[1] * 4)
+    assert sorted(os.listdir(tmp_path)) == ['ffmpeg', 'sim.mp4']
+
+
+def test_make_movie_pattern(tmp_path, monkeypatch):
+    """Testing that make_movie reads the images with the same names as they are saved with"""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'run').mkdir()
+    sim = BioSim("WWWW\nWLHW\nWWWW", [], seed=1, vis_years=1, img_dir='img', img_base='sim',
+                 movie_fps=25)
+    sim.simulate(2)
+    commands = []
+    monkeypatch.setattr(subprocess, 'run', lambda command, check: commands.append(command))
+    # make_movie puts the movie in ../video, which must be inside tmp_path
+    monkeypatch.chdir(tmp_path / 'run')
+    sim.make_movie()
+    pattern = commands[0][commands[0].index('-i') + 1]
+    assert pattern == os.path.join('img', 'sim_%05d.png')
+    assert commands[0][commands[0].index('-r') + 1] == '25'
+    images = sorted(os.listdir(tmp_path / 'img'))
+    assert images == ['sim_00000.png', 'sim_00001.png', 'sim_00002.png']